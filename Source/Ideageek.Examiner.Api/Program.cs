@@ -34,6 +34,7 @@ builder.Services.Configure<QuestionSheetGenerationOptions>(options =>
     var pythonPath = builder.Configuration.GetValue<string>("AppSettings:PythonPath");
     options.PythonPath = string.IsNullOrWhiteSpace(pythonPath) ? "python" : pythonPath;
     options.ScriptPath = Path.Combine(builder.Environment.ContentRootPath, "Scripts", "main.py");
+    options.WorkerUrl = builder.Configuration.GetValue<string>("AppSettings:PythonWorkerUrl") ?? string.Empty;
     options.DocumentsFolder = Path.Combine(builder.Environment.WebRootPath, "Documents", "Exam");
     options.DocumentsUrlPrefix = "/Documents/Exam";
 });
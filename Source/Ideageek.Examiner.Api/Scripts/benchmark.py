@@ -0,0 +1,290 @@
+"""Offline benchmarks for the main.py hot paths.
+
+    python benchmark.py                                  # full matrix, prints a table
+    python benchmark.py --save-baseline baseline.json    # record a baseline on this machine
+    python benchmark.py --baseline baseline.json         # compare; exits 1 on a regression
+
+Every sheet is synthetic (`fill_random` with a fixed seed), so runs are repeatable and need
+no scans, network or API.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import gc
+import io
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import main
+
+QUESTION_COUNTS = [10, 50, 200]
+OPTION_COUNTS = [4, 8]
+BATCH_SIZE = 10
+REPEAT = 5
+THRESHOLD = 0.25  # fail when a case's median time grows by more than this fraction
+MIN_DELTA_MS = 1.0  # ignore slowdowns smaller than this; tiny cases are mostly timer noise
+SEED = 1234
+
+Case = Tuple[str, Callable[[], Any], int]
+
+
+def measure(run: Callable[[], Any], repeat: int, items: int) -> Dict[str, Any]:
+    output = run()  # warm-up: imports, fonts and compiled grids are not what we are timing
+    timings: List[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    # Peak memory comes from a separate traced run so tracing does not skew the timings.
+    # tracemalloc sees Python and numpy allocations, not Pillow's internal image buffers.
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    case = {
+        "runs": repeat,
+        "items": items,
+        "median_s": round(median, 6),
+        "min_s": round(min(timings), 6),
+        "per_second": round(items / median, 2) if median > 0 else None,
+        "peak_kib": round(peak / 1024, 1),
+    }
+    if isinstance(output, (str, bytes)):
+        case["bytes"] = len(output.encode("utf-8") if isinstance(output, str) else output)  # serialize.* cases
+    return case
+
+
+def build_cases(question_count: int, option_count: int, batch_size: int, layout: str, name_filter: str = "") -> List[Case]:
+    """The cases whose name contains `name_filter`; setup shared by several cases runs on first use only."""
+    import numpy as np
+
+    exam = main.build_run_config(
+        {
+            "examName": "Benchmark",
+            "examId": "BENCH",
+            "template": {"name": "bench", "optionsPerQuestion": option_count, "layout": layout},
+            "questionCount": question_count,
+        }
+    )
+    correct_answers = [question.correct for question in exam.questions]
+    cache = main.SHEET_BASE_CACHE
+    cache_bytes = main.SHEET_CACHE_MAX_MB * 1024 * 1024
+
+    def render(student_id: str, cold: bool = False) -> Tuple[List[str], List[Any]]:
+        if cold:
+            cache.configure(0, None)
+        try:
+            answers, pages = main.generate_sheet(exam, student_id, fill_random=True)
+        finally:
+            if cold:
+                cache.configure(cache_bytes, None)
+        return answers, pages
+
+    vector_students = itertools.count()
+
+    def render_vector() -> None:
+        # A new student each run: the vector QR is cached per student, the raster one is not.
+        _, vector_pages = main.generate_vector_sheet(exam, f"V-{next(vector_students)}", fill_random=True)
+        main.write_vector_document(io.BytesIO(), vector_pages)
+
+    def render_questions(cold: bool = False) -> None:
+        if cold:
+            cache.configure(0, None)
+        try:
+            main.generate_question_sheet(exam, "S-0")
+        finally:
+            if cold:
+                cache.configure(cache_bytes, None)
+
+    @functools.lru_cache(maxsize=None)
+    def scans() -> Dict[str, Any]:
+        # Synthetic scans: the same filled sheets the scanner would see, kept as arrays and as PNG bytes.
+        random.seed(SEED)
+        sheets = [render(f"S-{index}") for index in range(batch_size)]
+        answers, pages = sheets[0]
+        scan = [np.array(page) for page in pages]
+        encoded = [[main.encode_image(page) for page in sheet_pages] for _, sheet_pages in sheets]
+        detected, _, _ = main.detect_answers(scan, exam)
+        if detected != answers:
+            raise SystemExit(f"Benchmark sheet ({question_count} questions, {option_count} options) was misread.")
+        return {"answers": answers, "pages": pages, "scan": scan, "encoded": encoded}
+
+    def detect_single() -> None:
+        main.detect_answers(scans()["scan"], exam)
+
+    def detect_encoded() -> None:
+        main.detect_answers(scans()["encoded"][0], exam)
+
+    def score_batch() -> None:
+        for sheet in scans()["encoded"]:
+            detected_answers, _, _ = main.detect_answers(sheet, exam)
+            main.evaluate(correct_answers, detected_answers)
+
+    formats = [main.RESULT_FORMAT_JSON, main.RESULT_FORMAT_COMPACT]
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+    else:
+        formats.append(main.RESULT_FORMAT_MSGPACK)
+
+    @functools.lru_cache(maxsize=None)
+    def shaped(result_format: str) -> Dict[str, Any]:
+        # A scoreCheck result with full details, as main() would serialize it in each --result-format.
+        result: Dict[str, Any] = {"mode": "scoreCheck", "question_count": question_count}
+        main.attach_detection_evaluation(result, *main.detect_answers(scans()["scan"], exam)[:2], exam)
+        return result if result_format == main.RESULT_FORMAT_JSON else main.compact_result(result)
+
+    @functools.lru_cache(maxsize=None)
+    def serialized(result_format: str) -> str | bytes:
+        return main.serialize_result(shaped(result_format), result_format)
+
+    def parse(result_format: str) -> Any:
+        output = serialized(result_format)
+        return msgpack.unpackb(output) if result_format == main.RESULT_FORMAT_MSGPACK else json.loads(output)
+
+    def generate_batch() -> None:
+        for index in range(batch_size):
+            render(f"S-{index}")
+
+    prefix = f"q{question_count}-o{option_count}"
+    cases = [
+        (f"{prefix}/generate_sheet.cold", lambda: render("S-0", cold=True), 1),
+        (f"{prefix}/generate_sheet", lambda: render("S-0"), 1),
+        (f"{prefix}/generate_sheet.vector", render_vector, 1),
+        (f"{prefix}/generate_question_sheet.cold", lambda: render_questions(cold=True), 1),
+        (f"{prefix}/generate_question_sheet", render_questions, 1),
+        (f"{prefix}/detect_answers", detect_single, 1),
+        (f"{prefix}/detect_answers.png", detect_encoded, 1),
+        (f"{prefix}/evaluate", lambda: main.evaluate(correct_answers, scans()["answers"]), 1),
+        (f"{prefix}/image_to_base64", lambda: main.image_to_base64(scans()["pages"][0]), 1),
+        (f"{prefix}/batch.generate_sheet", generate_batch, batch_size),
+        (f"{prefix}/batch.score", score_batch, batch_size),
+    ] + [
+        case
+        for result_format in formats
+        for case in (
+            (
+                f"{prefix}/serialize.{result_format}",
+                lambda result_format=result_format: main.serialize_result(shaped(result_format), result_format),
+                1,
+            ),
+            (f"{prefix}/parse.{result_format}", lambda result_format=result_format: parse(result_format), 1),
+        )
+    ]
+    return [case for case in cases if name_filter in case[0]]
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[str]:
+    regressions: List[str] = []
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if not previous or not previous.get("median_s"):
+            continue
+        change = current["median_s"] / previous["median_s"] - 1
+        current["baseline_median_s"] = previous["median_s"]
+        current["change"] = round(change, 3)
+        delta_ms = (current["median_s"] - previous["median_s"]) * 1000
+        if change > threshold and delta_ms > min_delta_ms:
+            regressions.append(f"{name}: {previous['median_s'] * 1000:.2f} ms -> {current['median_s'] * 1000:.2f} ms ({change:+.0%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    header = f"{'case':<42} {'median ms':>10} {'per sec':>10} {'peak KiB':>10} {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, case in results["cases"].items():
+        change = f"{case['change']:+.0%}" if "change" in case else ""
+        print(
+            f"{name:<42} {case['median_s'] * 1000:>10.2f} {case['per_second'] or 0:>10.1f} "
+            f"{case['peak_kib']:>10.1f} {change:>8}"
+        )
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark sheet generation, detection and scoring in main.py.")
+    parser.add_argument("--questions", type=int, nargs="+", default=QUESTION_COUNTS, help="Question counts to cover.")
+    parser.add_argument("--options", type=int, nargs="+", default=OPTION_COUNTS, help="Options per question to cover.")
+    parser.add_argument("--layout", choices=main.LAYOUTS, default=main.LAYOUT_CLASSIC, help="Answer sheet layout.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Sheets per batch workload.")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Timed runs per case (the median is reported).")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text.")
+    parser.add_argument("--output", default="", help="Write the full results as JSON here.")
+    parser.add_argument("--save-baseline", default="", help="Write the results as a baseline JSON file.")
+    parser.add_argument("--baseline", default="", help="Compare against this baseline and exit 1 on a regression.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="Allowed slowdown per case as a fraction of the baseline median (default 0.25).",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=MIN_DELTA_MS,
+        help="Slowdowns smaller than this many milliseconds never count as regressions.",
+    )
+    parser.add_argument("--font-path", default="", help="Font file to render with (see main.py --font-path).")
+    return parser.parse_args(argv)
+
+
+def main_benchmark() -> int:
+    args = parse_args()
+    main.configure_font_path(args.font_path)
+    results: Dict[str, Any] = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "questions": args.questions,
+            "options": args.options,
+            "layout": args.layout,
+            "batch_size": args.batch_size,
+            "repeat": args.repeat,
+            "seed": SEED,
+        },
+        "cases": {},
+    }
+    for question_count in args.questions:
+        for option_count in args.options:
+            for name, run, items in build_cases(question_count, option_count, args.batch_size, args.layout, args.filter):
+                results["cases"][name] = measure(run, args.repeat, items)
+                sys.stderr.write(f"[benchmark] {name}: {results['cases'][name]['median_s'] * 1000:.2f} ms\n")
+
+    regressions: List[str] = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        results["regressions"] = regressions
+
+    print_table(results)
+    for target in (args.output, args.save_baseline):
+        if target:
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            Path(target).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,374 @@
+"""Synthetic scan corpus for load and accuracy testing of main.py detection.
+
+    python corpus.py --json exam.json --count 10000 --output-dir corpus/ --workers 8
+    python main.py --mode scoreBatch --json exam.json --scans corpus/ --workers 8 --results-output results.jsonl
+    python corpus.py --check results.jsonl --corpus corpus/          # exits 1 below --min-accuracy
+
+Every sheet is drawn like a real one (header, QR code, fiducials), then marked the way
+students mark (firm, pencil, light, double, erased) and degraded the way scanners do
+(rotation, shift, scale, paper tone, blur, noise, JPEG). Sheet `i` depends only on
+`--seed` and `i`, so the same settings rebuild the same corpus on any number of workers.
+Ground truth goes to `truth.jsonl` next to the images.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image, ImageDraw
+
+import main
+
+SEED = 1234
+TRUTH_FILE = "truth.jsonl"
+MANIFEST_FILE = "corpus.json"
+FORMATS = ["jpg", "png"]
+MIN_ACCURACY = 0.99
+
+# Mark styles: fill gray level range and radius inset from the printed bubble.
+MARK_STYLES = {
+    "firm": ((0, 40), 2),
+    "pencil": ((70, 120), 4),
+    "light": ((150, 180), 4),
+    "erased": ((200, 225), 4),
+}
+MARK_JITTER = 4  # px a student's mark wanders off the bubble centre
+
+# Per-question outcome mix and scanner degradation ranges for each profile.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "clean": {
+        "mix": {"single": 1.0},
+        "rotate": 0.0,
+        "shift": 0,
+        "scale": 0.0,
+        "paper": (255, 255),
+        "contrast": (1.0, 1.0),
+        "blur": (0.0, 0.0),
+        "noise": (0.0, 0.0),
+        "jpeg": (95, 95),
+    },
+    "realistic": {
+        "mix": {"single": 0.88, "blank": 0.04, "multi": 0.03, "light": 0.03, "erased": 0.02},
+        "rotate": 1.0,
+        "shift": 20,
+        "scale": 0.02,
+        "paper": (232, 250),
+        "contrast": (0.85, 1.0),
+        "blur": (0.0, 1.0),
+        "noise": (0.0, 6.0),
+        "jpeg": (70, 92),
+    },
+    "harsh": {
+        "mix": {"single": 0.75, "blank": 0.07, "multi": 0.06, "light": 0.07, "erased": 0.05},
+        "rotate": 2.0,
+        "shift": 40,
+        "scale": 0.04,
+        "paper": (210, 240),
+        "contrast": (0.7, 0.95),
+        "blur": (0.5, 2.0),
+        "noise": (4.0, 14.0),
+        "jpeg": (45, 75),
+    },
+}
+
+_STATE: Dict[str, Any] = {}
+
+
+def init_worker(payload: Any, layout: str, profile: str, seed: int, output_dir: str, image_format: str, font_path: str) -> None:
+    main.configure_font_path(font_path)
+    exam = main.build_run_config(payload, layout)
+    _STATE.update(
+        exam=exam,
+        profile=PROFILES[profile],
+        seed=seed,
+        output_dir=Path(output_dir),
+        image_format=image_format,
+    )
+
+
+def plan_question(rng: random.Random, options: Tuple[str, ...], mix: Dict[str, float]) -> Tuple[str, str, List[Tuple[str, str]]]:
+    """(kind, answer a careful human would read, marks as (option, style)) for one question."""
+    kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+    if len(options) < 2 and kind in ("multi", "erased"):
+        kind = "single"
+    first = rng.choice(options)
+    if kind == "blank":
+        return kind, "", []
+    if kind == "multi":
+        second = rng.choice([option for option in options if option != first])
+        return kind, "", [(first, "firm"), (second, rng.choice(("firm", "pencil")))]
+    if kind == "light":
+        return kind, first, [(first, "light")]
+    if kind == "erased":
+        # A changed answer: the old mark rubbed out, the new one filled in.
+        old = rng.choice([option for option in options if option != first])
+        return kind, first, [(old, "erased"), (first, rng.choice(("firm", "pencil")))]
+    return kind, first, [(first, rng.choice(("firm", "firm", "pencil")))]
+
+
+def draw_marks(pages: List[Image.Image], rng: random.Random, mix: Dict[str, float]) -> Tuple[List[str], List[str]]:
+    grid = _STATE["exam"].grid
+    draws = [ImageDraw.Draw(page) for page in pages]
+    answers: List[str] = []
+    kinds: List[str] = []
+    for idx, options in enumerate(grid.options):
+        kind, answer, marks = plan_question(rng, options, mix)
+        for option, style in marks:
+            (low, high), inset = MARK_STYLES[style]
+            x, y = grid.centre(idx, options.index(option))
+            x += rng.randint(-MARK_JITTER, MARK_JITTER)
+            y += rng.randint(-MARK_JITTER, MARK_JITTER)
+            radius = main.BUBBLE_RADIUS - inset
+            draws[grid.page_index[idx]].ellipse(
+                [x - radius, y - radius, x + radius, y + radius], fill=rng.randint(low, high)
+            )
+        answers.append(answer)
+        kinds.append(kind)
+    return answers, kinds
+
+
+def degrade(page: Image.Image, rng: random.Random, profile: Dict[str, Any]) -> Tuple[Image.Image, Dict[str, float]]:
+    """Scanner artefacts: placement on the glass, paper and lamp levels, focus and sensor noise."""
+    import cv2
+    import numpy as np
+
+    angle = rng.uniform(-profile["rotate"], profile["rotate"])
+    scale = 1 + rng.uniform(-profile["scale"], profile["scale"])
+    shift_x = rng.randint(-profile["shift"], profile["shift"])
+    shift_y = rng.randint(-profile["shift"], profile["shift"])
+    paper = rng.uniform(*profile["paper"])
+    contrast = rng.uniform(*profile["contrast"])
+    blur = rng.uniform(*profile["blur"])
+    noise = rng.uniform(*profile["noise"])
+    applied = {
+        "rotate": round(angle, 3),
+        "scale": round(scale, 4),
+        "shift": [shift_x, shift_y],
+        "paper": round(paper, 1),
+        "contrast": round(contrast, 3),
+        "blur": round(blur, 2),
+        "noise": round(noise, 2),
+    }
+
+    # cv2 does the resampling and blur: several times faster than Pillow at full page size.
+    pixels = np.asarray(page)
+    if angle or scale != 1 or shift_x or shift_y:
+        matrix = cv2.getRotationMatrix2D((page.width / 2, page.height / 2), angle, scale)
+        matrix[:, 2] += (shift_x, shift_y)
+        pixels = cv2.warpAffine(pixels, matrix, page.size, flags=cv2.INTER_LINEAR, borderValue=255)
+    if blur > 0:
+        pixels = cv2.GaussianBlur(pixels, (0, 0), blur)
+    if paper < 255 or contrast != 1:
+        levels = np.arange(256, dtype=np.float32)
+        pixels = cv2.LUT(pixels, np.clip(paper - (255 - levels) * contrast * paper / 255, 0, 255).astype(np.uint8))
+    if noise > 0:
+        grain = np.empty(pixels.shape, dtype=np.int16)
+        cv2.randn(grain, 0, noise)  # cv2's generator is reseeded per sheet in render_scan
+        pixels = cv2.add(pixels, grain, dtype=cv2.CV_8U)
+    return Image.fromarray(pixels), applied
+
+
+def render_scan(index: int) -> Dict[str, Any]:
+    import cv2
+
+    state = _STATE
+    exam = state["exam"]
+    profile = state["profile"]
+    # Seeded per sheet, not per worker, so the corpus does not depend on how the work was split.
+    rng = random.Random(f"{state['seed']}:{index}")
+    cv2.setRNGSeed(rng.getrandbits(31))
+    student_id = f"SYN-{index:06d}"
+
+    pages = main.cached_answer_sheet_pages(exam)  # fresh copies of the cached blank pages
+    for page in pages:
+        main.stamp_student_header(page, student_id, exam.exam_id)
+    answers, kinds = draw_marks(pages, rng, profile["mix"])
+    scanned: List[Image.Image] = []
+    applied: List[Dict[str, float]] = []
+    for page in pages:
+        page, settings = degrade(page, rng, profile)
+        scanned.append(page)
+        applied.append(settings)
+
+    stem = f"{main.safe_file_stem(str(exam.exam_id))}_{index:06d}"
+    quality = rng.randint(*profile["jpeg"])
+    if len(scanned) > 1:
+        # scoreBatch takes one file per sheet, so multi-page sheets become multi-page TIFFs.
+        path = state["output_dir"] / f"{stem}.tif"
+        scanned[0].save(path, save_all=True, append_images=scanned[1:], compression="tiff_deflate")
+    elif state["image_format"] == "jpg":
+        path = state["output_dir"] / f"{stem}.jpg"
+        scanned[0].save(path, quality=quality)
+    else:
+        path = state["output_dir"] / f"{stem}.png"
+        scanned[0].save(path, compress_level=1)
+    return {
+        "file": path.name,
+        "index": index,
+        "exam_id": exam.exam_id,
+        "student_id": student_id,
+        "answers": answers,
+        "kinds": kinds,
+        "scan": applied,
+        "jpeg_quality": quality if path.suffix == ".jpg" else None,
+    }
+
+
+def build_corpus(args: argparse.Namespace) -> Dict[str, Any]:
+    base_dir = Path(__file__).resolve().parent
+    payload = main.load_exam_payload(args.json, base_dir)
+    exam = main.build_run_config(payload, args.layout)  # fail fast on a bad payload before starting workers
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    initargs = (payload, args.layout, args.profile, args.seed, str(output_dir), args.format, args.font_path)
+    workers = min(args.workers if args.workers > 0 else (os.cpu_count() or 1), max(args.count, 1))
+
+    started = time.perf_counter()
+    kinds: Dict[str, int] = {}
+    with (output_dir / TRUTH_FILE).open("w", encoding="utf-8") as truth:
+        if workers <= 1:
+            init_worker(*initargs)
+            rendered = map(render_scan, range(args.count))
+            executor = None
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs)
+            rendered = executor.map(render_scan, range(args.count), chunksize=max(1, min(64, args.count // (workers * 8))))
+        try:
+            for done, line in enumerate(rendered, 1):
+                for kind in line["kinds"]:
+                    kinds[kind] = kinds.get(kind, 0) + 1
+                truth.write(json.dumps(line, separators=(",", ":")) + "\n")
+                if done % 100 == 0:
+                    sys.stderr.write(f"[corpus] {done}/{args.count} sheets, {time.perf_counter() - started:.1f}s\n")
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "exam_id": exam.exam_id,
+        "layout": exam.layout,
+        "pages_per_sheet": exam.grid.page_count,
+        "questions": len(exam.questions),
+        "question_numbers": list(exam.question_numbers),
+        "count": args.count,
+        "seed": args.seed,
+        "profile": args.profile,
+        "settings": PROFILES[args.profile],
+        "format": "tif" if exam.grid.page_count > 1 else args.format,
+        "question_kinds": kinds,
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 2),
+        "sheets_per_second": round(args.count / elapsed, 2) if elapsed > 0 else None,
+    }
+    (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def check_results(results_path: Path, corpus_dir: Path) -> Dict[str, Any]:
+    """Grade scoreBatch result lines against the corpus truth, per question and per kind of mark."""
+    for path in (results_path, corpus_dir / TRUTH_FILE, corpus_dir / MANIFEST_FILE):
+        if not path.is_file():
+            raise SystemExit(f"File not found: {path}")
+    truth: Dict[str, Dict[str, Any]] = {}
+    with (corpus_dir / TRUTH_FILE).open(encoding="utf-8") as handle:
+        for raw in handle:
+            if raw.strip():
+                line = json.loads(raw)
+                truth[line["file"]] = line
+
+    manifest = json.loads((corpus_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+    numbers = manifest["question_numbers"]
+    sheets = {"expected": len(truth), "scored": 0, "failed": 0, "missing": 0, "unknown": 0}
+    by_kind: Dict[str, Dict[str, int]] = {}
+    totals = {"questions": 0, "correct": 0, "flagged": 0, "silent_errors": 0}
+    seen = set()
+    with results_path.open(encoding="utf-8") as handle:
+        for raw in handle:
+            if not raw.strip():
+                continue
+            result = json.loads(raw)
+            name = Path(result["file"].split("!")[-1]).name
+            expected = truth.get(name)
+            if expected is None:
+                sheets["unknown"] += 1
+                continue
+            seen.add(name)
+            if not result.get("ok"):
+                sheets["failed"] += 1
+                continue
+            sheets["scored"] += 1
+            detected = result["detected_answers"]
+            flagged = set(result.get("review", {}).get("questions", []))
+            for idx, (answer, kind) in enumerate(zip(expected["answers"], expected["kinds"])):
+                row = by_kind.setdefault(kind, {"questions": 0, "correct": 0, "flagged": 0, "silent_errors": 0})
+                correct = idx < len(detected) and detected[idx] == answer
+                is_flagged = numbers[idx] in flagged
+                for bucket in (row, totals):
+                    bucket["questions"] += 1
+                    bucket["correct"] += 1 if correct else 0
+                    bucket["flagged"] += 1 if is_flagged else 0
+                    # The costly failure: a wrong answer nobody was asked to look at.
+                    bucket["silent_errors"] += 1 if not correct and not is_flagged else 0
+    sheets["missing"] = len(truth) - len(seen)
+
+    def rates(bucket: Dict[str, int]) -> Dict[str, Any]:
+        count = bucket["questions"] or 1
+        return {
+            **bucket,
+            "accuracy": round(bucket["correct"] / count, 5),
+            "silent_error_rate": round(bucket["silent_errors"] / count, 5),
+        }
+
+    return {"sheets": sheets, "questions": rates(totals), "by_kind": {kind: rates(row) for kind, row in sorted(by_kind.items())}}
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build degraded synthetic answer-sheet scans with ground truth, or grade results against them.")
+    parser.add_argument("--json", default="", help="Exam payload (JSON file or string) to draw the sheets from.")
+    parser.add_argument("--count", type=int, default=100, help="Number of sheets to generate.")
+    parser.add_argument("--output-dir", default="corpus", help="Directory for the scans, truth.jsonl and corpus.json.")
+    parser.add_argument("--seed", type=int, default=SEED, help="Corpus seed; sheet i depends only on this and i.")
+    parser.add_argument("--profile", choices=list(PROFILES), default="realistic", help="Mark mix and scanner degradation.")
+    parser.add_argument("--format", choices=FORMATS, default="jpg", help="Single-page scan format (multi-page sheets are TIFF).")
+    parser.add_argument("--layout", choices=main.LAYOUTS, default="", help="Override the payload's answer sheet layout.")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0 = one per CPU).")
+    parser.add_argument("--font-path", default="", help="Font file to render with (see main.py --font-path).")
+    parser.add_argument("--check", default="", help="Grade these scoreBatch JSON lines against --corpus instead of generating.")
+    parser.add_argument("--corpus", default="", help="Corpus directory holding truth.jsonl (for --check).")
+    parser.add_argument(
+        "--min-accuracy",
+        type=float,
+        default=MIN_ACCURACY,
+        help="--check exits 1 when per-question accuracy falls below this or a sheet fails (default 0.99).",
+    )
+    return parser.parse_args(argv)
+
+
+def main_corpus() -> int:
+    args = parse_args()
+    if args.check:
+        if not args.corpus:
+            raise SystemExit("--check needs --corpus (the directory holding truth.jsonl).")
+        report = check_results(Path(args.check), Path(args.corpus))
+        print(json.dumps(report, indent=2))
+        failed = report["sheets"]["failed"] + report["sheets"]["missing"]
+        return 1 if failed or report["questions"]["accuracy"] < args.min_accuracy else 0
+    if not args.json:
+        raise SystemExit("Pass --json with an exam payload to generate a corpus, or --check to grade results.")
+    print(json.dumps(build_corpus(args), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_corpus())
@@ -1,20 +1,38 @@
+from __future__ import annotations
 
 import argparse
 import base64
+import contextvars
+import functools
+import glob
+import hashlib
 import io
 import json
+import os
 import random
-import textwrap
+import re
+import struct
+import sys
+import threading
+import time
+import zipfile
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
-
-try:
-    import cv2
-except Exception:
-    cv2 = None
-import numpy as np
-import qrcode
-from PIL import Image, ImageDraw, ImageFont
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Sequence, TextIO, Tuple
+
+IMPORT_STARTED_AT = time.perf_counter()
+
+# numpy, OpenCV and qrcode are imported on first use: `scoreCheck` never needs qrcode and
+# `answerSheet` without `--detect` never needs numpy/OpenCV.
+from PIL import Image, ImageDraw, ImageFont, ImageSequence, TiffImagePlugin
+
+if TYPE_CHECKING:
+    import numpy as np
+
 IMAGE_SIZE = (2480, 3508)  # width, height
 BACKGROUND_COLOR = 255
 SCHOOL_NAME = "Sample Academy"
@@ -34,9 +52,284 @@ QUESTION_NUMBER_OFFSET_X = 150
 FIRST_OPTION_X = 350
 DEFAULT_OPTIONS_ORDER = ["A", "B", "C", "D"]
 QUESTION_TEXT_X = 280
-TEXT_WRAP_WIDTH = 55
 OPTION_COLUMN_GAP = 80
-OPTION_WRAP_WIDTH = 30
+QUESTION_BLOCK_GAP = 20  # vertical space between questions on the question sheet
+FONT_CANDIDATES = [
+    "arial.ttf",
+    "DejaVuSans.ttf",
+    "LiberationSans-Regular.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+FONT_PATH_ENV = "EXAMINER_FONT_PATH"
+QR_SIZE = 320
+LAYOUT_CLASSIC = "classic"
+LAYOUT_DENSE = "dense"
+LAYOUTS = [LAYOUT_CLASSIC, LAYOUT_DENSE]
+PAGE_MARGIN_X = 150
+PAGE_BOTTOM_MARGIN = 150
+DENSE_LABEL_WIDTH = 150
+DENSE_OPTION_SPACING = 2 * BUBBLE_RADIUS + 30
+DENSE_ROW_SPACING = 2 * BUBBLE_RADIUS + 40
+DENSE_COLUMN_GAP = 60
+QR_POS = (IMAGE_SIZE[0] - QR_SIZE - 180, 80)
+# Solid corner squares printed on every answer sheet page so detection can register skewed scans.
+FIDUCIAL_SIZE = 60
+FIDUCIAL_INSET = 40
+FIDUCIAL_ORIGINS = [
+    (FIDUCIAL_INSET, FIDUCIAL_INSET),
+    (IMAGE_SIZE[0] - FIDUCIAL_INSET - FIDUCIAL_SIZE, FIDUCIAL_INSET),
+    (FIDUCIAL_INSET, IMAGE_SIZE[1] - FIDUCIAL_INSET - FIDUCIAL_SIZE),
+    (IMAGE_SIZE[0] - FIDUCIAL_INSET - FIDUCIAL_SIZE, IMAGE_SIZE[1] - FIDUCIAL_INSET - FIDUCIAL_SIZE),
+]
+FIDUCIAL_SEARCH_RADIUS = 200  # canvas px around each expected corner square
+FIDUCIAL_DARK_LEVEL = 128
+FIDUCIAL_LIGHT_LEVEL = 170  # the margin around a square must read as paper
+FIDUCIAL_MAX_RESIDUAL = 12.0  # canvas px; worse fits fall back to plain scaling
+FIDUCIAL_MAX_SHEAR = 0.03  # allowed departure from rotation + uniform scale
+QR_READ_MARGIN = 30  # canvas px of paper kept around the QR box when decoding it
+MARK_INNER_RADIUS = BUBBLE_RADIUS - 8  # sampled disk, clear of the 3px printed outline
+MARK_RING_RADII = (BUBBLE_RADIUS + 6, BUBBLE_RADIUS + 14)  # paper ring used as the local background
+MARK_SAMPLE_STEP = 2  # canvas px between sampled pixels; marks are far larger than this
+MARK_FILLED = "filled"
+MARK_BLANK = "blank"
+MARK_MULTI = "multi-mark"
+MARK_UNCERTAIN = "uncertain"
+MARK_STATUSES = [MARK_FILLED, MARK_BLANK, MARK_MULTI, MARK_UNCERTAIN]
+MARK_REVIEW = {MARK_MULTI, MARK_UNCERTAIN}
+MARK_FILLED_FILL = 0.4  # fill ratio at or above which a bubble counts as marked
+MARK_BLANK_FILL = 0.12  # darkest bubble below this: nothing was marked
+MARK_MIN_MARGIN = 0.25  # a filled answer must beat the runner-up by this much fill
+MARK_CONFIDENCE_SPAN = 0.2  # clearance past a threshold that counts as full confidence
+
+ENCODING_PNG = "png"
+ENCODING_PNG_1BIT = "png1"
+ENCODING_TIFF_G4 = "tiff-g4"
+IMAGE_ENCODINGS = [ENCODING_PNG, ENCODING_PNG_1BIT, ENCODING_TIFF_G4]
+EMIT_BASE64 = "base64"
+EMIT_PATH = "path"
+EMIT_FD = "fd"
+EMIT_MODES = [EMIT_BASE64, EMIT_PATH, EMIT_FD]
+RESULT_FORMAT_JSON = "json"
+RESULT_FORMAT_COMPACT = "compact"
+RESULT_FORMAT_MSGPACK = "msgpack"
+RESULT_FORMATS = [RESULT_FORMAT_JSON, RESULT_FORMAT_COMPACT, RESULT_FORMAT_MSGPACK]
+DOCUMENT_FORMATS = {".pdf": "pdf", ".tif": "tiff", ".tiff": "tiff"}  # output suffixes streamed as one document
+PRINT_DPI = 300  # IMAGE_SIZE is A4 at this resolution
+RENDERER_RASTER = "raster"
+RENDERER_VECTOR = "vector"
+RENDERERS = [RENDERER_RASTER, RENDERER_VECTOR]
+
+SHEET_CACHE_VERSION = 4
+EXAM_SPEC_VERSION = 2
+EXAM_SPEC_KEYS = ("questions", "questionCount", "template", "examName", "examId")  # payload keys that define an exam
+COMPILED_EXAM_LIMIT = 64  # compiled exam specs kept in memory per process
+SHEET_CACHE_MAX_MB = 256
+
+MODES = ["answerSheet", "questionSheet", "scoreCheck", "answerSheetBatch", "scoreBatch", "cohortGrade", "classPrint"]
+PRINT_SHEET_ANSWER = "answer"
+PRINT_SHEET_QUESTION = "question"
+PRINT_SHEETS = [PRINT_SHEET_ANSWER, PRINT_SHEET_QUESTION]
+SCAN_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+SCAN_REDUCTION_AUTO = "auto"
+SCAN_REDUCTIONS = [SCAN_REDUCTION_AUTO, "1", "2", "4", "8"]
+# Scans whose width is within this fraction of the canvas are sampled at canvas coordinates.
+SCAN_SCALE_TOLERANCE = 0.05
+SCORE_PROGRESS_INTERVAL = 1.0  # seconds between scoreBatch/classPrint progress lines on stderr
+# --page-ring slot size: room for pages up to twice the canvas width, which covers every
+# --scan-reduction auto result. Larger pages are decoded by the worker instead.
+PAGE_RING_SLOT_BYTES = 4 * IMAGE_SIZE[0] * IMAGE_SIZE[1]
+COHORT_GROUP_FRACTION = 0.27  # upper/lower group size for the discrimination index
+
+PROFILE_MEMORY = "memory"
+PROFILE_TIME = "time"
+PROFILES = [PROFILE_MEMORY, PROFILE_TIME]
+
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8765
+# Request keys that only make sense for the serving process itself.
+SERVE_RESERVED_KEYS = {
+    "serve",
+    "host",
+    "port",
+    "workers",
+    "payload",
+    "font_path",
+    "startup_report",
+    "pool",
+    "queue_size",
+    "queue_full",
+    "deadline_ms",
+    "cache_size_mb",
+    "cache_dir",
+    "serve_root",
+}
+# Request keys that name files or directories on the server; worker mode keeps them under --serve-root.
+SERVE_PATH_KEYS = {
+    "input",
+    "json",
+    "output",
+    "questions_output",
+    "scanned_sheet",
+    "student_ids",
+    "output_dir",
+    "archive",
+    "scans",
+    "exams",
+    "results_output",
+    "cohort",
+    "answer_key",
+    "exam_cache",
+    "profile_dump",
+}
+# Of those, keys that may also carry an inline value; they are paths only when they name an existing file.
+SERVE_INLINE_KEYS = {"json", "student_ids", "answer_key"}
+SERVE_POOL_PROCESS = "process"
+SERVE_POOL_THREAD = "thread"
+SERVE_POOLS = [SERVE_POOL_PROCESS, SERVE_POOL_THREAD]
+SERVE_QUEUE_WAIT = "wait"
+SERVE_QUEUE_REJECT = "reject"
+SERVE_QUEUE_POLICIES = [SERVE_QUEUE_WAIT, SERVE_QUEUE_REJECT]
+SERVE_QUEUE_PER_WORKER = 4  # default queue capacity per worker
+SERVE_LATENCY_WINDOW = 2048  # most recent jobs behind the /stats percentiles
+SERVE_DISCONNECT_POLL = 0.05  # seconds between checks for a caller that hung up mid-request
+SERVE_THREAD_UNSAFE_MODES = {"answerSheetBatch", "scoreBatch"}  # keep per-process state; process pool only
+
+
+class StageTimer:
+    """Exclusive wall/CPU time and tracemalloc peak per named stage of one request.
+
+    Nested stages are subtracted from their parent, so the stage times add up to the total.
+    """
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        import tracemalloc
+
+        self.tracemalloc = tracemalloc
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, float]] = {}
+        # Open stages: [name, wall start, cpu start, child wall, child cpu, peak bytes]
+        self.stack: List[List[Any]] = []
+        self.peak = 0
+        self.owns_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self.owns_tracing:
+            tracemalloc.start()
+        self.started_wall = time.perf_counter()
+        self.started_cpu = time.process_time()
+
+    def read_peak(self) -> int:
+        # Peak since the last read; resetting lets each stage see only its own high-water mark.
+        if not self.tracemalloc.is_tracing():
+            return 0
+        peak = self.tracemalloc.get_traced_memory()[1]
+        self.tracemalloc.reset_peak()
+        self.peak = max(self.peak, peak)
+        return peak
+
+    def enter(self, name: str) -> None:
+        peak = self.read_peak()
+        if self.stack:
+            self.stack[-1][5] = max(self.stack[-1][5], peak)
+        self.stack.append([name, time.perf_counter(), time.process_time(), 0.0, 0.0, 0])
+
+    def exit(self) -> None:
+        name, wall_start, cpu_start, child_wall, child_cpu, peak = self.stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        peak = max(peak, self.read_peak())
+        entry = self.stages.setdefault(name, {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0, "peak_kib": 0.0})
+        entry["calls"] += 1
+        entry["wall_ms"] += (wall - child_wall) * 1000
+        entry["cpu_ms"] += (cpu - child_cpu) * 1000
+        entry["peak_kib"] = max(entry["peak_kib"], peak / 1024)
+        if self.stack:
+            parent = self.stack[-1]
+            parent[3] += wall
+            parent[4] += cpu
+            parent[5] = max(parent[5], peak)
+
+    def report(self) -> Dict[str, Any]:
+        wall_ms = (time.perf_counter() - self.started_wall) * 1000
+        cpu_ms = (time.process_time() - self.started_cpu) * 1000
+        self.read_peak()
+        stages = sorted(self.stages.items(), key=lambda item: item[1]["wall_ms"], reverse=True)
+        skipped = set() if self.trace_memory else {"peak_kib"}
+        report: Dict[str, Any] = {
+            "wall_ms": round(wall_ms, 2),
+            "cpu_ms": round(cpu_ms, 2),
+            "unattributed_ms": round(wall_ms - sum(entry["wall_ms"] for _, entry in stages), 2),
+            "stages": {
+                name: {
+                    key: int(value) if key == "calls" else round(value, 2)
+                    for key, value in entry.items()
+                    if key not in skipped
+                }
+                for name, entry in stages
+            },
+        }
+        if self.trace_memory:
+            report["peak_kib"] = round(self.peak / 1024, 1)
+        return report
+
+    def close(self) -> None:
+        if self.owns_tracing:
+            self.tracemalloc.stop()
+
+
+_STAGE_TIMER: contextvars.ContextVar[StageTimer | None] = contextvars.ContextVar("stage_timer", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    # A no-op unless the current request runs with --profile.
+    timer = _STAGE_TIMER.get()
+    if timer is None:
+        yield
+        return
+    timer.enter(name)
+    try:
+        yield
+    finally:
+        timer.exit()
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of `stage` for functions that are a stage on their own."""
+
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _STAGE_TIMER.get() is None:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def request_profiling(args: argparse.Namespace, base_dir: Path) -> Iterator[StageTimer | None]:
+    """Per-request --profile stage timings and --profile-dump cProfile output."""
+    timer = StageTimer(trace_memory=args.profile != PROFILE_TIME) if args.profile else None
+    token = _STAGE_TIMER.set(timer)
+    profiler = None
+    if args.profile_dump:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield timer
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            dump_path = resolve_path(args.profile_dump, base_dir)
+            dump_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(dump_path))
+        _STAGE_TIMER.reset(token)
+        if timer is not None:
+            timer.close()
 
 
 def build_option_labels(options_per_question: int) -> List[str]:
@@ -78,23 +371,62 @@ def coerce_options(
     return options_order, options_map
 
 
-def load_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
-    # Try a few common fonts; fallback to default if unavailable.
-    candidates = [
-        "arial.ttf",
-        "DejaVuSans.ttf",
-        "LiberationSans-Regular.ttf",
-        "C:\\Windows\\Fonts\\arial.ttf",
-    ]
-    for path in candidates:
+_FONT_PATH_OVERRIDE = ""
+
+
+def configure_font_path(path: str) -> None:
+    global _FONT_PATH_OVERRIDE
+    if path == _FONT_PATH_OVERRIDE:
+        return
+    _FONT_PATH_OVERRIDE = path
+    resolve_font_path.cache_clear()
+    load_font.cache_clear()
+    text_width.cache_clear()
+    text_bbox.cache_clear()
+    font_ascent.cache_clear()
+    printed_bubble_fill.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_font_path() -> str | None:
+    configured = _FONT_PATH_OVERRIDE or os.environ.get(FONT_PATH_ENV, "")
+    if configured:
+        try:
+            return ImageFont.truetype(configured, BODY_FONT_SIZE).path
+        except OSError as exc:
+            raise SystemExit(f"Configured font could not be loaded: {configured} ({exc})") from exc
+    # Try a few common fonts once per process; fallback to default if unavailable.
+    for path in FONT_CANDIDATES:
         try:
-            return ImageFont.truetype(path, size)
+            return ImageFont.truetype(path, BODY_FONT_SIZE).path
         except OSError:
             continue
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+@timed("fonts")
+def load_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    path = resolve_font_path()
+    if path:
+        return ImageFont.truetype(path, size)
     return ImageFont.load_default()
 
 
-def build_qr(student_id: str, exam_id: str, size: int = 300) -> Image.Image:
+@functools.lru_cache(maxsize=None)
+@timed("imports")
+def load_cv2() -> Any:
+    # OpenCV is optional; detection falls back to Pillow when it is missing or broken.
+    try:
+        import cv2
+    except Exception:
+        return None
+    return cv2
+
+
+def make_sheet_qr(student_id: str, exam_id: str) -> Any:
+    import qrcode
+
     data = f"student={student_id};exam={exam_id}"
     qr = qrcode.QRCode(
         version=1,
@@ -104,10 +436,66 @@ def build_qr(student_id: str, exam_id: str, size: int = 300) -> Image.Image:
     )
     qr.add_data(data)
     qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white").convert("L")
+    return qr
+
+
+@timed("qr")
+def build_qr(student_id: str, exam_id: str, size: int = 300) -> Image.Image:
+    img = make_sheet_qr(student_id, exam_id).make_image(fill_color="black", back_color="white").convert("L")
     return img.resize((size, size), resample=Image.NEAREST)
 
 
+def parse_sheet_qr(text: str) -> Dict[str, str]:
+    # Inverse of build_qr: "student=<id>;exam=<id>".
+    return dict(part.split("=", 1) for part in text.split(";") if "=" in part)
+
+
+@functools.lru_cache(maxsize=None)
+def qr_detectors() -> Tuple[Any, ...]:
+    cv2 = load_cv2()
+    if cv2 is None:
+        return ()
+    detectors: List[Any] = [cv2.QRCodeDetector()]
+    if hasattr(cv2, "QRCodeDetectorAruco"):
+        detectors.append(cv2.QRCodeDetectorAruco())
+    return tuple(detectors)
+
+
+def read_sheet_qr(image: np.ndarray, alignment: Dict[str, Any] | None = None) -> Dict[str, str] | None:
+    """Decode the student/exam QR code from its box in the header only, never the whole page.
+
+    The box is mapped through the page alignment when there is one; without it a wider box
+    absorbs skew. OpenCV's detectors are
+    sensitive to how much margin surrounds the code, so the crop is tried as-is and padded
+    with paper, with each available detector, until one decodes.
+    """
+    import numpy as np
+
+    cv2 = load_cv2()
+    if cv2 is None:
+        return None
+    matrix = alignment.get("matrix") if alignment else None
+    margin = QR_READ_MARGIN if matrix is not None else 4 * QR_READ_MARGIN
+    left, top = QR_POS[0] - margin, QR_POS[1] - margin
+    right, bottom = QR_POS[0] + QR_SIZE + margin, QR_POS[1] + QR_SIZE + margin
+    corners = np.array([[left, top], [right, top], [left, bottom], [right, bottom]], dtype=np.float64)
+    scale = image.shape[1] / IMAGE_SIZE[0]
+    mapped = corners @ np.array(matrix)[:, :2].T + np.array(matrix)[:, 2] if matrix is not None else corners * scale
+    x0, y0 = np.maximum(np.floor(mapped.min(axis=0)).astype(int), 0)
+    x1, y1 = np.ceil(mapped.max(axis=0)).astype(int)
+    crop = np.ascontiguousarray(image[y0 : min(y1, image.shape[0]), x0 : min(x1, image.shape[1])])
+    if crop.size == 0:
+        return None
+    pad = max(1, round(QR_READ_MARGIN * scale))
+    padded = cv2.copyMakeBorder(crop, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=BACKGROUND_COLOR)
+    for candidate in (crop, padded):
+        for detector in qr_detectors():
+            text = detector.detectAndDecode(candidate)[0]
+            if text:
+                return parse_sheet_qr(text)
+    return None
+
+
 def draw_centered_text(draw: ImageDraw.ImageDraw, text: str, center: Tuple[int, int], font: ImageFont.ImageFont) -> None:
     bbox = draw.textbbox((0, 0), text, font=font)
     w = bbox[2] - bbox[0]
@@ -115,48 +503,410 @@ def draw_centered_text(draw: ImageDraw.ImageDraw, text: str, center: Tuple[int,
     draw.text((center[0] - w // 2, center[1] - h // 2), text, fill=0, font=font)
 
 
-def compute_bubble_positions(questions: List[Dict], fallback_order: List[str]) -> List[Dict]:
-    positions: List[Dict] = []
-    for idx, question in enumerate(questions):
-        options_order = question.get("options_order") or fallback_order or DEFAULT_OPTIONS_ORDER
+class RasterCanvas:
+    """Sheet drawing calls on a Pillow image. `VectorPage` takes the same calls and records them as PDF.
+
+    Coordinates are canvas pixels (IMAGE_SIZE, y down) and text is given by font size, so one
+    drawing routine lays out both backends identically.
+    """
+
+    def __init__(self, image: Image.Image) -> None:
+        self.image = image
+        self.draw = ImageDraw.Draw(image)
+
+    def rectangle(self, box: Sequence[Any], fill: int | None = None, outline: int | None = None, width: int = 1) -> None:
+        self.draw.rectangle(box, fill=fill, outline=outline, width=width)
+
+    def ellipse(self, box: Sequence[Any], fill: int | None = None, outline: int | None = None, width: int = 1) -> None:
+        self.draw.ellipse(box, fill=fill, outline=outline, width=width)
+
+    def line(self, points: Sequence[Tuple[float, float]], width: int = 1) -> None:
+        self.draw.line(points, fill=0, width=width)
+
+    def text(self, xy: Tuple[float, float], text: str, size: int) -> None:
+        self.draw.text(xy, text, fill=0, font=load_font(size))
+
+    def text_length(self, text: str, size: int) -> float:
+        return self.draw.textlength(text, font=load_font(size))
+
+    def centered_text(self, text: str, center: Tuple[int, int], size: int) -> None:
+        draw_centered_text(self.draw, text, center, load_font(size))
+
+    def qr(self, student_id: str, exam_id: str) -> None:
+        self.image.paste(build_qr(student_id, exam_id, size=QR_SIZE), QR_POS)
+
+
+def sheet_canvas(page: "Image.Image | VectorPage") -> "RasterCanvas | VectorPage":
+    return page if isinstance(page, VectorPage) else RasterCanvas(page)
+
+
+def draw_bubble(canvas: "RasterCanvas | VectorPage", option: str, center: Tuple[int, int]) -> None:
+    x, y_center = center
+    bbox = [
+        x - BUBBLE_RADIUS,
+        y_center - BUBBLE_RADIUS,
+        x + BUBBLE_RADIUS,
+        y_center + BUBBLE_RADIUS,
+    ]
+    canvas.ellipse(bbox, outline=0, width=3)
+    canvas.centered_text(option, (x, y_center), BODY_FONT_SIZE)
+
+
+@dataclass(frozen=True)
+class BubbleGrid:
+    """Bubble centres of an exam as (questions x options) int32 grids with a validity mask.
+
+    The coordinates live in stdlib arrays (row-major, padded to the widest question) so
+    drawing a sheet never imports numpy; detection reads them through zero-copy numpy views.
+    """
+
+    options: Tuple[Tuple[str, ...], ...]  # option labels per question, in column order
+    width: int  # options in the widest question
+    centre_x: array  # int32 bubble centre x per question/option
+    centre_y: array  # int32 bubble centre y per question/option
+    mask: array  # 1 where the question has that option, 0 in the padding
+    page_index: array  # int32 page per question
+    label_x: array  # int32 top-left of the question number per question
+    label_y: array
+
+    @property
+    def page_count(self) -> int:
+        return max(self.page_index, default=0) + 1
+
+    def centre(self, question: int, column: int) -> Tuple[int, int]:
+        cell = question * self.width + column
+        return self.centre_x[cell], self.centre_y[cell]
+
+    def on_page(self, page: int) -> List[int]:
+        return [question for question, index in enumerate(self.page_index) if index == page]
+
+    def _view(self, values: array, dtype: Any, shape: Tuple[int, ...]) -> np.ndarray:
+        import numpy as np
+
+        view = np.frombuffer(values, dtype=dtype).reshape(shape)
+        view.flags.writeable = False
+        return view
+
+    @property
+    def xs(self) -> np.ndarray:
+        return self._view(self.centre_x, "int32", (len(self.options), self.width))
+
+    @property
+    def ys(self) -> np.ndarray:
+        return self._view(self.centre_y, "int32", (len(self.options), self.width))
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self._view(self.mask, "bool", (len(self.options), self.width))
+
+    @property
+    def pages(self) -> np.ndarray:
+        return self._view(self.page_index, "int32", (len(self.options),))
+
+
+@functools.lru_cache(maxsize=64)
+def layout_bubble_grid(options_key: Tuple[Tuple[str, ...], ...], layout: str = LAYOUT_CLASSIC) -> BubbleGrid:
+    """Bubble centres, question-number anchor and page index for every question.
+
+    `classic` keeps one question per row (the original sheet geometry) and starts a new page
+    once the rows reach the bottom margin. `dense` packs questions into as many columns as
+    the widest question allows, filling each column top to bottom before moving right.
+    Placement only depends on each question's option labels, so identical exams share one grid.
+    """
+    if layout not in LAYOUTS:
+        raise SystemExit(f"Unsupported layout: {layout}. Choose one of: {', '.join(LAYOUTS)}.")
+    width = max((len(order) for order in options_key), default=0)
+    grid = BubbleGrid(
+        options=options_key,
+        width=width,
+        centre_x=array("i", bytes(4 * width * len(options_key))),
+        centre_y=array("i", bytes(4 * width * len(options_key))),
+        mask=array("b", bytes(width * len(options_key))),
+        page_index=array("i"),
+        label_x=array("i"),
+        label_y=array("i"),
+    )
+
+    def place(question: int, page: int, label: Tuple[int, int], first_x: int, spacing: int, y: int) -> None:
+        grid.page_index.append(page)
+        grid.label_x.append(label[0])
+        grid.label_y.append(label[1])
+        for column in range(len(options_key[question])):
+            cell = question * width + column
+            grid.centre_x[cell] = first_x + column * spacing
+            grid.centre_y[cell] = y
+            grid.mask[cell] = 1
+
+    last_row_y = IMAGE_SIZE[1] - PAGE_BOTTOM_MARGIN - BUBBLE_RADIUS
+    if layout == LAYOUT_CLASSIC:
+        rows_per_page = max(1, (last_row_y - QUESTION_START_Y) // LINE_SPACING + 1)
         available_width = IMAGE_SIZE[0] - FIRST_OPTION_X - 200
-        option_spacing = OPTION_SPACING_X if len(options_order) > 1 else 0
-        if len(options_order) > 1:
-            option_spacing = min(OPTION_SPACING_X, max(90, available_width // (len(options_order) - 1)))
+        for idx, options_order in enumerate(options_key):
+            option_spacing = OPTION_SPACING_X if len(options_order) > 1 else 0
+            if len(options_order) > 1:
+                option_spacing = min(OPTION_SPACING_X, max(90, available_width // (len(options_order) - 1)))
+            page, row = divmod(idx, rows_per_page)
+            y = QUESTION_START_Y + row * LINE_SPACING
+            place(idx, page, (QUESTION_NUMBER_OFFSET_X, y - BUBBLE_RADIUS), FIRST_OPTION_X, option_spacing, y)
+        return grid
+
+    usable_width = IMAGE_SIZE[0] - 2 * PAGE_MARGIN_X
+    max_options = width or 1
+    option_spacing = DENSE_OPTION_SPACING
+    if DENSE_LABEL_WIDTH + max_options * option_spacing > usable_width:
+        # Very wide questions: squeeze the bubbles (never closer than touching) into one column.
+        option_spacing = max(2 * BUBBLE_RADIUS + 6, (usable_width - DENSE_LABEL_WIDTH) // max_options)
+    cell_width = DENSE_LABEL_WIDTH + max_options * option_spacing
+    columns = max(1, (usable_width + DENSE_COLUMN_GAP) // (cell_width + DENSE_COLUMN_GAP))
+    rows = max(1, (last_row_y - QUESTION_START_Y) // DENSE_ROW_SPACING + 1)
+    per_page = columns * rows
+    for idx in range(len(options_key)):
+        page, slot = divmod(idx, per_page)
+        column, row = divmod(slot, rows)
+        column_x = PAGE_MARGIN_X + column * (cell_width + DENSE_COLUMN_GAP)
+        y = QUESTION_START_Y + row * DENSE_ROW_SPACING
+        place(idx, page, (column_x, y - BUBBLE_RADIUS), column_x + DENSE_LABEL_WIDTH + BUBBLE_RADIUS, option_spacing, y)
+    return grid
+
+
+@dataclass
+class Question:
+    """One exam question, normalised once from whichever payload shape it arrived in."""
+
+    __slots__ = ("id", "number", "text", "options", "options_order", "correct")
+    id: Any
+    number: Any  # as printed on the sheets ("Q{number})")
+    text: str
+    options: Dict[str, Any]
+    options_order: Tuple[str, ...]
+    correct: str | None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "number": self.number,
+            "text": self.text,
+            "options": self.options,
+            "options_order": list(self.options_order),
+            "correct": self.correct,
+        }
+
+
+@dataclass
+class Exam:
+    """Everything a run needs to know about an exam, built once by `build_run_config`.
+
+    Every stage reads this; dicts only reappear where results are written out.
+    """
+
+    __slots__ = (
+        "name",
+        "exam_id",
+        "template_name",
+        "layout",
+        "options_order",
+        "questions",
+        "correct_answers",
+        "question_numbers",
+        "grid",
+    )
+    name: str
+    exam_id: str
+    template_name: str
+    layout: str
+    options_order: Tuple[str, ...]  # the template's labels, shown in the sheet header
+    questions: Tuple[Question, ...]
+    correct_answers: List[str] | None  # None when the payload carries no answer key
+    question_numbers: List[int]
+    grid: BubbleGrid
+
+
+def compile_exam(
+    questions: Sequence[Question],
+    options_order: Sequence[str],
+    name: str,
+    exam_id: str,
+    template_name: str,
+    layout: str,
+    correct_answers: List[str] | None = None,
+) -> Exam:
+    if layout not in LAYOUTS:
+        raise SystemExit(f"Unsupported layout: {layout}. Choose one of: {', '.join(LAYOUTS)}.")
+    if not questions:
+        raise SystemExit("No questions provided in the input.")
+    question_numbers: List[int] = []
+    for idx, question in enumerate(questions):
+        try:
+            question_numbers.append(int(question.number))
+        except (TypeError, ValueError):
+            question_numbers.append(idx + 1)
+    return Exam(
+        name=name,
+        exam_id=exam_id,
+        template_name=template_name,
+        layout=layout,
+        options_order=tuple(options_order),
+        questions=tuple(questions),
+        correct_answers=correct_answers,
+        question_numbers=question_numbers,
+        grid=layout_bubble_grid(tuple(question.options_order for question in questions), layout),
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def disk_offsets(outer: float, inner: float = 0.0, step: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """(dy, dx) of the lattice points with `inner <= distance < outer` from a bubble centre."""
+    import numpy as np
+
+    span = np.arange(-int(outer), int(outer) + 1, step, dtype=np.intp)
+    dy, dx = np.meshgrid(span, span, indexing="ij")
+    distance = np.hypot(dy, dx)
+    keep = (distance >= inner) & (distance < outer)
+    return dy[keep], dx[keep]
+
+
+def sample_masked_means(
+    image: np.ndarray, xs: np.ndarray, ys: np.ndarray, offsets: Tuple[np.ndarray, np.ndarray]
+) -> np.ndarray:
+    """Mean intensity of the `offsets` mask around every bubble, in one gather.
+
+    Mask pixels outside the image are left out; masks that fall fully outside read as blank
+    paper (255).
+    """
+    import numpy as np
+
+    dy, dx = offsets
+    height, width = image.shape
+    xs = xs.astype(np.intp)
+    ys = ys.astype(np.intp)
+    if dy.size and xs.size and (
+        ys.min() + dy.min() >= 0
+        and ys.max() + dy.max() < height
+        and xs.min() + dx.min() >= 0
+        and xs.max() + dx.max() < width
+    ):
+        # Fast path: every mask is inside the page, so gather all of them from the flat buffer at once.
+        flat = np.ascontiguousarray(image).reshape(-1)
+        samples = flat[(ys * width + xs)[:, :, None] + (dy * width + dx)]  # (Q, O, N)
+        return samples.sum(axis=2, dtype=np.int64) / float(dy.size)
+
+    rows = ys[:, :, None] + dy  # (Q, O, N)
+    cols = xs[:, :, None] + dx
+    inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    samples = image[np.clip(rows, 0, max(height - 1, 0)), np.clip(cols, 0, max(width - 1, 0))]
+    totals = np.where(inside, samples, 0).sum(axis=2, dtype=np.int64)
+    counts = inside.sum(axis=2)
+    means = np.full(totals.shape, 255.0)
+    np.divide(totals, counts, out=means, where=counts > 0)
+    return means
+
+
+def sample_bubbles(image: np.ndarray, xs: np.ndarray, ys: np.ndarray, scale: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean intensity inside every bubble and of the paper ring just outside it.
+
+    The inner disk stops short of the printed outline and the ring stays clear of neighbouring
+    bubbles, so the pair gives a fill level measured against the local background.
+    """
+    step = MARK_SAMPLE_STEP if MARK_INNER_RADIUS * scale >= 4 * MARK_SAMPLE_STEP else 1
+    inner = disk_offsets(round(MARK_INNER_RADIUS * scale, 1), 0.0, step)
+    ring = disk_offsets(round(MARK_RING_RADII[1] * scale, 1), round(MARK_RING_RADII[0] * scale, 1), step)
+    return sample_masked_means(image, xs, ys, inner), sample_masked_means(image, xs, ys, ring)
+
+
+@functools.lru_cache(maxsize=256)
+def printed_bubble_fill(option: str) -> float:
+    """Fill ratio an unmarked bubble reads as, because of the option letter printed inside it."""
+    import numpy as np
+
+    size = 2 * MARK_RING_RADII[1] + 2
+    image = Image.new("L", (size, size), BACKGROUND_COLOR)
+    draw_bubble(RasterCanvas(image), option, (size // 2, size // 2))
+    center = np.array([[size // 2]])
+    inner, _ = sample_bubbles(np.asarray(image), center, center)
+    return float(1 - inner[0, 0] / BACKGROUND_COLOR)
+
+
+def bubble_fill(
+    means: np.ndarray, background: np.ndarray, valid: np.ndarray, options: Sequence[Sequence[str]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Fill ratio per bubble from `sample_bubbles` output, plus the paper level per question.
+
+    The paper level is the brightest ring around the question's bubbles, so a stray mark next to
+    one bubble does not lower it. Darkness is measured against it, then the printed letter's own
+    darkness is taken out, so an untouched bubble reads 0 and a solid mark about 1.
+    """
+    import numpy as np
+
+    paper = np.where(valid, background, 0.0).max(axis=1, keepdims=True)
+    printed = np.array([[printed_bubble_fill(option) for option in order] + [0.0] * (means.shape[1] - len(order)) for order in options])
+    darkness = (paper - means) / np.maximum(paper, 1.0)
+    return np.clip((darkness - printed) / (1 - printed), 0.0, 1.0), paper[:, 0]
+
+
+def classify_marks(
+    fill: np.ndarray, valid: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per question: index of the darkest bubble, a MARK_STATUSES index and a 0..1 confidence.
+
+    `fill` is the (questions x options) fill ratio. A question is filled when its darkest
+    bubble is marked and clearly ahead of the runner-up, blank when nothing is marked,
+    multi-mark when two bubbles are marked, and uncertain otherwise (faint marks, erasures).
+    Confidence is how far the deciding statistic clears its threshold: a completely empty
+    question is a fully confident blank, marks saturate MARK_CONFIDENCE_SPAN past theirs, and
+    uncertain questions are always 0.
+    """
+    import numpy as np
+
+    fill = np.where(valid, fill, -1.0)
+    order = np.argsort(-fill, axis=1, kind="stable")
+    best = order[:, 0]
+    rows = np.arange(fill.shape[0])
+    first = fill[rows, best]
+    second = fill[rows, order[:, 1]] if fill.shape[1] > 1 else np.full(first.shape, -1.0)
+    margin = first - np.maximum(second, 0.0)
 
-        y = QUESTION_START_Y + idx * LINE_SPACING
-        bubbles: Dict[str, Tuple[int, int]] = {}
-        for option_index, option in enumerate(options_order):
-            x = FIRST_OPTION_X + option_index * option_spacing
-            bubbles[option] = (x, y)
-        positions.append({"question_id": idx + 1, "bubbles": bubbles})
-    return positions
+    blank = first < MARK_BLANK_FILL
+    multi = ~blank & (second >= MARK_FILLED_FILL)
+    filled = ~blank & ~multi & (first >= MARK_FILLED_FILL) & (margin >= MARK_MIN_MARGIN)
+    status = np.select([filled, blank, multi], [0, 1, 2], default=3)
+    clearance = np.select(
+        [filled, blank, multi],
+        [
+            np.minimum(first - MARK_FILLED_FILL, margin - MARK_MIN_MARGIN) / MARK_CONFIDENCE_SPAN,
+            (MARK_BLANK_FILL - first) / MARK_BLANK_FILL,
+            (second - MARK_FILLED_FILL) / MARK_CONFIDENCE_SPAN,
+        ],
+        default=0.0,
+    )
+    confidence = np.clip(clearance, 0.0, 1.0)
+    return best, status, confidence
 
 
-def build_default_questions(num_questions: int, options_order: List[str]) -> List[Dict]:
-    questions: List[Dict] = []
+def build_default_questions(num_questions: int, options_order: Sequence[str]) -> List[Question]:
+    questions: List[Question] = []
     for idx in range(num_questions):
         q_id = idx + 1
         options = {opt: f"Option {opt}{q_id}" for opt in options_order}
         correct = options_order[0] if options_order else "A"
         questions.append(
-            {
-                "id": q_id,
-                "number": q_id,
-                "questionNumber": q_id,
-                "text": f"Dummy Question {q_id}",
-                "options": options,
-                "options_order": options_order,
-                "correct": correct,
-            }
+            Question(
+                id=q_id,
+                number=q_id,
+                text=f"Dummy Question {q_id}",
+                options=options,
+                options_order=tuple(options_order),
+                correct=correct,
+            )
         )
     return questions
 
 
+@timed("parse_payload")
 def load_exam_payload(raw_input: str, base_dir: Path) -> Any:
     candidate_paths = [Path(raw_input), base_dir / raw_input]
     for path in candidate_paths:
-        if path.exists():
+        # os.path.isfile, unlike Path.exists, returns False for inline JSON too long to be a file name.
+        if os.path.isfile(path):
             with path.open("r", encoding="utf-8-sig") as handle:
                 return json.load(handle)
     try:
@@ -167,34 +917,37 @@ def load_exam_payload(raw_input: str, base_dir: Path) -> Any:
         ) from exc
 
 
-def build_run_config(payload: Any) -> Tuple[List[Dict], List[str], Dict[str, str], List[str] | None]:
+@timed("build_run_config")
+def build_run_config(payload: Any, layout_override: str = "") -> Exam:
     # Figure out template defaults up-front
     template = payload.get("template", {}) if isinstance(payload, dict) else {}
     template_options_count = int(template.get("optionsPerQuestion", 0)) if template else 0
     template_options_order = build_option_labels(template_options_count) if template_options_count > 0 else None
 
-    def normalize_questions(raw_questions: List[Dict]) -> List[Dict]:
-        normalized: List[Dict] = []
+    def normalize_questions(raw_questions: List[Dict]) -> List[Question]:
+        normalized: List[Question] = []
         for idx, qraw in enumerate(raw_questions):
             q_id = qraw.get("id") or idx + 1
             question_number = qraw.get("questionNumber") or qraw.get("number") or q_id
-            text = qraw.get("text", f"Question {question_number}")
             options_order, options_map = coerce_options(
                 qraw.get("options") or qraw.get("option") or {}, template_options_order
             )
             normalized.append(
-                {
-                    "id": q_id,
-                    "number": question_number,
-                    "questionNumber": question_number,
-                    "text": text,
-                    "options": options_map,
-                    "options_order": options_order,
-                    "correct": qraw.get("correct"),
-                }
+                Question(
+                    id=q_id,
+                    number=question_number,
+                    text=qraw.get("text", f"Question {question_number}"),
+                    options=options_map,
+                    options_order=tuple(options_order),
+                    correct=qraw.get("correct"),
+                )
             )
         return normalized
 
+    def answer_key(questions: List[Question]) -> List[str] | None:
+        correct_answers = [question.correct for question in questions]
+        return correct_answers if any(correct_answers) else None
+
     # New exam spec format with explicit questions array
     if isinstance(payload, dict) and "questions" in payload:
         questions_raw = payload.get("questions") or []
@@ -207,16 +960,15 @@ def build_run_config(payload: Any) -> Tuple[List[Dict], List[str], Dict[str, str
             fallback_order = template_options_order or DEFAULT_OPTIONS_ORDER
             questions = build_default_questions(question_count, fallback_order)
 
-        options_order = template_options_order or (questions[0].get("options_order") if questions else DEFAULT_OPTIONS_ORDER)
-        meta = {
-            "exam_name": payload.get("examName", HEADER_TITLE),
-            "exam_id": payload.get("examId", EXAM_ID),
-            "template_name": template.get("name", "Template"),
-        }
-        correct_answers = [q.get("correct") for q in questions]
-        if not any(correct_answers):
-            correct_answers = None
-        return questions, options_order, meta, correct_answers
+        return compile_exam(
+            questions,
+            template_options_order or (questions[0].options_order if questions else DEFAULT_OPTIONS_ORDER),
+            payload.get("examName", HEADER_TITLE),
+            payload.get("examId", EXAM_ID),
+            template.get("name", "Template"),
+            layout_override or template.get("layout") or LAYOUT_CLASSIC,
+            answer_key(questions),
+        )
 
     # Legacy exam spec (questionCount + template only)
     if isinstance(payload, dict) and payload.get("questionCount") is not None:
@@ -225,328 +977,1681 @@ def build_run_config(payload: Any) -> Tuple[List[Dict], List[str], Dict[str, str
             raise SystemExit("questionCount must be a positive integer.")
 
         options_order = template_options_order or DEFAULT_OPTIONS_ORDER
-        questions = build_default_questions(question_count, options_order)
-        meta = {
-            "exam_name": payload.get("examName", HEADER_TITLE),
-            "exam_id": payload.get("examId", EXAM_ID),
-            "template_name": template.get("name", "Template"),
-        }
-        return questions, options_order, meta, None
+        return compile_exam(
+            build_default_questions(question_count, options_order),
+            options_order,
+            payload.get("examName", HEADER_TITLE),
+            payload.get("examId", EXAM_ID),
+            template.get("name", "Template"),
+            layout_override or template.get("layout") or LAYOUT_CLASSIC,
+        )
 
     # List-of-questions format (legacy questions.json)
     if isinstance(payload, list):
         questions = normalize_questions(payload)
-        options_order = questions[0].get("options_order") if questions else DEFAULT_OPTIONS_ORDER
-        meta = {
-            "exam_name": HEADER_TITLE,
-            "exam_id": EXAM_ID,
-            "template_name": "questions.json",
-        }
-        correct_answers = [q.get("correct") for q in questions]
-        if not any(correct_answers):
-            correct_answers = None
-        return questions, options_order, meta, correct_answers
+        return compile_exam(
+            questions,
+            questions[0].options_order if questions else DEFAULT_OPTIONS_ORDER,
+            HEADER_TITLE,
+            EXAM_ID,
+            "questions.json",
+            layout_override or LAYOUT_CLASSIC,
+            answer_key(questions),
+        )
 
     raise SystemExit(
         "Unsupported exam payload. Provide either an object with questionCount/template(+questions) or a list of questions."
     )
 
 
-def derive_question_numbers(questions: List[Dict]) -> List[int]:
-    numbers: List[int] = []
-    for idx, question in enumerate(questions):
-        candidate = question.get("questionNumber") or question.get("number") or idx + 1
-        try:
-            numbers.append(int(candidate))
-        except (TypeError, ValueError):
-            numbers.append(idx + 1)
-    return numbers
-
-
-def generate_sheet(
-    questions: List[Dict],
-    header_options_order: List[str],
-    exam_name: str,
-    exam_id: str,
-    template_name: str,
-    student_id: str,
-    image_path: Path | None = None,
-    fill_random: bool = False,
-) -> Tuple[List[str], List[Dict], Image.Image]:
-    positions = compute_bubble_positions(questions, header_options_order)
-    image = Image.new("L", IMAGE_SIZE, BACKGROUND_COLOR)
-    draw = ImageDraw.Draw(image)
-    header_font = load_font(HEADER_FONT_SIZE)
-    body_font = load_font(BODY_FONT_SIZE)
-    small_font = load_font(SMALL_FONT_SIZE)
+def draw_answer_sheet_base(canvas: "RasterCanvas | VectorPage", exam: Exam, page: int = 0) -> None:
+    # Everything on one answer sheet page that does not depend on the student.
+    for x0, y0 in FIDUCIAL_ORIGINS:
+        canvas.rectangle([(x0, y0), (x0 + FIDUCIAL_SIZE - 1, y0 + FIDUCIAL_SIZE - 1)], fill=0)
 
     # Header block
     header_bottom = 420
-    draw.rectangle(
+    canvas.rectangle(
         [(120, 60), (IMAGE_SIZE[0] - 120, header_bottom)], outline=0, width=4
     )
-    draw.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] - 70), SCHOOL_NAME, fill=0, font=body_font)
-    draw.text(HEADER_TITLE_POS, exam_name, fill=0, font=header_font)
-    draw.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 80), f"Exam ID: {exam_id}", fill=0, font=body_font)
-    draw.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 140), f"Student ID: {student_id}", fill=0, font=body_font)
-    draw.text(
+    canvas.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] - 70), SCHOOL_NAME, BODY_FONT_SIZE)
+    canvas.text(HEADER_TITLE_POS, exam.name, HEADER_FONT_SIZE)
+    canvas.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 80), f"Exam ID: {exam.exam_id}", BODY_FONT_SIZE)
+    canvas.text(
         (HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 200),
-        f"Template: {template_name} ({len(header_options_order)} options)",
-        fill=0,
-        font=body_font,
+        f"Template: {exam.template_name} ({len(exam.options_order)} options)",
+        BODY_FONT_SIZE,
     )
 
-    # QR code on the right
-    qr_img = build_qr(student_id, exam_id, size=320)
-    qr_pos = (IMAGE_SIZE[0] - qr_img.width - 180, 80)
-    image.paste(qr_img, qr_pos)
-    draw.text((qr_pos[0], qr_pos[1] + qr_img.height + 10), "Scan for exam + student", fill=0, font=small_font)
+    # QR code on the right (the code itself is stamped per student)
+    canvas.text((QR_POS[0], QR_POS[1] + QR_SIZE + 10), "Scan for exam + student", SMALL_FONT_SIZE)
     # Separator line to keep header distinct from questions
-    draw.line([(120, header_bottom), (IMAGE_SIZE[0] - 120, header_bottom)], fill=0, width=3)
-
-    student_answers: List[str] = []
-    for question, position in zip(questions, positions):
-        y = list(position["bubbles"].values())[0][1]
-        display_number = question.get("questionNumber", question.get("number", question["id"]))
-        draw.text((QUESTION_NUMBER_OFFSET_X, y - BUBBLE_RADIUS), f"Q{display_number})", fill=0, font=body_font)
-
-        options_order = question.get("options_order") or header_options_order
-
-        chosen = random.choice(options_order) if fill_random else ""
-        student_answers.append(chosen)
-
-        for option in options_order:
-            x, y_center = position["bubbles"][option]
-            bbox = [
-                x - BUBBLE_RADIUS,
-                y_center - BUBBLE_RADIUS,
-                x + BUBBLE_RADIUS,
-                y_center + BUBBLE_RADIUS,
-            ]
-            draw.ellipse(bbox, outline=0, width=3)
-            draw_centered_text(draw, option, (x, y_center), body_font)
-            if fill_random and option == chosen:
-                draw.ellipse(bbox, fill=0, outline=0)
+    canvas.line([(120, header_bottom), (IMAGE_SIZE[0] - 120, header_bottom)], width=3)
+    grid = exam.grid
+    if grid.page_count > 1:
+        page_label = f"Page {page + 1} of {grid.page_count}"
+        canvas.text((IMAGE_SIZE[0] - 120 - canvas.text_length(page_label, SMALL_FONT_SIZE), 20), page_label, SMALL_FONT_SIZE)
 
-    if image_path:
-        image.save(image_path)
-    return student_answers, positions, image
+    for idx in grid.on_page(page):
+        label = (grid.label_x[idx], grid.label_y[idx])
+        canvas.text(label, f"Q{exam.questions[idx].number})", BODY_FONT_SIZE)
+        for column, option in enumerate(grid.options[idx]):
+            draw_bubble(canvas, option, grid.centre(idx, column))
 
 
-def generate_question_sheet(
-    questions: List[Dict],
-    header_options_order: List[str],
-    exam_name: str,
-    exam_id: str,
-    template_name: str,
-    student_id: str,
-    image_path: Path | None = None,
-) -> Tuple[List[Dict], Image.Image]:
+@timed("draw")
+def render_answer_sheet_base(exam: Exam, page: int = 0) -> Image.Image:
     image = Image.new("L", IMAGE_SIZE, BACKGROUND_COLOR)
-    draw = ImageDraw.Draw(image)
-    header_font = load_font(HEADER_FONT_SIZE)
-    body_font = load_font(BODY_FONT_SIZE)
-    small_font = load_font(SMALL_FONT_SIZE)
+    draw_answer_sheet_base(RasterCanvas(image), exam, page)
+    return image
 
-    header_bottom = 420
-    draw.rectangle(
-        [(120, 60), (IMAGE_SIZE[0] - 120, header_bottom)], outline=0, width=4
-    )
-    draw.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] - 70), SCHOOL_NAME, fill=0, font=body_font)
-    draw.text(HEADER_TITLE_POS, exam_name, fill=0, font=header_font)
-    draw.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 80), f"Exam ID: {exam_id}", fill=0, font=body_font)
-    draw.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 140), f"Student ID: {student_id}", fill=0, font=body_font)
-    draw.text(
-        (HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 200),
-        f"Template: {template_name} ({len(header_options_order)} options)",
-        fill=0,
-        font=body_font,
-    )
-    draw.text(
-        (HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 260),
-        "Question Sheet (with text + options)",
-        fill=0,
-        font=small_font,
-    )
 
-    qr_img = build_qr(student_id, exam_id, size=320)
-    qr_pos = (IMAGE_SIZE[0] - qr_img.width - 180, 80)
-    image.paste(qr_img, qr_pos)
-    draw.text((qr_pos[0], qr_pos[1] + qr_img.height + 10), "Scan for exam + student", fill=0, font=small_font)
-    draw.line([(120, header_bottom), (IMAGE_SIZE[0] - 120, header_bottom)], fill=0, width=3)
+@timed("draw")
+def stamp_student_header(image: "Image.Image | VectorPage", student_id: str, exam_id: str) -> None:
+    canvas = sheet_canvas(image)
+    canvas.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 140), f"Student ID: {student_id}", BODY_FONT_SIZE)
+    canvas.qr(student_id, exam_id)
 
-    records: List[Dict] = []
 
-    current_y = QUESTION_START_Y
-    line_height = max(BODY_FONT_SIZE, SMALL_FONT_SIZE) + 6
-    usable_width = IMAGE_SIZE[0] - QUESTION_TEXT_X - 240
-    column_width = (usable_width - OPTION_COLUMN_GAP) // 2
-    left_column_x = QUESTION_TEXT_X
-    right_column_x = left_column_x + column_width + OPTION_COLUMN_GAP
+@timed("draw")
+def mark_random_answers(pages: "List[Image.Image] | List[VectorPage]", grid: BubbleGrid) -> List[str]:
+    canvases = [sheet_canvas(page) for page in pages]
+    student_answers: List[str] = []
+    for idx, options_order in enumerate(grid.options):
+        column = random.randrange(len(options_order))
+        student_answers.append(options_order[column])
+        x, y_center = grid.centre(idx, column)
+        bbox = [
+            x - BUBBLE_RADIUS,
+            y_center - BUBBLE_RADIUS,
+            x + BUBBLE_RADIUS,
+            y_center + BUBBLE_RADIUS,
+        ]
+        canvases[grid.page_index[idx]].ellipse(bbox, fill=0, outline=0)
+    return student_answers
 
-    for question in questions:
-        display_number = question.get("questionNumber", question.get("number", question["id"]))
-        draw.text((QUESTION_NUMBER_OFFSET_X, current_y), f"Q{display_number})", fill=0, font=body_font)
-
-        options_order = question.get("options_order") or header_options_order
-
-        # Only render question text + options (no bubbles) on the question sheet.
-        question_text_lines = textwrap.wrap(str(question.get("text", "")), width=TEXT_WRAP_WIDTH)
-        option_values = []
-        for label in options_order:
-            opt_val = question.get("options", {}).get(label, "")
-            if isinstance(opt_val, dict) and "text" in opt_val:
-                option_values.append(str(opt_val["text"]))
-            elif isinstance(opt_val, dict):
-                option_values.append(str(opt_val.get("value") or opt_val.get("label") or ""))
-            else:
-                option_values.append(str(opt_val))
-        option_blocks: List[List[str]] = []
-        for idx, value in enumerate(option_values):
-            heading = f"Option {idx + 1}: "
-            wrapped = textwrap.wrap(value, width=OPTION_WRAP_WIDTH) or [""]
-            block_lines: List[str] = []
-            for line_idx, line in enumerate(wrapped):
-                prefix = heading if line_idx == 0 else " " * len(heading)
-                block_lines.append(prefix + line)
-            option_blocks.append(block_lines)
-
-        text_y = current_y
-        for line in question_text_lines:
-            draw.text((QUESTION_TEXT_X, text_y), line, fill=0, font=body_font)
-            text_y += line_height
 
-        option_lines: List[str] = []
-        for block_idx in range(0, len(option_blocks), 2):
-            left_block = option_blocks[block_idx]
-            right_block = option_blocks[block_idx + 1] if block_idx + 1 < len(option_blocks) else []
-            max_lines = max(len(left_block), len(right_block))
-            for row in range(max_lines):
-                left_line = left_block[row] if row < len(left_block) else ""
-                right_line = right_block[row] if row < len(right_block) else ""
-                if left_line:
-                    draw.text((left_column_x, text_y), left_line, fill=0, font=small_font)
-                if right_line:
-                    draw.text((right_column_x, text_y), right_line, fill=0, font=small_font)
-                combined_line = left_line
-                if right_line:
-                    combined_line = (combined_line + "    " if combined_line else "") + right_line
-                if combined_line:
-                    option_lines.append(combined_line)
-                elif left_line or right_line:
-                    option_lines.append(left_line or right_line)
-                else:
-                    option_lines.append("")
-                text_y += line_height
+def page_output_path(path: Path, page: int) -> Path:
+    # Page 1 keeps the requested name so single-page callers see no difference.
+    return path if page == 0 else path.with_name(f"{path.stem}_p{page + 1}{path.suffix}")
 
-        records.append(
-            {
-                "question_id": question["id"],
-                "options_order": options_order,
-                "question_text": question.get("text", ""),
-                "options_text": option_lines,
-            }
-        )
 
-        current_y = text_y + 20  # margin between questions
+class SheetBaseCache:
+    """Size-bounded LRU of rendered student-independent sheet layers, optionally mirrored to disk."""
 
-    if image_path:
-        image.save(image_path)
-    return records, image
+    def __init__(self, max_bytes: int = SHEET_CACHE_MAX_MB * 1024 * 1024, directory: Path | None = None) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries: "OrderedDict[str, Tuple[Any, Image.Image]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Worker mode with a thread pool renders from several threads; rendering itself runs unlocked.
+        self.lock = threading.Lock()
+        # Per-request hit/miss tally; the totals above are shared by every request in the process.
+        self.request_counts: contextvars.ContextVar[Dict[str, int] | None] = contextvars.ContextVar(
+            "sheet_cache_counts", default=None
+        )
 
+    def configure(self, max_bytes: int, directory: Path | None) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        if directory:
+            directory.mkdir(parents=True, exist_ok=True)
+        self.evict()
 
-def detect_answers(
-    image_source: Path | Image.Image | np.ndarray,
-    questions: List[Dict],
-    header_options_order: List[str],
-    region_size: int = 20,
-    question_numbers: List[int] | None = None,
-) -> Tuple[List[str], List[Dict]]:
-    def load_grayscale(source: Path | Image.Image | np.ndarray) -> np.ndarray:
-        if isinstance(source, np.ndarray):
-            return source
-        if isinstance(source, Image.Image):
-            return np.array(source.convert("L"))
-        # Prefer OpenCV if available and functional; otherwise Pillow fallback.
-        if cv2 is not None:
-            image_cv = cv2.imread(str(source), cv2.IMREAD_GRAYSCALE)
-            if image_cv is not None:
-                return image_cv
-        with Image.open(source) as img:
-            return np.array(img.convert("L"))
-
-    image = load_grayscale(image_source)
-    if image is None or not hasattr(image, "shape"):
-        raise FileNotFoundError(f"Unable to load image from {image_source}")
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "bytes": self.current_bytes,
+        }
 
-    positions = compute_bubble_positions(questions, header_options_order)
-    detected_answers: List[str] = []
-    per_question: List[Dict] = []
+    @contextmanager
+    def counting(self) -> Iterator[Dict[str, int]]:
+        """Count this request's hits and misses, unaffected by requests running in other threads."""
+        counts = dict.fromkeys(("hits", "disk_hits", "misses"), 0)
+        token = self.request_counts.set(counts)
+        try:
+            yield counts
+        finally:
+            self.request_counts.reset(token)
 
-    half_region = region_size // 2
-    height, width = image.shape
+    def count(self, outcome: str) -> None:
+        # Called with the lock held.
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        counts = self.request_counts.get()
+        if counts is not None:
+            counts[outcome] += 1
 
-    for idx, (question, position) in enumerate(zip(questions, positions)):
-        options_order = question.get("options_order") or header_options_order
-        intensities: Dict[str, float] = {}
-        for option in options_order:
-            coord = position["bubbles"].get(option)
-            if coord is None:
-                continue
-            x, y = coord
-            x0 = max(0, x - half_region)
-            x1 = min(width, x + half_region)
-            y0 = max(0, y - half_region)
-            y1 = min(height, y + half_region)
-            region = image[y0:y1, x0:x1]
-            avg_intensity = float(region.mean()) if region.size else 255.0
-            intensities[option] = avg_intensity
-        detected_option = min(intensities, key=intensities.get)
-        detected_answers.append(detected_option)
-        per_question.append(
-            {
-                "question_id": position["question_id"],
-                "question_number": question_numbers[idx] if question_numbers and idx < len(question_numbers) else position["question_id"],
-                "intensities": intensities,
-                "detected": detected_option,
-            }
-        )
+    def evict(self) -> None:
+        while self.entries and self.current_bytes > self.max_bytes:
+            _, (_, image) = self.entries.popitem(last=False)
+            self.current_bytes -= image.width * image.height
 
-    return detected_answers, per_question
+    def store(self, key: str, extra: Any, image: Image.Image) -> None:
+        size = image.width * image.height
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (extra, image)
+        self.current_bytes += size
+        self.evict()
 
+    def load_from_disk(self, key: str) -> Tuple[Any, Image.Image] | None:
+        if not self.directory:
+            return None
+        image_path = self.directory / f"{key}.png"
+        extra_path = self.directory / f"{key}.json"
+        if not image_path.exists() or not extra_path.exists():
+            return None
+        try:
+            with Image.open(image_path) as img:
+                image = img.convert("L")
+            extra = json.loads(extra_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return extra, image
 
-def evaluate(
-    correct_answers: List[str], detected_answers: List[str], question_numbers: List[int] | None = None
-) -> Tuple[int, int, List[Dict]]:
-    results: List[Dict] = []
-    correct_count = 0
-    for idx, correct in enumerate(correct_answers):
-        detected = detected_answers[idx]
-        is_correct = correct == detected
-        correct_count += 1 if is_correct else 0
-        results.append(
-            {
-                "question_id": idx + 1,
-                "question_number": question_numbers[idx] if question_numbers and idx < len(question_numbers) else idx + 1,
-                "correct": correct,
-                "detected": detected,
-                "is_correct": is_correct,
-            }
-        )
-    wrong_count = len(correct_answers) - correct_count
-    return correct_count, wrong_count, results
+    def save_to_disk(self, key: str, extra: Any, image: Image.Image) -> None:
+        if not self.directory:
+            return
+        # Write to temp names first so concurrent workers never read a half-written entry.
+        suffix = f".{os.getpid()}.tmp"
+        image_tmp = self.directory / f"{key}.png{suffix}"
+        extra_tmp = self.directory / f"{key}.json{suffix}"
+        try:
+            image.save(image_tmp, format="PNG", compress_level=1)
+            extra_tmp.write_text(json.dumps(extra), encoding="utf-8")
+            os.replace(image_tmp, self.directory / f"{key}.png")
+            os.replace(extra_tmp, self.directory / f"{key}.json")
+        except OSError:
+            for tmp in (image_tmp, extra_tmp):
+                tmp.unlink(missing_ok=True)
 
+    def get_or_render(self, key: str, render: Callable[[], Tuple[Any, Image.Image]]) -> Tuple[Any, Image.Image]:
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+                self.count("hits")
+        if cached is None:
+            cached = self.load_from_disk(key)
+            outcome = "disk_hits" if cached is not None else "misses"
+            if cached is None:
+                cached = render()
+                self.save_to_disk(key, *cached)
+            with self.lock:
+                self.count(outcome)
+                self.store(key, *cached)
+        extra, image = cached
+        # Callers stamp student data onto the result, so never hand out the cached raster itself.
+        return extra, image.copy()
 
-def image_to_base64(image: Image.Image, fmt: str = "PNG") -> str:
-    buffer = io.BytesIO()
-    image.save(buffer, format=fmt)
-    return base64.b64encode(buffer.getvalue()).decode("ascii")
 
+SHEET_BASE_CACHE = SheetBaseCache()
 
-def load_image_from_base64(value: str) -> Image.Image:
-    decoded = base64.b64decode(value)
-    buffer = io.BytesIO(decoded)
-    return Image.open(buffer).convert("L")
+
+def layout_signature() -> Dict[str, Any]:
+    return {
+        "version": SHEET_CACHE_VERSION,
+        "image_size": IMAGE_SIZE,
+        "background": BACKGROUND_COLOR,
+        "school_name": SCHOOL_NAME,
+        "header_title": HEADER_TITLE,
+        "header_title_pos": HEADER_TITLE_POS,
+        "font_sizes": (HEADER_FONT_SIZE, BODY_FONT_SIZE, SMALL_FONT_SIZE),
+        "question_start_y": QUESTION_START_Y,
+        "line_spacing": LINE_SPACING,
+        "bubble_radius": BUBBLE_RADIUS,
+        "option_spacing_x": OPTION_SPACING_X,
+        "question_number_offset_x": QUESTION_NUMBER_OFFSET_X,
+        "first_option_x": FIRST_OPTION_X,
+        "question_text_x": QUESTION_TEXT_X,
+        "question_block_gap": QUESTION_BLOCK_GAP,
+        "page_margins": (PAGE_MARGIN_X, PAGE_BOTTOM_MARGIN),
+        "option_column_gap": OPTION_COLUMN_GAP,
+        "dense": (DENSE_LABEL_WIDTH, DENSE_OPTION_SPACING, DENSE_ROW_SPACING, DENSE_COLUMN_GAP),
+        "fiducials": (FIDUCIAL_SIZE, FIDUCIAL_ORIGINS),
+        "qr": (QR_SIZE, QR_POS),
+        "font": resolve_font_path(),
+    }
+
+
+def exam_spec_key(payload: Any, layout_override: str = "") -> str:
+    """Content hash of the exam-defining part of a payload and everything that moves bubbles."""
+    exam = {key: payload.get(key) for key in EXAM_SPEC_KEYS} if isinstance(payload, dict) else payload
+    source = {
+        "version": EXAM_SPEC_VERSION,
+        "exam": exam,
+        "layout_override": layout_override,
+        "layout": layout_signature(),
+    }
+    encoded = json.dumps(source, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def save_exam_spec(directory: Path, key: str, exam: Exam) -> Path:
+    """Write the compiled exam as `<key>.npz` plus an `exam-<id>.ref` pointer to its newest hash.
+
+    Text fields travel as one JSON blob; bubble coordinates and the answer-key vector are
+    stored as arrays. Both files are written under a temporary name and renamed into place,
+    so concurrent workers never read a partial file.
+    """
+    import numpy as np
+
+    grid = exam.grid
+    spec = {
+        "name": exam.name,
+        "exam_id": exam.exam_id,
+        "template_name": exam.template_name,
+        "layout": exam.layout,
+        "options_order": exam.options_order,
+        "questions": [question.to_json() for question in exam.questions],
+        "correct_answers": exam.correct_answers,
+        "question_numbers": exam.question_numbers,
+        "grid_options": grid.options,
+    }
+    answer_key = encode_cohort_answers(
+        [[str(answer or "") for answer in exam.correct_answers or [""] * len(exam.questions)]], grid.options
+    )[0]
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{key}.npz"
+    temporary = directory / f".{key}.{os.getpid()}.tmp"
+    with temporary.open("wb") as handle:
+        np.savez(
+            handle,
+            spec=np.frombuffer(json.dumps(spec, ensure_ascii=False, default=str).encode("utf-8"), dtype=np.uint8),
+            xs=grid.xs,
+            ys=grid.ys,
+            valid=grid.valid,
+            pages=grid.pages,
+            label_x=np.frombuffer(grid.label_x, dtype=np.int32),
+            label_y=np.frombuffer(grid.label_y, dtype=np.int32),
+            answer_key=answer_key,
+        )
+    os.replace(temporary, path)
+    reference = directory / f"exam-{safe_file_stem(str(exam.exam_id))}.ref"
+    temporary = directory / f".{reference.name}.{os.getpid()}.tmp"
+    temporary.write_text(key, encoding="utf-8")
+    os.replace(temporary, reference)
+    return path
+
+
+# Specs already read by this process, keyed by path and mtime, so a worker's repeat requests skip the disk.
+_EXAM_SPECS: "OrderedDict[Tuple[str, int], Exam]" = OrderedDict()
+_EXAM_SPECS_LOCK = threading.Lock()  # thread-pool workers share the memo
+
+
+def load_exam_spec(path: Path) -> Exam:
+    """Read a compiled exam with its bubble grid, skipping payload normalisation and layout."""
+    import numpy as np
+
+    memo_key = (str(path), path.stat().st_mtime_ns)
+    with _EXAM_SPECS_LOCK:
+        exam = _EXAM_SPECS.get(memo_key)
+        if exam is not None:
+            _EXAM_SPECS.move_to_end(memo_key)
+            return exam
+
+    with np.load(path) as data:
+        spec = json.loads(data["spec"].tobytes().decode("utf-8"))
+        arrays = {
+            name: array(code, data[name].astype(dtype).tobytes())
+            for name, code, dtype in (
+                ("xs", "i", np.int32),
+                ("ys", "i", np.int32),
+                ("valid", "b", np.int8),
+                ("pages", "i", np.int32),
+                ("label_x", "i", np.int32),
+                ("label_y", "i", np.int32),
+            )
+        }
+    options = tuple(tuple(order) for order in spec["grid_options"])
+    grid = BubbleGrid(
+        options=options,
+        width=max((len(order) for order in options), default=0),
+        centre_x=arrays["xs"],
+        centre_y=arrays["ys"],
+        mask=arrays["valid"],
+        page_index=arrays["pages"],
+        label_x=arrays["label_x"],
+        label_y=arrays["label_y"],
+    )
+    exam = Exam(
+        name=spec["name"],
+        exam_id=spec["exam_id"],
+        template_name=spec["template_name"],
+        layout=spec["layout"],
+        options_order=tuple(spec["options_order"]),
+        questions=tuple(
+            Question(**{**question, "options_order": tuple(question["options_order"])}) for question in spec["questions"]
+        ),
+        correct_answers=spec["correct_answers"],
+        question_numbers=spec["question_numbers"],
+        grid=grid,
+    )
+    with _EXAM_SPECS_LOCK:
+        _EXAM_SPECS[memo_key] = exam
+        while len(_EXAM_SPECS) > COMPILED_EXAM_LIMIT:
+            _EXAM_SPECS.popitem(last=False)
+    return exam
+
+
+def find_exam_spec(directory: Path, reference: str) -> Path:
+    """`--exam-ref`: a spec hash, or an exam ID whose newest compiled spec is used."""
+    # Only names inside the cache directory: a reference never carries a path.
+    path = directory / f"{safe_file_stem(reference)}.npz"
+    if path.is_file():
+        return path
+    pointer = directory / f"exam-{safe_file_stem(reference)}.ref"
+    if pointer.is_file():
+        path = directory / f"{pointer.read_text(encoding='utf-8').strip()}.npz"
+        if path.is_file():
+            return path
+    raise SystemExit(f"No compiled exam spec for {reference} in {directory}.")
+
+
+def resolve_exam_spec(
+    args: argparse.Namespace, payload: Any, base_dir: Path
+) -> Tuple[Exam, Dict[str, Any] | None]:
+    """`build_run_config`, served from the compiled spec cache when `--exam-cache` is set."""
+    directory = resolve_path(args.exam_cache, base_dir)
+    if args.exam_ref and not directory:
+        raise SystemExit("--exam-ref needs --exam-cache.")
+    if not directory:
+        return build_run_config(payload, args.layout), None
+
+    with stage("imports"):
+        import numpy  # noqa: F401  (detection needs it anyway; keep it out of the spec timing)
+
+    started = time.perf_counter()
+    with stage("exam_spec"):
+        if args.exam_ref:
+            path = find_exam_spec(directory, args.exam_ref)
+            exam = load_exam_spec(path)
+            report: Dict[str, Any] = {"key": path.stem, "status": "ref"}
+            if args.layout and args.layout != exam.layout:
+                # A layout override only re-places the bubbles; everything else still comes from the spec.
+                exam = compile_exam(
+                    exam.questions,
+                    exam.options_order,
+                    exam.name,
+                    exam.exam_id,
+                    exam.template_name,
+                    args.layout,
+                    exam.correct_answers,
+                )
+        else:
+            key = exam_spec_key(payload, args.layout)
+            path = directory / f"{key}.npz"
+            report = {"key": key, "status": "hit"}
+            try:
+                exam = load_exam_spec(path)
+            except (OSError, ValueError, KeyError, TypeError, zipfile.BadZipFile):
+                exam = build_run_config(payload, args.layout)
+                save_exam_spec(directory, key, exam)
+                report["status"] = "stored"
+    report["ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return exam, report
+
+
+def layout_cache_key(kind: str, exam: Exam) -> str:
+    # The answer key is never drawn, so a key correction must not invalidate cached layers.
+    drawn_questions = [{k: v for k, v in question.to_json().items() if k != "correct"} for question in exam.questions]
+    source = {
+        "kind": kind,
+        "layout": layout_signature(),
+        "questions": drawn_questions,
+        "options_order": exam.options_order,
+        "exam_name": exam.name,
+        "exam_id": exam.exam_id,
+        "template_name": exam.template_name,
+        # Question sheets look the same whichever answer sheet layout the exam uses.
+        "sheet_layout": exam.layout if kind == "answerSheet" else None,
+    }
+    encoded = json.dumps(source, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def answer_sheet_base_pages(exam: Exam) -> Iterator[Image.Image]:
+    """Fresh copies of the cached blank pages, made one at a time as the caller asks for them."""
+    key = layout_cache_key("answerSheet", exam)
+    for page in range(exam.grid.page_count):
+        _, image = SHEET_BASE_CACHE.get_or_render(
+            f"{key}-p{page + 1}" if page else key,
+            lambda page=page: (None, render_answer_sheet_base(exam, page)),
+        )
+        yield image
+
+
+def cached_answer_sheet_pages(exam: Exam) -> List[Image.Image]:
+    return list(answer_sheet_base_pages(exam))
+
+
+def generate_sheet(
+    exam: Exam, student_id: str, image_path: Path | None = None, fill_random: bool = False
+) -> Tuple[List[str], List[Image.Image]]:
+    pages = cached_answer_sheet_pages(exam)
+    for image in pages:
+        stamp_student_header(image, student_id, exam.exam_id)
+
+    if fill_random:
+        student_answers = mark_random_answers(pages, exam.grid)
+    else:
+        student_answers = ["" for _ in exam.questions]
+
+    if image_path:
+        for page, image in enumerate(pages):
+            image.save(page_output_path(image_path, page))
+    return student_answers, pages
+
+
+@functools.lru_cache(maxsize=65536)
+def text_width(font_size: int, text: str) -> float:
+    return load_font(font_size).getlength(text)
+
+
+def wrap_to_width(text: str, font_size: int, max_width: float) -> List[str]:
+    """Greedy word wrap measured with the font's advance widths; a word wider than a line is split.
+
+    Words are measured once and line widths summed, which ignores kerning across spaces.
+    """
+    space_width = text_width(font_size, " ")
+    lines: List[str] = []
+    current: List[str] = []
+    current_width = 0.0
+    for word in text.split():
+        word_width = text_width(font_size, word)
+        if current and current_width + space_width + word_width > max_width:
+            lines.append(" ".join(current))
+            current, current_width = [], 0.0
+        while len(word) > 1 and word_width > max_width:
+            low, high = 1, len(word) - 1
+            while low < high:
+                middle = (low + high + 1) // 2
+                if text_width(font_size, word[:middle]) <= max_width:
+                    low = middle
+                else:
+                    high = middle - 1
+            lines.append(word[:low])
+            word = word[low:]
+            word_width = text_width(font_size, word)
+        current_width += (space_width if current else 0.0) + word_width
+        current.append(word)
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
+def option_display_text(value: Any) -> str:
+    if isinstance(value, dict) and "text" in value:
+        return str(value["text"])
+    if isinstance(value, dict):
+        return str(value.get("value") or value.get("label") or "")
+    return str(value)
+
+
+@timed("layout")
+def layout_question_sheet(questions: Sequence[Question]) -> Tuple[List[Dict], List[List[Dict]]]:
+    """Wrap every question with the real font metrics and break pages between questions.
+
+    Returns the per-question records and, for each page, the question blocks to draw on it.
+    """
+    line_height = max(BODY_FONT_SIZE, SMALL_FONT_SIZE) + 6
+    usable_width = IMAGE_SIZE[0] - QUESTION_TEXT_X - 240
+    column_width = (usable_width - OPTION_COLUMN_GAP) // 2
+    page_bottom = IMAGE_SIZE[1] - PAGE_BOTTOM_MARGIN
+
+    records: List[Dict] = []
+    pages: List[List[Dict]] = [[]]
+    current_y = QUESTION_START_Y
+    for question in questions:
+        # Only question text + options (no bubbles) go on the question sheet.
+        text_lines = wrap_to_width(str(question.text), BODY_FONT_SIZE, usable_width)
+        # Each option line is (x offset inside its column, drawn text, text as recorded).
+        option_blocks: List[List[Tuple[float, str, str]]] = []
+        for idx, label in enumerate(question.options_order):
+            heading = f"Option {idx + 1}: "
+            indent = text_width(SMALL_FONT_SIZE, heading)
+            value = option_display_text(question.options.get(label, ""))
+            wrapped = wrap_to_width(value, SMALL_FONT_SIZE, column_width - indent) or [""]
+            block = [(0.0, heading + wrapped[0], heading + wrapped[0])]
+            block.extend((indent, line, " " * len(heading) + line) for line in wrapped[1:])
+            option_blocks.append(block)
+
+        option_rows: List[Tuple[Tuple[float, str, str] | None, Tuple[float, str, str] | None]] = []
+        option_lines: List[str] = []
+        for block_idx in range(0, len(option_blocks), 2):
+            left_block = option_blocks[block_idx]
+            right_block = option_blocks[block_idx + 1] if block_idx + 1 < len(option_blocks) else []
+            for row in range(max(len(left_block), len(right_block))):
+                left = left_block[row] if row < len(left_block) else None
+                right = right_block[row] if row < len(right_block) else None
+                option_rows.append((left, right))
+                left_line = left[2] if left else ""
+                if right:
+                    option_lines.append((left_line + "    " if left_line else "") + right[2])
+                else:
+                    option_lines.append(left_line)
+
+        height = max(len(text_lines) + len(option_rows), 1) * line_height
+        # A question taller than a whole page still gets a page of its own rather than splitting.
+        if pages[-1] and current_y + height > page_bottom:
+            pages.append([])
+            current_y = QUESTION_START_Y
+        pages[-1].append(
+            {"y": current_y, "number": question.number, "text_lines": text_lines, "option_rows": option_rows}
+        )
+        records.append(
+            {
+                "question_id": question.id,
+                "options_order": list(question.options_order),
+                "question_text": question.text,
+                "options_text": option_lines,
+            }
+        )
+        current_y += height + QUESTION_BLOCK_GAP
+
+    return records, pages
+
+
+def draw_question_sheet_base(
+    canvas: "RasterCanvas | VectorPage", exam: Exam, blocks: List[Dict], page: int = 0, page_count: int = 1
+) -> None:
+    # Everything on one question sheet page that does not depend on the student.
+    header_bottom = 420
+    canvas.rectangle(
+        [(120, 60), (IMAGE_SIZE[0] - 120, header_bottom)], outline=0, width=4
+    )
+    canvas.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] - 70), SCHOOL_NAME, BODY_FONT_SIZE)
+    canvas.text(HEADER_TITLE_POS, exam.name, HEADER_FONT_SIZE)
+    canvas.text((HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 80), f"Exam ID: {exam.exam_id}", BODY_FONT_SIZE)
+    canvas.text(
+        (HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 200),
+        f"Template: {exam.template_name} ({len(exam.options_order)} options)",
+        BODY_FONT_SIZE,
+    )
+    canvas.text(
+        (HEADER_TITLE_POS[0], HEADER_TITLE_POS[1] + 260),
+        "Question Sheet (with text + options)",
+        SMALL_FONT_SIZE,
+    )
+
+    canvas.text((QR_POS[0], QR_POS[1] + QR_SIZE + 10), "Scan for exam + student", SMALL_FONT_SIZE)
+    canvas.line([(120, header_bottom), (IMAGE_SIZE[0] - 120, header_bottom)], width=3)
+    if page_count > 1:
+        page_label = f"Page {page + 1} of {page_count}"
+        canvas.text((IMAGE_SIZE[0] - 120 - canvas.text_length(page_label, SMALL_FONT_SIZE), 20), page_label, SMALL_FONT_SIZE)
+
+    line_height = max(BODY_FONT_SIZE, SMALL_FONT_SIZE) + 6
+    usable_width = IMAGE_SIZE[0] - QUESTION_TEXT_X - 240
+    column_width = (usable_width - OPTION_COLUMN_GAP) // 2
+    column_xs = (QUESTION_TEXT_X, QUESTION_TEXT_X + column_width + OPTION_COLUMN_GAP)
+
+    for block in blocks:
+        text_y = block["y"]
+        canvas.text((QUESTION_NUMBER_OFFSET_X, text_y), f"Q{block['number']})", BODY_FONT_SIZE)
+        for line in block["text_lines"]:
+            canvas.text((QUESTION_TEXT_X, text_y), line, BODY_FONT_SIZE)
+            text_y += line_height
+        for row in block["option_rows"]:
+            for column_x, entry in zip(column_xs, row):
+                if entry and entry[1]:
+                    canvas.text((column_x + entry[0], text_y), entry[1], SMALL_FONT_SIZE)
+            text_y += line_height
+
+
+@timed("draw")
+def render_question_sheet_base(exam: Exam, blocks: List[Dict], page: int = 0, page_count: int = 1) -> Image.Image:
+    image = Image.new("L", IMAGE_SIZE, BACKGROUND_COLOR)
+    draw_question_sheet_base(RasterCanvas(image), exam, blocks, page, page_count)
+    return image
+
+
+def question_sheet_pages(exam: Exam, student_id: str) -> Tuple[List[Dict], int, Iterator[Image.Image]]:
+    """Lay the sheet out now; render and stamp each page only when the returned iterator reaches it."""
+    records, layout = layout_question_sheet(exam.questions)
+    return records, len(layout), stamped_question_pages(exam, layout, student_id)
+
+
+def stamped_question_pages(exam: Exam, layout: List[List[Dict]], student_id: str) -> Iterator[Image.Image]:
+    key = layout_cache_key("questionSheet", exam)
+    for page, blocks in enumerate(layout):
+        _, image = SHEET_BASE_CACHE.get_or_render(
+            f"{key}-p{page + 1}" if page else key,
+            lambda page=page, blocks=blocks: (
+                None,
+                render_question_sheet_base(exam, blocks, page=page, page_count=len(layout)),
+            ),
+        )
+        stamp_student_header(image, student_id, exam.exam_id)
+        yield image
+
+
+def generate_question_sheet(
+    exam: Exam, student_id: str, image_path: Path | None = None
+) -> Tuple[List[Dict], List[Image.Image]]:
+    records, _, pages = question_sheet_pages(exam, student_id)
+    images = list(pages)
+    if image_path:
+        for page, image in enumerate(images):
+            image.save(page_output_path(image_path, page))
+    return records, images
+
+
+@timed("draw")
+def vector_answer_sheet_base(exam: Exam) -> List[VectorPage]:
+    font_path = vector_font_path()
+    pages = []
+    for page in range(exam.grid.page_count):
+        vector = VectorPage(font_path)
+        draw_answer_sheet_base(vector, exam, page)
+        pages.append(vector)
+    return pages
+
+
+def generate_vector_sheet(exam: Exam, student_id: str, fill_random: bool = False) -> Tuple[List[str], List[VectorPage]]:
+    """`generate_sheet` without rasterizing: the same layout as PDF drawing operators."""
+    pages = vector_answer_sheet_base(exam)
+    for page in pages:
+        stamp_student_header(page, student_id, exam.exam_id)
+    if fill_random:
+        return mark_random_answers(pages, exam.grid), pages
+    return ["" for _ in exam.questions], pages
+
+
+@timed("draw")
+def vector_question_sheet_base(exam: Exam) -> Tuple[List[Dict], List[VectorPage]]:
+    records, layout = layout_question_sheet(exam.questions)
+    font_path = vector_font_path()
+    pages = []
+    for page, blocks in enumerate(layout):
+        vector = VectorPage(font_path)
+        draw_question_sheet_base(vector, exam, blocks, page=page, page_count=len(layout))
+        pages.append(vector)
+    return records, pages
+
+
+def vector_question_sheet_pages(exam: Exam, student_id: str) -> Tuple[List[Dict], List[VectorPage]]:
+    records, pages = vector_question_sheet_base(exam)
+    for page in pages:
+        stamp_student_header(page, student_id, exam.exam_id)
+    return records, pages
+
+
+def scan_reduction_factor(width: int, reduction: str) -> int:
+    """Power-of-two decode reduction for a scan `width` pixels wide.
+
+    `auto` picks the largest factor that still decodes at least at canvas width, so a 300 dpi
+    A4 scan decodes at full size and a 600 dpi one at half size.
+    """
+    if reduction != SCAN_REDUCTION_AUTO:
+        return int(reduction)
+    minimum_width = IMAGE_SIZE[0] * (1 - SCAN_SCALE_TOLERANCE)
+    for factor in (8, 4, 2):
+        if width / factor >= minimum_width:
+            return factor
+    return 1
+
+
+@timed("decode")
+def load_grayscale(
+    source: Path | Image.Image | np.ndarray | bytes, reduction: str = "1"
+) -> np.ndarray:
+    import numpy as np
+
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, Image.Image):
+        return np.array(source.convert("L"))
+    data = source if isinstance(source, (bytes, bytearray, memoryview)) else None
+    factor = 1
+    if reduction != "1":
+        # Opening only parses the header, which is all we need to pick the factor.
+        with Image.open(io.BytesIO(data) if data is not None else source) as img:
+            factor = scan_reduction_factor(img.width, reduction)
+    if factor == 1 and data is not None:
+        return decode_image_bytes(data)
+    # Prefer OpenCV if available and functional; otherwise Pillow fallback.
+    cv2 = load_cv2()
+    if cv2 is not None:
+        flag = cv2.IMREAD_GRAYSCALE if factor == 1 else getattr(cv2, f"IMREAD_REDUCED_GRAYSCALE_{factor}")
+        if data is not None:
+            image_cv = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+        else:
+            image_cv = cv2.imread(str(source), flag)
+        if image_cv is not None:
+            return image_cv
+    with Image.open(io.BytesIO(data) if data is not None else source) as img:
+        target_width = max(1, img.width // factor)
+        if factor > 1:
+            # JPEG decodes straight to the reduced DCT scale; other formats ignore the draft.
+            img.draft("L", (target_width, max(1, img.height // factor)))
+        gray = img.convert("L")
+    if gray.width >= 2 * target_width:
+        gray = gray.reduce(gray.width // target_width)
+    return np.array(gray)
+
+
+@timed("decode")
+def load_page_frames(source: Path | bytes | BinaryIO, reduction: str = "1") -> List[np.ndarray]:
+    # Multi-page scans usually arrive as one multi-frame TIFF: a file, or bytes from a zip member or upload.
+    import numpy as np
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    frames = []
+    with Image.open(source) as img:
+        for frame in ImageSequence.Iterator(img):
+            # TIFF has no reduced decode, so each page is decoded in full and box-reduced straight away.
+            factor = scan_reduction_factor(frame.width, reduction)
+            gray = frame.convert("L")
+            frames.append(np.array(gray.reduce(factor) if factor > 1 else gray))
+    return frames
+
+
+def locate_fiducial(image: np.ndarray, expected: Tuple[float, float], scale: float) -> Tuple[float, float] | None:
+    """Centre of the corner square nearest `expected` (scan pixels), or None if it is not there.
+
+    Coarse pass: block means at ~1/8 of the square's size, then box filters pick the spot that is
+    darkest inside and lightest in the margin around it (which rules out the QR code and text).
+    Fine pass: centroid of the dark pixels around that spot.
+    """
+    import numpy as np
+
+    height, width = image.shape
+    size = FIDUCIAL_SIZE * scale
+    radius = FIDUCIAL_SEARCH_RADIUS * scale + size
+    x0, x1 = max(0, int(expected[0] - radius)), min(width, int(expected[0] + radius) + 1)
+    y0, y1 = max(0, int(expected[1] - radius)), min(height, int(expected[1] + radius) + 1)
+    step = max(1, int(size // 8))
+    rows, cols = (y1 - y0) // step, (x1 - x0) // step
+    kernel = max(1, round(size / step))
+    if rows < kernel or cols < kernel:
+        return None
+    coarse = (
+        image[y0 : y0 + rows * step, x0 : x0 + cols * step]
+        .reshape(rows, step, cols, step)
+        .mean(axis=(1, 3))
+    )
+    # Pad with paper so squares near the window edge still get a full margin.
+    margin = max(1, kernel // 2)
+    padded = np.pad(coarse, margin, constant_values=float(BACKGROUND_COLOR))
+    integral = np.pad(padded.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+
+    def box_sums(size: int, offset: int) -> np.ndarray:
+        top, left = offset, offset
+        bottom, right = top + size, left + size
+        return (
+            integral[bottom : bottom + rows - kernel + 1, right : right + cols - kernel + 1]
+            - integral[top : top + rows - kernel + 1, right : right + cols - kernel + 1]
+            - integral[bottom : bottom + rows - kernel + 1, left : left + cols - kernel + 1]
+            + integral[top : top + rows - kernel + 1, left : left + cols - kernel + 1]
+        )
+
+    inner = box_sums(kernel, margin)
+    outer = box_sums(kernel + 2 * margin, 0)
+    inner_mean = inner / (kernel * kernel)
+    ring_mean = (outer - inner) / ((kernel + 2 * margin) ** 2 - kernel * kernel)
+    best_row, best_col = np.unravel_index(int((inner_mean - ring_mean).argmin()), inner_mean.shape)
+    if inner_mean[best_row, best_col] > FIDUCIAL_DARK_LEVEL or ring_mean[best_row, best_col] < FIDUCIAL_LIGHT_LEVEL:
+        return None
+
+    fx0 = max(0, x0 + (best_col - 1) * step)
+    fy0 = max(0, y0 + (best_row - 1) * step)
+    fx1 = min(width, x0 + (best_col + kernel + 1) * step)
+    fy1 = min(height, y0 + (best_row + kernel + 1) * step)
+    patch = image[fy0:fy1, fx0:fx1]
+    dark_rows, dark_cols = np.nonzero(patch < FIDUCIAL_DARK_LEVEL)
+    if not 0.75 * size * size <= dark_rows.size <= 1.3 * size * size:
+        return None
+    # The square is solid; QR finder patterns (dark ring, light ring, dark centre) are not.
+    core = max(1, int(size * 0.35))
+    centre_row, centre_col = int(dark_rows.mean()), int(dark_cols.mean())
+    core_patch = patch[max(0, centre_row - core) : centre_row + core, max(0, centre_col - core) : centre_col + core]
+    if (core_patch < FIDUCIAL_DARK_LEVEL).mean() < 0.9:
+        return None
+    # A square cut off by the scan edge would pull the centroid inwards.
+    if (fx0 == 0 and dark_cols.min() == 0) or (fx1 == width and dark_cols.max() == fx1 - fx0 - 1):
+        return None
+    if (fy0 == 0 and dark_rows.min() == 0) or (fy1 == height and dark_rows.max() == fy1 - fy0 - 1):
+        return None
+    return fx0 + float(dark_cols.mean()), fy0 + float(dark_rows.mean())
+
+
+@timed("align")
+def align_page(image: np.ndarray) -> Dict[str, Any]:
+    """Fit a canvas-to-scan transform from the corner squares.
+
+    Three or four squares give an affine fit, two (e.g. when skew pushes corners off the scan) a
+    similarity fit. Sheets without usable squares, or with a poor fit, keep the plain width scaling
+    and are reported as not registered: a shifted scan samples the wrong spots without any error.
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    scale = image.shape[1] / IMAGE_SIZE[0]
+    canvas_points: List[Tuple[float, float]] = []
+    scan_points: List[Tuple[float, float]] = []
+    for x0, y0 in FIDUCIAL_ORIGINS:
+        centre = (x0 + (FIDUCIAL_SIZE - 1) / 2, y0 + (FIDUCIAL_SIZE - 1) / 2)
+        found = locate_fiducial(image, (centre[0] * scale, centre[1] * scale), scale)
+        if found is not None:
+            canvas_points.append(centre)
+            scan_points.append(found)
+
+    alignment: Dict[str, Any] = {"method": "scale", "fiducials": len(scan_points)}
+    if len(scan_points) >= 2:
+        design = np.hstack([np.array(canvas_points), np.ones((len(canvas_points), 1))])
+        target = np.array(scan_points)
+        if len(scan_points) == 2:
+            # x' = a*x - b*y + tx, y' = b*x + a*y + ty
+            (x1, y1), (x2, y2) = canvas_points
+            system = np.array([[x1, -y1, 1, 0], [y1, x1, 0, 1], [x2, -y2, 1, 0], [y2, x2, 0, 1]])
+            a, b, tx, ty = np.linalg.lstsq(system, target.reshape(-1), rcond=None)[0]
+            coeffs = np.array([[a, b], [-b, a], [tx, ty]])
+        else:
+            coeffs = np.linalg.lstsq(design, target, rcond=None)[0]  # (3, 2)
+        residuals = np.hypot(*(design @ coeffs - target).T) / scale
+        (a, d), (b, e) = coeffs[:2] / scale
+        # Two or three squares always fit exactly, so also insist on a plausible scanner transform.
+        plausible = (
+            abs(a - e) <= FIDUCIAL_MAX_SHEAR
+            and abs(b + d) <= FIDUCIAL_MAX_SHEAR
+            and abs(abs(a * e - b * d) ** 0.5 - 1) <= 2 * SCAN_SCALE_TOLERANCE
+        )
+        if plausible and residuals.max() <= FIDUCIAL_MAX_RESIDUAL:
+            alignment.update(
+                method="affine" if len(scan_points) >= 3 else "similarity",
+                matrix=(np.round(coeffs.T, 6) + 0.0).tolist(),
+                residual_rms=round(float(np.sqrt((residuals**2).mean())), 3),
+                residual_max=round(float(residuals.max()), 3),
+            )
+    alignment["registered"] = "matrix" in alignment
+    alignment["ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return alignment
+
+
+def sample_scan_bubbles(
+    image: np.ndarray, xs: np.ndarray, ys: np.ndarray, alignment: Dict[str, Any] | None = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """`sample_bubbles` with the canvas coordinates mapped onto the scan.
+
+    Uses the fiducial transform when there is one, otherwise scales to the scan's width. Only
+    the bubble centres are transformed; the page itself is never warped.
+    """
+    import numpy as np
+
+    matrix = alignment.get("matrix") if alignment else None
+    if matrix is not None:
+        (a, b, c), (d, e, f) = matrix
+        return sample_bubbles(
+            image, np.rint(a * xs + b * ys + c), np.rint(d * xs + e * ys + f), abs(a * e - b * d) ** 0.5
+        )
+    scale = image.shape[1] / IMAGE_SIZE[0]
+    if abs(scale - 1) <= SCAN_SCALE_TOLERANCE:
+        return sample_bubbles(image, xs, ys)
+    return sample_bubbles(image, np.rint(xs * scale), np.rint(ys * scale), scale)
+
+
+@timed("detect")
+def detect_answers(
+    image_source: Path | Image.Image | np.ndarray | Sequence[Path | Image.Image | np.ndarray],
+    exam: Exam,
+    scan_reduction: str = SCAN_REDUCTION_AUTO,
+    alignments: Sequence[Dict[str, Any] | None] = (),
+) -> Tuple[List[str], List[Dict], List[Dict]]:
+    """Detect the marked option per question; also returns the per-page alignment reports.
+
+    Blank and multi-mark questions come back as "" and every question carries its mark
+    status and confidence in the details, so only flagged questions need a human look.
+    `alignments` holds `align_page` results the caller already has for the leading pages.
+    """
+    import numpy as np
+
+    grid = exam.grid
+    xs, ys, valid = grid.xs, grid.ys, grid.valid
+    sources = list(image_source) if isinstance(image_source, (list, tuple)) else [image_source]
+    if len(sources) == 1 and grid.page_count > 1 and isinstance(sources[0], (str, Path, bytes, bytearray, io.IOBase)):
+        sources = load_page_frames(Path(sources[0]) if isinstance(sources[0], str) else sources[0], scan_reduction)
+    if len(sources) < grid.page_count:
+        raise ValueError(
+            f"The {exam.layout} layout puts this exam on {grid.page_count} pages but {len(sources)} page image(s) were provided."
+        )
+
+    known = list(alignments)
+    alignments = []
+    if grid.page_count == 1:
+        image = load_grayscale(sources[0], scan_reduction)
+        if image is None or not hasattr(image, "shape"):
+            raise FileNotFoundError(f"Unable to load image from {sources[0]}")
+        alignment = known[0] if known and known[0] else align_page(image)
+        alignments.append({"page": 1, **alignment})
+        means, background = sample_scan_bubbles(image, xs, ys, alignment)
+    else:
+        pages = grid.pages
+        means = np.empty(xs.shape, dtype=np.float64)
+        background = np.empty(xs.shape, dtype=np.float64)
+        for page, source in enumerate(sources[: grid.page_count]):
+            image = load_grayscale(source, scan_reduction)
+            if image is None or not hasattr(image, "shape"):
+                raise FileNotFoundError(f"Unable to load page {page + 1} from {source}")
+            alignment = known[page] if page < len(known) and known[page] else align_page(image)
+            alignments.append({"page": page + 1, **alignment})
+            on_page = pages == page
+            means[on_page], background[on_page] = sample_scan_bubbles(image, xs[on_page], ys[on_page], alignment)
+    fill, paper = bubble_fill(means, background, valid, grid.options)
+    best, status, confidence = classify_marks(fill, valid)
+    # Bubbles on a page that was not registered were sampled at guessed positions, so even a
+    # clean blank there is unreliable: every question on it goes to review.
+    unregistered = [alignment["page"] - 1 for alignment in alignments if not alignment["registered"]]
+    guessed = np.isin(grid.pages, unregistered)
+    confidence = np.where(guessed, 0.0, confidence)
+    best, status, guessed = best.tolist(), status.tolist(), guessed.tolist()
+    mean_rows, fill_rows = means.round(2).tolist(), fill.round(3).tolist()
+    paper_levels, confidence = paper.round(1).tolist(), confidence.round(3).tolist()
+
+    detected_answers: List[str] = []
+    per_question: List[Dict] = []
+    for idx, options_order in enumerate(grid.options):
+        mark = MARK_STATUSES[status[idx]]
+        detected_option = "" if mark in (MARK_BLANK, MARK_MULTI) else options_order[best[idx]]
+        detected_answers.append(detected_option)
+        if guessed[idx]:
+            mark = MARK_UNCERTAIN
+        question_id = idx + 1
+        per_question.append(
+            {
+                "question_id": question_id,
+                "question_number": exam.question_numbers[idx],
+                "intensities": dict(zip(options_order, mean_rows[idx])),
+                "fill": dict(zip(options_order, fill_rows[idx])),
+                "background": paper_levels[idx],
+                "detected": detected_option,
+                "status": mark,
+                "confidence": confidence[idx],
+            }
+        )
+
+    return detected_answers, per_question, alignments
+
+
+@timed("evaluate")
+def evaluate(
+    correct_answers: List[str], detected_answers: List[str], question_numbers: List[int] | None = None
+) -> Tuple[int, int, List[Dict]]:
+    results: List[Dict] = []
+    correct_count = 0
+    for idx, correct in enumerate(correct_answers):
+        detected = detected_answers[idx]
+        is_correct = correct == detected
+        correct_count += 1 if is_correct else 0
+        results.append(
+            {
+                "question_id": idx + 1,
+                "question_number": question_numbers[idx] if question_numbers and idx < len(question_numbers) else idx + 1,
+                "correct": correct,
+                "detected": detected,
+                "is_correct": is_correct,
+            }
+        )
+    wrong_count = len(correct_answers) - correct_count
+    return correct_count, wrong_count, results
+
+
+@timed("encode")
+def image_to_base64(image: Image.Image, fmt: str = "PNG") -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def bilevel_image(image: Image.Image) -> Image.Image:
+    # Threshold instead of dithering so bubble edges and text stay crisp.
+    return image.convert("L").point(lambda value: 255 if value >= 128 else 0, mode="1")
+
+
+@timed("encode")
+def encode_image(image: Image.Image, encoding: str = ENCODING_PNG, compress_level: int = -1) -> bytes:
+    """Encode a rendered sheet. Sheets are black ink on white, so the bilevel encodings lose nothing that matters."""
+    buffer = io.BytesIO()
+    if encoding == ENCODING_PNG:
+        options = {"compress_level": compress_level} if compress_level >= 0 else {}
+        image.save(buffer, format="PNG", **options)
+    elif encoding in (ENCODING_PNG_1BIT, ENCODING_TIFF_G4):
+        bilevel = bilevel_image(image)
+        if encoding == ENCODING_PNG_1BIT:
+            options = {"compress_level": compress_level} if compress_level >= 0 else {}
+            bilevel.save(buffer, format="PNG", **options)
+        else:
+            bilevel.save(buffer, format="TIFF", compression="group4")
+    else:
+        raise SystemExit(f"Unsupported image encoding: {encoding}. Choose one of: {', '.join(IMAGE_ENCODINGS)}.")
+    return buffer.getvalue()
+
+
+def encoded_suffix(encoding: str) -> str:
+    return ".tiff" if encoding == ENCODING_TIFF_G4 else ".png"
+
+
+def emit_sheet_pages(
+    result: Dict[str, Any], pages: Iterable[Image.Image], output_path: Path | None, args: argparse.Namespace
+) -> None:
+    """Encode each page once, then save it, return it as base64 or write it to a descriptor as `--emit` asks."""
+    if args.emit == EMIT_PATH and not output_path:
+        raise SystemExit("--emit path needs an output path (--output / --questions-output).")
+    if args.emit == EMIT_FD and args.emit_fd < 0:
+        raise SystemExit("--emit fd needs --emit-fd.")
+
+    encode_seconds = 0.0
+    base64_seconds = 0.0
+    encoded_pages: List[bytes] = []
+    for page in pages:
+        started = time.perf_counter()
+        encoded_pages.append(encode_image(page, args.image_encoding, args.png_compress_level))
+        encode_seconds += time.perf_counter() - started
+
+    if output_path:
+        with stage("write"):
+            for page, data in enumerate(encoded_pages):
+                page_output_path(output_path, page).write_bytes(data)
+        result.setdefault("saved_paths", []).extend(
+            str(page_output_path(output_path, page)) for page in range(len(encoded_pages))
+        )
+
+    if args.emit == EMIT_BASE64:
+        started = time.perf_counter()
+        with stage("base64"):
+            pages_base64 = [base64.b64encode(data).decode("ascii") for data in encoded_pages]
+        base64_seconds = time.perf_counter() - started
+        result["image_base64"] = pages_base64[0]
+        if len(pages_base64) > 1:
+            result["pages_base64"] = pages_base64
+    elif args.emit == EMIT_FD:
+        # Each page is framed as a 4-byte big-endian length followed by the encoded bytes.
+        with os.fdopen(args.emit_fd, "wb", closefd=False) as handle:
+            for data in encoded_pages:
+                handle.write(len(data).to_bytes(4, "big"))
+                handle.write(data)
+    if len(encoded_pages) > 1:
+        result["page_count"] = len(encoded_pages)
+
+    result["encoding"] = {
+        "format": args.image_encoding,
+        "emit": args.emit,
+        "bytes": [len(data) for data in encoded_pages],
+        "encode_ms": round(encode_seconds * 1000, 2),
+        "base64_ms": round(base64_seconds * 1000, 2),
+    }
+
+
+class PdfWriter:
+    """Minimal PDF writer: objects are appended as they come and the page tree is written on close."""
+
+    def __init__(self, handle: BinaryIO, dpi: int = PRINT_DPI) -> None:
+        self.handle = handle
+        self.dpi = dpi
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = 3  # 1 is the catalog and 2 the page tree; close() writes both
+        handle.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write_object(self, body: bytes, object_id: int = 0) -> int:
+        if not object_id:
+            object_id = self.reserve_id()
+        self.offsets[object_id] = self.handle.tell()
+        self.handle.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+        return object_id
+
+    def reserve_id(self) -> int:
+        self.next_id += 1
+        return self.next_id - 1
+
+    def write_stream(self, header: bytes, data: bytes) -> int:
+        return self.write_object(b"<< %s /Length %d >>\nstream\n%s\nendstream" % (header, len(data), data))
+
+    def page_size(self) -> Tuple[float, float]:
+        return IMAGE_SIZE[0] * 72 / self.dpi, IMAGE_SIZE[1] * 72 / self.dpi
+
+    def close(self) -> None:
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        self.write_object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)), 2)
+        self.write_object(b"<< /Type /Catalog /Pages 2 0 R >>", 1)
+        xref_at = self.handle.tell()
+        self.handle.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_id)
+        for object_id in range(1, self.next_id):
+            self.handle.write(b"%010d 00000 n \n" % self.offsets[object_id])
+        self.handle.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, xref_at))
+
+
+class RasterPdfWriter(PdfWriter):
+    """Appends one raster page at a time."""
+
+    def add_page(self, image: Image.Image, bilevel: bool = False) -> None:
+        # 1-bit DeviceGray reads 0 as black, which is how Pillow packs mode "1" rows.
+        raster = bilevel_image(image) if bilevel else image.convert("L")
+        width, height = raster.size
+        image_id = self.write_stream(
+            b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+            b"/BitsPerComponent %d /Filter /FlateDecode" % (width, height, 1 if bilevel else 8),
+            zlib.compress(raster.tobytes()),
+        )
+        page_width, page_height = width * 72 / self.dpi, height * 72 / self.dpi
+        content_id = self.write_stream(b"", b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (page_width, page_height))
+        self.page_ids.append(
+            self.write_object(
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /XObject << /Im0 %d 0 R >> >> "
+                b"/Contents %d 0 R >>" % (page_width, page_height, image_id, content_id)
+            )
+        )
+
+
+class TrueTypeFont:
+    """The parts of a glyf-flavoured TrueType file needed to embed a glyph subset in a PDF."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.data = Path(path).read_bytes()
+        if self.data[:4] not in (b"\x00\x01\x00\x00", b"true"):
+            raise SystemExit(f"Vector output needs a TrueType font (.ttf with glyf outlines); got {path}.")
+        count = struct.unpack_from(">H", self.data, 4)[0]
+        self.tables: Dict[bytes, Tuple[int, int]] = {}
+        for index in range(count):
+            tag, _, offset, length = struct.unpack_from(">4sIII", self.data, 12 + 16 * index)
+            self.tables[tag] = (offset, length)
+        missing = {b"head", b"hhea", b"maxp", b"hmtx", b"loca", b"glyf", b"cmap"} - set(self.tables)
+        if missing:
+            raise SystemExit(f"Vector output needs a TrueType font (.ttf with glyf outlines); got {path}.")
+        head = self.tables[b"head"][0]
+        self.units_per_em = struct.unpack_from(">H", self.data, head + 18)[0]
+        self.bbox = struct.unpack_from(">hhhh", self.data, head + 36)
+        self.long_loca = struct.unpack_from(">h", self.data, head + 50)[0] == 1
+        self.glyph_count = struct.unpack_from(">H", self.data, self.tables[b"maxp"][0] + 4)[0]
+        hhea = self.tables[b"hhea"][0]
+        self.ascent, self.descent = struct.unpack_from(">hh", self.data, hhea + 4)
+        metric_count = struct.unpack_from(">H", self.data, hhea + 34)[0]
+        advances = struct.unpack_from(f">{2 * metric_count}H", self.data, self.tables[b"hmtx"][0])[::2]
+        self.advances = list(advances) + [advances[-1]] * (self.glyph_count - metric_count)
+        loca = self.tables[b"loca"][0]
+        if self.long_loca:
+            self.loca = struct.unpack_from(f">{self.glyph_count + 1}I", self.data, loca)
+        else:
+            self.loca = tuple(2 * value for value in struct.unpack_from(f">{self.glyph_count + 1}H", self.data, loca))
+        self.cmap = self.read_cmap()
+
+    def read_cmap(self) -> Dict[int, int]:
+        """Unicode code point to glyph id, from the Windows Unicode subtable (format 12 or 4)."""
+        base = self.tables[b"cmap"][0]
+        subtables = {}
+        for index in range(struct.unpack_from(">H", self.data, base + 2)[0]):
+            platform, encoding, offset = struct.unpack_from(">HHI", self.data, base + 4 + 8 * index)
+            subtables[(platform, encoding)] = base + offset
+        mapping: Dict[int, int] = {}
+        if (3, 10) in subtables and struct.unpack_from(">H", self.data, subtables[(3, 10)])[0] == 12:
+            table = subtables[(3, 10)]
+            for group in range(struct.unpack_from(">I", self.data, table + 12)[0]):
+                first, last, glyph = struct.unpack_from(">III", self.data, table + 16 + 12 * group)
+                mapping.update((code, glyph + code - first) for code in range(first, last + 1))
+            return mapping
+        table = subtables.get((3, 1)) or subtables.get((0, 3))
+        if table is None or struct.unpack_from(">H", self.data, table)[0] != 4:
+            raise SystemExit(f"Font {self.path} has no Unicode cmap that vector output can read.")
+        segments = struct.unpack_from(">H", self.data, table + 6)[0] // 2
+        ends = struct.unpack_from(f">{segments}H", self.data, table + 14)
+        starts = struct.unpack_from(f">{segments}H", self.data, table + 16 + 2 * segments)
+        deltas = struct.unpack_from(f">{segments}h", self.data, table + 16 + 4 * segments)
+        range_at = table + 16 + 6 * segments
+        range_offsets = struct.unpack_from(f">{segments}H", self.data, range_at)
+        for segment in range(segments):
+            for code in range(starts[segment], ends[segment] + 1):
+                if code == 0xFFFF:
+                    continue
+                if range_offsets[segment]:
+                    at = range_at + 2 * segment + range_offsets[segment] + 2 * (code - starts[segment])
+                    glyph = struct.unpack_from(">H", self.data, at)[0]
+                    glyph = (glyph + deltas[segment]) & 0xFFFF if glyph else 0
+                else:
+                    glyph = (code + deltas[segment]) & 0xFFFF
+                if glyph:
+                    mapping[code] = glyph
+        return mapping
+
+    def glyph(self, glyph_id: int) -> bytes:
+        start = self.tables[b"glyf"][0]
+        return self.data[start + self.loca[glyph_id] : start + self.loca[glyph_id + 1]]
+
+    def subset(self, glyph_ids: Iterable[int]) -> bytes:
+        """The font with every glyph outside `glyph_ids` (and their components) emptied.
+
+        Glyph ids are kept, so the PDF can address glyphs with an identity CID map.
+        """
+        keep = {0}
+        pending = list(glyph_ids)
+        while pending:
+            glyph_id = pending.pop()
+            if glyph_id in keep or glyph_id >= self.glyph_count:
+                continue
+            keep.add(glyph_id)
+            outline = self.glyph(glyph_id)
+            if len(outline) < 10 or struct.unpack_from(">h", outline)[0] >= 0:
+                continue
+            at = 10  # composite glyph: queue its components
+            while True:
+                flags, component = struct.unpack_from(">HH", outline, at)
+                pending.append(component)
+                at += 4 + (4 if flags & 0x1 else 2)
+                at += 2 if flags & 0x8 else 4 if flags & 0x40 else 8 if flags & 0x80 else 0
+                if not flags & 0x20:
+                    break
+
+        # Glyphs past the highest one kept are dropped, so loca and hmtx shrink with them.
+        glyph_count = max(keep) + 1
+        hmtx_at = self.tables[b"hmtx"][0]
+        metric_count = struct.unpack_from(">H", self.data, self.tables[b"hhea"][0] + 34)[0]
+        glyf = bytearray()
+        loca = []
+        hmtx = bytearray()
+        for glyph_id in range(glyph_count):
+            loca.append(len(glyf))
+            if glyph_id in keep:
+                glyf += self.glyph(glyph_id)
+                glyf += b"\0" * (-len(glyf) % 4)
+                lsb_at = hmtx_at + (4 * glyph_id + 2 if glyph_id < metric_count else 2 * metric_count + 2 * glyph_id)
+                hmtx += struct.pack(">H", self.advances[glyph_id]) + self.data[lsb_at : lsb_at + 2]
+            else:
+                hmtx += b"\0\0\0\0"
+        loca.append(len(glyf))
+        head_at, head_length = self.tables[b"head"]
+        head = bytearray(self.data[head_at : head_at + head_length])
+        struct.pack_into(">I", head, 8, 0)  # checksumAdjustment; PDF readers do not check it
+        struct.pack_into(">h", head, 50, 1)  # long loca offsets
+        hhea_at, hhea_length = self.tables[b"hhea"]
+        hhea = bytearray(self.data[hhea_at : hhea_at + hhea_length])
+        struct.pack_into(">H", hhea, 34, glyph_count)
+        maxp_at, maxp_length = self.tables[b"maxp"]
+        maxp = bytearray(self.data[maxp_at : maxp_at + maxp_length])
+        struct.pack_into(">H", maxp, 4, glyph_count)
+        tables = {
+            b"head": bytes(head),
+            b"hhea": bytes(hhea),
+            b"maxp": bytes(maxp),
+            b"hmtx": bytes(hmtx),
+            b"loca": struct.pack(f">{len(loca)}I", *loca),
+            b"glyf": bytes(glyf),
+        }
+        for tag in (b"cvt ", b"fpgm", b"prep"):
+            if tag in self.tables:
+                offset, length = self.tables[tag]
+                tables[tag] = self.data[offset : offset + length]
+
+        directory = bytearray(struct.pack(">IHHHH", 0x00010000, len(tables), 0, 0, 0))
+        body = bytearray()
+        offset = 12 + 16 * len(tables)
+        for tag in sorted(tables):
+            table = tables[tag] + b"\0" * (-len(tables[tag]) % 4)
+            checksum = sum(struct.unpack(f">{len(table) // 4}I", table)) & 0xFFFFFFFF
+            directory += struct.pack(">4sIII", tag, checksum, offset + len(body), len(tables[tag]))
+            body += table
+        return bytes(directory + body)
+
+
+@functools.lru_cache(maxsize=None)
+def load_truetype(path: str) -> TrueTypeFont:
+    return TrueTypeFont(path)
+
+
+def vector_font_path() -> str:
+    path = resolve_font_path()
+    if not path:
+        raise SystemExit("--renderer vector needs a TrueType font; set --font-path or EXAMINER_FONT_PATH.")
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def font_ascent(size: int) -> int:
+    # Pillow anchors text at the ascender ("la"); PDF places it on the baseline.
+    return load_font(size).getmetrics()[0]
+
+
+class VectorPage:
+    """One sheet page as PDF path and text operators, drawn with the same calls as `RasterCanvas`.
+
+    Operators are in canvas pixels with y down; `VectorPdfWriter` maps them onto the A4 page.
+    Text is measured with the same Pillow font as the raster backend, so layout matches.
+    """
+
+    def __init__(self, font_path: str) -> None:
+        self.font_path = font_path
+        self.ops: List[bytes] = []
+        self.glyphs: Dict[int, str] = {}  # glyph id -> text, for the subset and ToUnicode map
+
+    def copy(self) -> "VectorPage":
+        page = VectorPage(self.font_path)
+        page.ops = list(self.ops)
+        page.glyphs = dict(self.glyphs)
+        return page
+
+    def paint(self, path: bytes, fill: int | None, outline: int | None, width: int) -> None:
+        if fill is not None:
+            self.ops.append(b"%.3f g %s f" % (fill / 255, path))
+        if outline is not None and outline != fill:
+            self.ops.append(b"%.3f G %d w %s S" % (outline / 255, width, path))
+
+    def rectangle(self, box: Sequence[Any], fill: int | None = None, outline: int | None = None, width: int = 1) -> None:
+        # Pillow boxes are inclusive pixel bounds and outlines are drawn inside them.
+        x0, y0, x1, y1 = (value for point in box for value in (point if isinstance(point, tuple) else (point,)))
+        if fill is not None:
+            self.paint(b"%.2f %.2f %.2f %.2f re" % (x0, y0, x1 - x0 + 1, y1 - y0 + 1), fill, None, width)
+        if outline is not None:
+            inset = width / 2
+            self.paint(
+                b"%.2f %.2f %.2f %.2f re" % (x0 + inset, y0 + inset, x1 - x0 + 1 - width, y1 - y0 + 1 - width),
+                None,
+                outline,
+                width,
+            )
+
+    def ellipse(self, box: Sequence[Any], fill: int | None = None, outline: int | None = None, width: int = 1) -> None:
+        x0, y0, x1, y1 = box
+        cx, cy = (x0 + x1 + 1) / 2, (y0 + y1 + 1) / 2
+        rx, ry = (x1 - x0 + 1) / 2, (y1 - y0 + 1) / 2
+        if fill is not None:
+            self.paint(bezier_ellipse(cx, cy, rx, ry), fill, None, width)
+        if outline is not None and outline != fill:
+            self.paint(bezier_ellipse(cx, cy, rx - width / 2, ry - width / 2), None, outline, width)
+
+    def line(self, points: Sequence[Tuple[float, float]], width: int = 1) -> None:
+        (x0, y0), (x1, y1) = points
+        self.ops.append(b"0 G %d w %.2f %.2f m %.2f %.2f l S" % (width, x0 + 0.5, y0 + 0.5, x1 + 0.5, y1 + 0.5))
+
+    def text(self, xy: Tuple[float, float], text: str, size: int) -> None:
+        font = load_truetype(self.font_path)
+        parts = [b"<"]
+        for char in text:
+            glyph_id = font.cmap.get(ord(char), 0)
+            self.glyphs.setdefault(glyph_id, char)
+            parts.append(b"%04X" % glyph_id)
+            # Pillow advances by hinted, whole-pixel widths; nudge each glyph so lines end where the raster's do.
+            nudge = round(font.advances[glyph_id] * 1000 / font.units_per_em - text_width(size, char) * 1000 / size)
+            if nudge:
+                parts.append(b"> %d <" % nudge)
+        parts.append(b">")
+        # The page flips y, so the text matrix flips it back to keep glyphs upright.
+        self.ops.append(
+            b"0 g BT /F1 %d Tf 1 0 0 -1 %.2f %.2f Tm [%s] TJ ET"
+            % (size, xy[0], xy[1] + font_ascent(size), b"".join(parts).replace(b"<>", b""))
+        )
+
+    def text_length(self, text: str, size: int) -> float:
+        return text_width(size, text)
+
+    def centered_text(self, text: str, center: Tuple[int, int], size: int) -> None:
+        # Same placement as draw_centered_text: the ink box, not the advance, is centred.
+        bbox = text_bbox(size, text)
+        self.text((center[0] - (bbox[2] - bbox[0]) // 2, center[1] - (bbox[3] - bbox[1]) // 2), text, size)
+
+    def qr(self, student_id: str, exam_id: str) -> None:
+        self.ops.append(vector_qr(student_id, exam_id))
+
+
+@functools.lru_cache(maxsize=64)
+@timed("qr")
+def vector_qr(student_id: str, exam_id: str) -> bytes:
+    # Cached because every page of a multi-page sheet carries the same code.
+    modules = make_sheet_qr(student_id, exam_id).get_matrix()
+    module = QR_SIZE / len(modules)
+    runs = []
+    for row, cells in enumerate(modules):
+        column = 0
+        while column < len(cells):
+            if not cells[column]:
+                column += 1
+                continue
+            start = column
+            while column < len(cells) and cells[column]:
+                column += 1
+            runs.append(
+                b"%.2f %.2f %.2f %.2f re"
+                % (QR_POS[0] + start * module, QR_POS[1] + row * module, (column - start) * module, module)
+            )
+    return b"0 g %s f" % b" ".join(runs)
+
+
+@functools.lru_cache(maxsize=4096)
+def text_bbox(size: int, text: str) -> Tuple[int, int, int, int]:
+    return load_font(size).getbbox(text)
+
+
+def bezier_ellipse(cx: float, cy: float, rx: float, ry: float) -> bytes:
+    # Four cubic arcs; 0.5523 puts the control points where the curve best matches a circle.
+    kx, ky = 0.5523 * rx, 0.5523 * ry
+    return b"%.2f %.2f m %s h" % (
+        cx + rx,
+        cy,
+        b" ".join(
+            b"%.2f %.2f %.2f %.2f %.2f %.2f c" % points
+            for points in (
+                (cx + rx, cy + ky, cx + kx, cy + ry, cx, cy + ry),
+                (cx - kx, cy + ry, cx - rx, cy + ky, cx - rx, cy),
+                (cx - rx, cy - ky, cx - kx, cy - ry, cx, cy - ry),
+                (cx + kx, cy - ry, cx + rx, cy - ky, cx + rx, cy),
+            )
+        ),
+    )
+
+
+class VectorPdfWriter(PdfWriter):
+    """Writes `VectorPage`s as compressed content streams sharing one embedded font subset."""
+
+    def __init__(self, handle: BinaryIO, font_path: str, dpi: int = PRINT_DPI) -> None:
+        super().__init__(handle, dpi)
+        self.font = load_truetype(font_path)
+        self.font_id = self.reserve_id()  # written on close, once every page's glyphs are known
+        self.glyphs: Dict[int, str] = {}
+
+    def add_page(self, page: VectorPage) -> None:
+        page_width, page_height = self.page_size()
+        scale = 72 / self.dpi
+        content = b"q %.4f 0 0 %.4f 0 %.2f cm\n%s\nQ" % (scale, -scale, page_height, b"\n".join(page.ops))
+        content_id = self.write_stream(b"/Filter /FlateDecode", zlib.compress(content))
+        self.glyphs.update(page.glyphs)
+        self.page_ids.append(
+            self.write_object(
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Resources << /Font << /F1 %d 0 R >> >> "
+                b"/Contents %d 0 R >>" % (page_width, page_height, self.font_id, content_id)
+            )
+        )
+
+    def close(self) -> None:
+        font = self.font
+        glyph_ids = sorted(self.glyphs)
+        # Subset fonts are named with a tag derived from their glyphs, as PDF readers expect.
+        digest = hashlib.sha256(repr(glyph_ids).encode("ascii")).digest()
+        tag = bytes(65 + value % 26 for value in digest[:6])
+        name = b"%s+%s" % (tag, re.sub(r"[^A-Za-z0-9-]", "", Path(font.path).stem).encode("ascii") or b"Sans")
+
+        def em(value: float) -> int:
+            return round(value * 1000 / font.units_per_em)
+
+        font_file = font.subset(glyph_ids)
+        file_id = self.write_stream(
+            b"/Filter /FlateDecode /Length1 %d" % len(font_file), zlib.compress(font_file)
+        )
+        descriptor_id = self.write_object(
+            b"<< /Type /FontDescriptor /FontName /%s /Flags 32 /FontBBox [%d %d %d %d] /ItalicAngle 0 "
+            b"/Ascent %d /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>"
+            % (name, *(em(value) for value in font.bbox), em(font.ascent), em(font.descent), em(font.ascent), file_id)
+        )
+        widths = b" ".join(b"%d [%d]" % (glyph_id, em(font.advances[glyph_id])) for glyph_id in glyph_ids)
+        cid_font_id = self.write_object(
+            b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s "
+            b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            b"/FontDescriptor %d 0 R /W [%s] /CIDToGIDMap /Identity >>" % (name, descriptor_id, widths)
+        )
+        # ToUnicode keeps the text searchable and copyable.
+        entries = [
+            b"<%04X> <%s>" % (glyph_id, self.glyphs[glyph_id].encode("utf-16-be").hex().upper().encode("ascii"))
+            for glyph_id in glyph_ids
+            if glyph_id  # .notdef stands in for characters the font lacks; it maps to no text
+        ]
+        chunks = b"\n".join(
+            b"%d beginbfchar\n%s\nendbfchar" % (len(entries[at : at + 100]), b"\n".join(entries[at : at + 100]))
+            for at in range(0, len(entries), 100)
+        )
+        to_unicode_id = self.write_stream(
+            b"/Filter /FlateDecode",
+            zlib.compress(
+                b"/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+                b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+                b"/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+                b"1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n%s\n"
+                b"endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend" % chunks
+            ),
+        )
+        self.write_object(
+            b"<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H "
+            b"/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>" % (name, cid_font_id, to_unicode_id),
+            self.font_id,
+        )
+        super().close()
+
+
+def write_vector_document(handle: BinaryIO, pages: Iterable[VectorPage]) -> int:
+    writer: VectorPdfWriter | None = None
+    page_count = 0
+    for page in pages:
+        if writer is None:
+            writer = VectorPdfWriter(handle, page.font_path)
+        writer.add_page(page)
+        page_count += 1
+    if writer is not None:
+        writer.close()
+    return page_count
+
+
+@timed("encode")
+def write_sheet_document(path: Path, pages: Iterable[Image.Image], encoding: str = ENCODING_PNG) -> int:
+    """Stream pages into one multi-page PDF or TIFF (by suffix) so only the current page is in memory."""
+    bilevel = encoding in (ENCODING_PNG_1BIT, ENCODING_TIFF_G4)
+    page_count = 0
+    if DOCUMENT_FORMATS[path.suffix.lower()] == "pdf":
+        with path.open("wb") as handle:
+            writer = RasterPdfWriter(handle)
+            for page in pages:
+                writer.add_page(page, bilevel)
+                page_count += 1
+            writer.close()
+        return page_count
+
+    with TiffImagePlugin.AppendingTiffWriter(str(path), new=True) as tiff:
+        for page in pages:
+            if bilevel:
+                bilevel_image(page).save(tiff, format="TIFF", compression="group4", dpi=(PRINT_DPI, PRINT_DPI))
+            else:
+                page.save(tiff, format="TIFF", compression="tiff_deflate", dpi=(PRINT_DPI, PRINT_DPI))
+            tiff.newFrame()
+            page_count += 1
+    return page_count
+
+
+def emit_sheet_document(
+    result: Dict[str, Any], pages: Iterable[Image.Image], output_path: Path, args: argparse.Namespace
+) -> None:
+    """Write every page into one PDF/TIFF at `output_path`, then return or forward the file as `--emit` asks."""
+    if args.emit == EMIT_FD and args.emit_fd < 0:
+        raise SystemExit("--emit fd needs --emit-fd.")
+
+    started = time.perf_counter()
+    page_count = write_sheet_document(output_path, pages, args.image_encoding)
+    encode_seconds = time.perf_counter() - started
+    size = output_path.stat().st_size
+    result.setdefault("saved_paths", []).append(str(output_path))
+    result["page_count"] = page_count
+
+    base64_seconds = 0.0
+    if args.emit == EMIT_BASE64:
+        started = time.perf_counter()
+        with stage("base64"):
+            result["document_base64"] = base64.b64encode(output_path.read_bytes()).decode("ascii")
+        base64_seconds = time.perf_counter() - started
+    elif args.emit == EMIT_FD:
+        # Same framing as page output: a 4-byte big-endian length, then the whole document.
+        with os.fdopen(args.emit_fd, "wb", closefd=False) as handle:
+            handle.write(size.to_bytes(4, "big"))
+            handle.write(output_path.read_bytes())
+
+    result["encoding"] = {
+        "format": DOCUMENT_FORMATS[output_path.suffix.lower()],
+        "page_encoding": args.image_encoding,
+        "emit": args.emit,
+        "bytes": [size],
+        "encode_ms": round(encode_seconds * 1000, 2),
+        "base64_ms": round(base64_seconds * 1000, 2),
+    }
+
+
+def emit_vector_document(
+    result: Dict[str, Any], pages: Iterable[VectorPage], output_path: Path | None, args: argparse.Namespace
+) -> None:
+    """Write the pages as one vector PDF, then save, return or forward it as `--emit` asks."""
+    if output_path and output_path.suffix.lower() != ".pdf":
+        raise SystemExit("--renderer vector writes a PDF; give the output path a .pdf suffix.")
+    if args.emit == EMIT_PATH and not output_path:
+        raise SystemExit("--emit path needs an output path (--output / --questions-output).")
+    if args.emit == EMIT_FD and args.emit_fd < 0:
+        raise SystemExit("--emit fd needs --emit-fd.")
+
+    started = time.perf_counter()
+    with stage("encode"):
+        if output_path:
+            # Pages go straight to the file, so a long run never holds more than the page being written.
+            with output_path.open("wb") as handle:
+                page_count = write_vector_document(handle, pages)
+            result.setdefault("saved_paths", []).append(str(output_path))
+        else:
+            buffer = io.BytesIO()
+            page_count = write_vector_document(buffer, pages)
+    encode_seconds = time.perf_counter() - started
+    size = output_path.stat().st_size if output_path else buffer.tell()
+    result["page_count"] = page_count
+
+    base64_seconds = 0.0
+    if args.emit in (EMIT_BASE64, EMIT_FD):
+        data = output_path.read_bytes() if output_path else buffer.getvalue()
+    if args.emit == EMIT_BASE64:
+        started = time.perf_counter()
+        with stage("base64"):
+            result["document_base64"] = base64.b64encode(data).decode("ascii")
+        base64_seconds = time.perf_counter() - started
+    elif args.emit == EMIT_FD:
+        with os.fdopen(args.emit_fd, "wb", closefd=False) as handle:
+            handle.write(size.to_bytes(4, "big"))
+            handle.write(data)
+
+    result["encoding"] = {
+        "format": "pdf",
+        "renderer": RENDERER_VECTOR,
+        "emit": args.emit,
+        "bytes": [size],
+        "encode_ms": round(encode_seconds * 1000, 2),
+        "base64_ms": round(base64_seconds * 1000, 2),
+    }
+
+
+def load_image_from_base64(value: str) -> Image.Image:
+    decoded = base64.b64decode(value)
+    buffer = io.BytesIO(decoded)
+    return Image.open(buffer).convert("L")
+
+
+def decode_base64_scan(value: str) -> bytes:
+    try:
+        return base64.b64decode(value, validate=False)
+    except ValueError as exc:
+        raise SystemExit(f"Scanned sheet is not valid base64: {exc}") from exc
 
 
 def load_image_from_path(path: Path) -> Image.Image:
@@ -572,6 +2677,17 @@ def extract_student_responses(payload: Any) -> List[str] | None:
     return None
 
 
+def extract_scanned_pages(payload: Any) -> List[str]:
+    if not isinstance(payload, dict):
+        return []
+    for key in ("scannedSheets", "sheetPages", "scanned_sheets"):
+        value = payload.get(key)
+        if isinstance(value, list) and value:
+            return [str(item) for item in value if isinstance(item, str) and item.strip()]
+    single = extract_scanned_sheet(payload)
+    return [single] if single else []
+
+
 def extract_scanned_sheet(payload: Any) -> str | None:
     if not isinstance(payload, dict):
         return None
@@ -589,31 +2705,784 @@ def extract_scanned_sheet(payload: Any) -> str | None:
     return None
 
 
-def attach_detection_evaluation(
-    result: Dict[str, Any],
-    detected_answers: List[str],
-    per_question: List[Dict],
-    correct_answers: List[str] | None,
-    question_numbers: List[int] | None,
-) -> None:
-    result["detected_answers"] = detected_answers
-    result["detection_details"] = per_question
-    if correct_answers and len(correct_answers) == len(detected_answers):
-        correct_count, wrong_count, evaluation_rows = evaluate(
-            correct_answers, detected_answers, question_numbers
+def mark_review(per_question: List[Dict]) -> Dict[str, Any]:
+    """Mark status counts and the question numbers a person should look at."""
+    counts = {status: 0 for status in MARK_STATUSES}
+    for row in per_question:
+        counts[row["status"]] += 1
+    return {
+        "counts": counts,
+        "questions": [row["question_number"] for row in per_question if row["status"] in MARK_REVIEW],
+    }
+
+
+def attach_detection_evaluation(
+    result: Dict[str, Any], detected_answers: List[str], per_question: List[Dict], exam: Exam
+) -> None:
+    result["detected_answers"] = detected_answers
+    result["detection_details"] = per_question
+    result["review"] = mark_review(per_question)
+    correct_answers = exam.correct_answers
+    if correct_answers and len(correct_answers) == len(detected_answers):
+        correct_count, wrong_count, evaluation_rows = evaluate(
+            correct_answers, detected_answers, exam.question_numbers
+        )
+        result["evaluation"] = {
+            "correct_count": correct_count,
+            "wrong_count": wrong_count,
+            "details": evaluation_rows,
+        }
+    elif correct_answers:
+        result["evaluation_error"] = "Answer key count does not match detected answers; skipping score."
+    else:
+        result["evaluation_error"] = "No answer key provided; detection results only."
+
+
+def load_student_ids(raw: str, payload: Any, base_dir: Path) -> List[str]:
+    student_ids: List[str] = []
+    if raw:
+        path = resolve_path(raw, base_dir)
+        if path and path.exists():
+            text = path.read_text(encoding="utf-8-sig")
+            try:
+                loaded = json.loads(text)
+            except json.JSONDecodeError:
+                loaded = text.splitlines()
+            student_ids = [str(item) for item in loaded] if isinstance(loaded, list) else []
+        else:
+            student_ids = raw.split(",")
+    elif isinstance(payload, dict):
+        for key in ("studentIds", "student_ids", "students"):
+            raw_students = payload.get(key)
+            if isinstance(raw_students, list) and raw_students:
+                for student in raw_students:
+                    if isinstance(student, dict):
+                        student = student.get("studentId") or student.get("studentNumber") or student.get("id")
+                    if student is not None:
+                        student_ids.append(str(student))
+                break
+    # Keep roster order but drop blanks and duplicates so file names stay unique.
+    return list(dict.fromkeys(sid.strip() for sid in student_ids if sid and sid.strip()))
+
+
+def safe_file_stem(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value).strip("._") or "sheet"
+
+
+_BATCH_STATE: Dict[str, Any] = {}
+
+
+def init_batch_worker(base_pages: "List[Image.Image] | List[VectorPage]", context: Dict[str, Any]) -> None:
+    configure_font_path(context["font_path"])
+    _BATCH_STATE["base_pages"] = base_pages
+    _BATCH_STATE.update(context)
+
+
+def render_batch_sheet(student_id: str) -> Dict[str, Any]:
+    state = _BATCH_STATE
+    pages = [page.copy() for page in state["base_pages"]]
+    for image in pages:
+        stamp_student_header(image, student_id, state["exam_id"])
+    entry: Dict[str, Any] = {"student_id": student_id}
+    if state["fill_random"]:
+        entry["simulated_answers"] = mark_random_answers(pages, state["grid"])
+    stem = f"{safe_file_stem(state['exam_id'])}_{safe_file_stem(student_id)}"
+    if state["renderer"] == RENDERER_VECTOR:
+        # Every page of a student's sheet goes into one PDF.
+        file_name = Path(f"{stem}.pdf")
+        buffer = io.BytesIO()
+        write_vector_document(buffer, pages)
+        encoded_pages = [buffer.getvalue()]
+    else:
+        file_name = Path(f"{stem}{encoded_suffix(state['image_encoding'])}")
+        encoded_pages = [encode_image(image, state["image_encoding"], state["png_compress_level"]) for image in pages]
+    if state["output_dir"]:
+        paths = [page_output_path(Path(state["output_dir"]) / file_name, page) for page in range(len(encoded_pages))]
+        for data, path in zip(encoded_pages, paths):
+            path.write_bytes(data)
+        entry["paths"] = [str(path) for path in paths]
+    else:
+        entry["files"] = [str(page_output_path(file_name, page)) for page in range(len(encoded_pages))]
+        entry["data"] = encoded_pages
+    return entry
+
+
+def run_answer_sheet_batch(args: argparse.Namespace, payload: Any, exam: Exam, base_dir: Path) -> Dict[str, Any]:
+    student_ids = load_student_ids(args.student_ids, payload, base_dir)
+    if not student_ids:
+        raise SystemExit("answerSheetBatch needs --student-ids or a studentIds list in the payload.")
+
+    archive_path = resolve_path(args.archive, base_dir)
+    output_dir = resolve_path(args.output_dir, base_dir)
+    if not archive_path and not output_dir:
+        raise SystemExit("answerSheetBatch needs --output-dir or --archive.")
+    if output_dir:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    if archive_path:
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # The shared body is drawn once; workers only stamp the header text and QR on a copy.
+    base_pages = vector_answer_sheet_base(exam) if args.renderer == RENDERER_VECTOR else cached_answer_sheet_pages(exam)
+    context = {
+        "exam_id": exam.exam_id,
+        "renderer": args.renderer,
+        "grid": exam.grid,
+        "fill_random": args.fill_random,
+        "image_encoding": args.image_encoding,
+        "png_compress_level": args.png_compress_level,
+        "font_path": _FONT_PATH_OVERRIDE,
+        "output_dir": None if archive_path else str(output_dir),
+    }
+
+    workers = min(args.workers if args.workers > 0 else (os.cpu_count() or 1), len(student_ids))
+    sheets: List[Dict[str, Any]] = []
+    archive = zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED) if archive_path else None
+    executor = None
+    try:
+        if workers <= 1:
+            init_batch_worker(base_pages, context)
+            rendered = map(render_batch_sheet, student_ids)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=init_batch_worker, initargs=(base_pages, context)
+            )
+            rendered = executor.map(render_batch_sheet, student_ids, chunksize=max(1, len(student_ids) // (workers * 4)))
+        for entry in rendered:
+            if archive is not None:
+                for file_name, data in zip(entry["files"], entry.pop("data")):
+                    archive.writestr(file_name, data)
+            sheets.append(entry)
+    finally:
+        # Also on a worker or archive error, so no pool processes outlive the batch.
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if archive is not None:
+            archive.close()
+
+    batch: Dict[str, Any] = {"student_count": len(student_ids), "workers": workers, "sheets": sheets}
+    if archive_path:
+        batch["archive"] = str(archive_path)
+    else:
+        batch["output_dir"] = str(output_dir)
+    return batch
+
+
+def run_class_print(
+    args: argparse.Namespace, payload: Any, exam: Exam, base_dir: Path, result: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Write one print-ready PDF/TIFF holding every student's blank sheet, in roster order.
+
+    Pages are drawn as the writer asks for them and written straight to the file, so memory
+    stays at about one page however long the roster is. Every student gets the same number of
+    pages, so student `i` (from 0) starts on page `i * pages_per_student + 1`.
+    """
+    student_ids = load_student_ids(args.student_ids, payload, base_dir)
+    if not student_ids:
+        raise SystemExit("classPrint needs --student-ids or a studentIds list in the payload.")
+    output_path = resolve_path(args.output, base_dir)
+    if not output_path or output_path.suffix.lower() not in DOCUMENT_FORMATS:
+        raise SystemExit("classPrint needs --output ending in .pdf, .tif or .tiff.")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    vector = args.renderer == RENDERER_VECTOR
+    question = args.print_sheet == PRINT_SHEET_QUESTION
+    # The layout (and, for vector output, the drawn body) is shared; each student only adds a header and QR.
+    if question and vector:
+        _, base_pages = vector_question_sheet_base(exam)
+        pages_per_student = len(base_pages)
+    elif question:
+        _, layout = layout_question_sheet(exam.questions)
+        pages_per_student = len(layout)
+    else:
+        base_pages = vector_answer_sheet_base(exam) if vector else []
+        pages_per_student = exam.grid.page_count
+
+    def student_pages(student_id: str) -> Iterator[Any]:
+        if vector:
+            for base in base_pages:
+                page = base.copy()
+                stamp_student_header(page, student_id, exam.exam_id)
+                yield page
+        elif question:
+            yield from stamped_question_pages(exam, layout, student_id)
+        else:
+            for image in answer_sheet_base_pages(exam):
+                stamp_student_header(image, student_id, exam.exam_id)
+                yield image
+
+    started = time.perf_counter()
+    last_report = started
+
+    def pages() -> Iterator[Any]:
+        nonlocal last_report
+        for done, student_id in enumerate(student_ids, 1):
+            yield from student_pages(student_id)
+            now = time.perf_counter()
+            if now - last_report >= SCORE_PROGRESS_INTERVAL or done == len(student_ids):
+                last_report = now
+                sys.stderr.write(f"[classPrint] {done}/{len(student_ids)} students, {now - started:.1f}s\n")
+                sys.stderr.flush()
+
+    if vector:
+        emit_vector_document(result, pages(), output_path, args)
+    else:
+        emit_sheet_document(result, pages(), output_path, args)
+    elapsed = time.perf_counter() - started
+    return {
+        "student_count": len(student_ids),
+        "sheet": args.print_sheet,
+        "pages_per_student": pages_per_student,
+        "page_count": result["page_count"],
+        "output": str(output_path),
+        "elapsed_seconds": round(elapsed, 3),
+        "sheets_per_second": round(len(student_ids) / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def list_scan_sources(spec: str, base_dir: Path) -> List[Tuple[str, str | None]]:
+    """Expand a directory, glob pattern or .zip into (path, zip member) pairs, sorted for stable output."""
+    if not spec:
+        raise SystemExit("scoreBatch needs --scans (a directory, glob pattern or .zip of scans).")
+
+    def is_scan(name: str) -> bool:
+        return Path(name).suffix.lower() in SCAN_EXTENSIONS
+
+    path = resolve_path(spec, base_dir)
+    if path and path.is_dir():
+        items = [str(item) for item in sorted(path.rglob("*")) if item.is_file() and is_scan(item.name)]
+    elif path and path.is_file() and zipfile.is_zipfile(path):
+        confine_path(path)
+        with zipfile.ZipFile(path) as archive:
+            members = sorted(info.filename for info in archive.infolist() if not info.is_dir() and is_scan(info.filename))
+        return [(str(path), member) for member in members]
+    elif path and path.is_file():
+        items = [str(path)]
+    else:
+        pattern = spec if Path(spec).is_absolute() else str(base_dir / spec)
+        items = [item for item in sorted(glob.glob(pattern, recursive=True)) if is_scan(item)]
+    for item in items:
+        confine_path(item)
+    return [(item, None) for item in items]
+
+
+def decode_image_bytes(data: bytes | bytearray | memoryview) -> np.ndarray:
+    import numpy as np
+
+    cv2 = load_cv2()
+    if cv2 is not None:
+        decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if decoded is not None:
+            return decoded
+    with Image.open(io.BytesIO(data)) as img:
+        return np.array(img.convert("L"))
+
+
+_SCORE_STATE: Dict[str, Any] = {}
+
+
+def init_score_worker(context: Dict[str, Any]) -> None:
+    _SCORE_STATE.clear()
+    _SCORE_STATE.update(context)
+    _SCORE_STATE["archives"] = {}
+    if context.get("ring"):
+        from multiprocessing import shared_memory
+
+        # Workers share the parent's resource tracker, so attaching does not hand them ownership:
+        # the segment is unlinked by the parent alone.
+        _SCORE_STATE["ring"] = shared_memory.SharedMemory(name=context["ring"])
+
+
+def ring_page(buffer: Any, slot: int, shape: Tuple[int, int]) -> np.ndarray:
+    import numpy as np
+
+    return np.ndarray(shape, dtype=np.uint8, buffer=buffer, offset=slot * PAGE_RING_SLOT_BYTES)
+
+
+def score_scan(source: Tuple[str, str | None], page: Tuple[int, Tuple[int, int]] | None = None) -> Dict[str, Any]:
+    """Score one scan; `page` names a --page-ring slot that already holds its decoded first page."""
+    state = _SCORE_STATE
+    path, member = source
+    line: Dict[str, Any] = {"file": f"{path}!{member}" if member else path}
+    try:
+        if member:
+            archive = state["archives"].get(path)
+            if archive is None:
+                archive = state["archives"][path] = zipfile.ZipFile(path)
+            image_source: Any = archive.read(member)
+        else:
+            image_source = Path(path)
+        # A page from the ring is a view into shared memory: nothing was copied to get it here.
+        image = ring_page(state["ring"].buf, *page) if page else None
+        if state["route"]:
+            # Identify stage: decode the page once, read only the QR box, then score against that exam.
+            if image is None:
+                image = load_grayscale(image_source, state["scan_reduction"])
+            alignment = align_page(image)
+            qr = read_sheet_qr(image, alignment)
+            if not qr or not qr.get("exam"):
+                raise ValueError("No readable exam QR code on the sheet.")
+            line["exam_id"] = qr["exam"]
+            line["student_id"] = qr.get("student")
+            exam = state["exams"].get(qr["exam"])
+            if exam is None:
+                raise ValueError(f"No exam payload for exam ID {qr['exam']}.")
+        else:
+            exam = next(iter(state["exams"].values()))
+        known: List[Dict[str, Any]] = []
+        if image is not None and exam.grid.page_count == 1:
+            # Score the page that was decoded for the QR, through the alignment already fitted to it.
+            image_source = image
+            known = [alignment] if state["route"] else []
+        detected_answers, per_question, alignments = detect_answers(
+            image_source, exam, scan_reduction=state["scan_reduction"], alignments=known
+        )
+        line["ok"] = True
+        line["detected_answers"] = detected_answers
+        line["review"] = mark_review(per_question)
+        line["alignment"] = alignments
+        correct_answers = exam.correct_answers
+        if correct_answers and len(correct_answers) == len(detected_answers):
+            correct_count, wrong_count, _ = evaluate(correct_answers, detected_answers)
+            line["correct_count"] = correct_count
+            line["wrong_count"] = wrong_count
+        elif correct_answers:
+            line["evaluation_error"] = "Answer key count does not match detected answers; skipping score."
+    except Exception as exc:  # one unreadable scan must not abort the batch
+        line["ok"] = False
+        line["error"] = f"{type(exc).__name__}: {exc}"
+    return line
+
+
+def decode_into_slot(
+    buffer: Any,
+    slot: int,
+    source: Tuple[str, str | None],
+    reduction: str,
+    archives: Dict[Tuple[int, str], zipfile.ZipFile],
+) -> Tuple[int, int] | None:
+    """Decode a scan's first page into a ring slot; None when it is too large for one."""
+    path, member = source
+    if member:
+        # ZipFile objects are not safe to share between threads, so each decoder thread opens its own.
+        key = (threading.get_ident(), path)
+        archive = archives.get(key)
+        if archive is None:
+            archive = archives[key] = zipfile.ZipFile(path)
+        image = load_grayscale(archive.read(member), reduction)
+    else:
+        image = load_grayscale(Path(path), reduction)
+    if image is None or not hasattr(image, "shape"):
+        raise FileNotFoundError(f"Unable to load image from {path}")
+    if image.ndim != 2 or image.nbytes > PAGE_RING_SLOT_BYTES:
+        return None
+    ring_page(buffer, slot, image.shape)[...] = image
+    return image.shape
+
+
+def run_page_ring(
+    sources: List[Tuple[str, str | None]],
+    context: Dict[str, Any],
+    workers: int,
+    slots: int,
+    emit: Callable[[Dict[str, Any]], None],
+) -> Dict[str, Any]:
+    """--page-ring: decode in threads of this process into shared-memory page slots; workers only detect.
+
+    Worker processes receive the compiled exams once and then just a slot index and page
+    shape per scan, reading the page through a zero-copy view. The ring is the only page
+    memory, so it stays the same size however many scans the batch holds.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+    from multiprocessing import shared_memory
+
+    ring = shared_memory.SharedMemory(create=True, size=slots * PAGE_RING_SLOT_BYTES)
+    free = list(range(slots - 1, -1, -1))
+    archives: Dict[Tuple[int, str], zipfile.ZipFile] = {}
+    fallbacks = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as decoders, ProcessPoolExecutor(
+            max_workers=workers, initializer=init_score_worker, initargs=({**context, "ring": ring.name},)
+        ) as detectors:
+            pending = iter(sources)
+            in_flight: Dict[Any, Tuple[str, Tuple[str, str | None], int | None]] = {}
+            exhausted = False
+            while True:
+                # A free slot is the only admission ticket, so decoding never runs ahead of detection.
+                while free and not exhausted:
+                    source = next(pending, None)
+                    if source is None:
+                        exhausted = True
+                        break
+                    slot = free.pop()
+                    future = decoders.submit(
+                        decode_into_slot, ring.buf, slot, source, context["scan_reduction"], archives
+                    )
+                    in_flight[future] = ("decode", source, slot)
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage_name, source, slot = in_flight.pop(future)
+                    if stage_name == "detect":
+                        if slot is not None:
+                            free.append(slot)
+                        emit(future.result())
+                        continue
+                    try:
+                        shape = future.result()
+                    except Exception as exc:
+                        free.append(slot)
+                        path, member = source
+                        emit({"file": f"{path}!{member}" if member else path, "ok": False, "error": f"{type(exc).__name__}: {exc}"})
+                        continue
+                    if shape is None:
+                        fallbacks += 1
+                        free.append(slot)
+                        in_flight[detectors.submit(score_scan, source)] = ("detect", source, None)
+                    else:
+                        in_flight[detectors.submit(score_scan, source, (slot, shape))] = ("detect", source, slot)
+    finally:
+        for archive in archives.values():
+            archive.close()
+        ring.close()
+        ring.unlink()
+    return {"slots": slots, "slot_mib": round(PAGE_RING_SLOT_BYTES / 2**20, 1), "decoded_by_workers": fallbacks}
+
+
+def load_exam_library(spec: str, base_dir: Path, layout_override: str = "") -> Dict[str, Exam]:
+    """Compile every exam payload in a directory (or glob) of .json files, keyed by exam ID."""
+    path = resolve_path(spec, base_dir)
+    if path and path.is_dir():
+        files = sorted(path.glob("*.json"))
+    else:
+        pattern = spec if Path(spec).is_absolute() else str(base_dir / spec)
+        files = sorted(Path(item) for item in glob.glob(pattern, recursive=True))
+    if not files:
+        raise SystemExit(f"No exam payloads found for --exams {spec}")
+    exams: Dict[str, Exam] = {}
+    for file in files:
+        confine_path(file)
+        exam = build_run_config(load_exam_payload(str(file), base_dir), layout_override)
+        exam_id = str(exam.exam_id)
+        if exam_id in exams:
+            raise SystemExit(f"Exam ID {exam_id} appears in more than one payload under --exams ({file}).")
+        exams[exam_id] = exam
+    return exams
+
+
+def run_score_batch(
+    args: argparse.Namespace,
+    exams: Dict[str, Exam],
+    base_dir: Path,
+    sink: TextIO,
+) -> Dict[str, Any]:
+    """Score every scan under --scans. With --exams, each scan is routed to its exam by QR code."""
+    sources = list_scan_sources(args.scans, base_dir)
+    if not sources:
+        raise SystemExit(f"No scanned sheets found for --scans {args.scans}")
+    route = bool(args.exams)
+    if route and not qr_detectors():
+        raise SystemExit("Routing scans by QR code (--exams) needs OpenCV (cv2).")
+    if not exams:
+        raise SystemExit("scoreBatch needs an exam payload (--json) or --exams.")
+    context = {"exams": exams, "route": route, "scan_reduction": args.scan_reduction}
+    workers = min(args.workers if args.workers > 0 else (os.cpu_count() or 1), max(len(sources), 1))
+    started = time.perf_counter()
+    done = 0
+    failed = 0
+    needs_review = 0
+    last_report = started
+    groups: Dict[str, Dict[str, int]] = {}
+
+    def report(force: bool = False) -> None:
+        nonlocal last_report
+        now = time.perf_counter()
+        if force or now - last_report >= SCORE_PROGRESS_INTERVAL:
+            last_report = now
+            sys.stderr.write(f"[scoreBatch] {done}/{len(sources)} scored, {failed} failed, {now - started:.1f}s\n")
+            sys.stderr.flush()
+
+    def emit(line: Dict[str, Any]) -> None:
+        nonlocal done, failed, needs_review
+        done += 1
+        failed += 0 if line["ok"] else 1
+        needs_review += 1 if line.get("review", {}).get("questions") else 0
+        if route:
+            group = groups.setdefault(line.get("exam_id") or "unidentified", {"scanned": 0, "failed": 0})
+            group["scanned"] += 1
+            group["failed"] += 0 if line["ok"] else 1
+        sink.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+        sink.flush()
+        report()
+
+    ring_report: Dict[str, Any] | None = None
+    if workers <= 1:
+        init_score_worker(context)
+        for source in sources:
+            emit(score_scan(source))
+    elif args.page_ring > 0:
+        ring_report = run_page_ring(sources, context, workers, args.page_ring, emit)
+    else:
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+        # Keep a bounded number of scans in flight so memory does not grow with the batch size.
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_score_worker, initargs=(context,)) as executor:
+            pending_sources = iter(sources)
+            in_flight = set()
+            for source in pending_sources:
+                in_flight.add(executor.submit(score_scan, source))
+                if len(in_flight) >= workers * 4:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        emit(future.result())
+            while in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    emit(future.result())
+
+    report(force=True)
+    elapsed = time.perf_counter() - started
+    summary: Dict[str, Any] = {
+        "scanned": done,
+        "failed": failed,
+        "needs_review": needs_review,
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "sheets_per_second": round(done / elapsed, 2) if elapsed > 0 else None,
+    }
+    if route:
+        summary["exams"] = groups
+    if ring_report:
+        summary["page_ring"] = ring_report
+    return summary
+
+
+def score_batch_to_output(
+    args: argparse.Namespace, exams: Dict[str, Exam], base_dir: Path, stream: TextIO | None
+) -> Dict[str, Any]:
+    if args.exams:
+        # The request payload (if any) only fills in exams the library does not have.
+        exams = {**exams, **load_exam_library(args.exams, base_dir, args.layout)}
+    results_output = resolve_path(args.results_output, base_dir)
+    if results_output:
+        results_output.parent.mkdir(parents=True, exist_ok=True)
+        with results_output.open("w", encoding="utf-8") as sink:
+            batch = run_score_batch(args, exams, base_dir, sink)
+        batch["results_output"] = str(results_output)
+        return batch
+    if stream is not None:
+        return run_score_batch(args, exams, base_dir, stream)
+    raise SystemExit("scoreBatch needs --results-output when it cannot stream to stdout.")
+
+
+def load_cohort(spec: str, base_dir: Path, exam_id: str, question_count: int) -> Tuple[List[str], List[List[str]], int]:
+    """Student IDs and answer rows from scoreBatch JSON lines (.jsonl) or JSON lists of students.
+
+    Failed scans, lines routed to another exam and rows of the wrong length are skipped and counted.
+    """
+    pattern = str(resolve_path(spec, base_dir))
+    paths = [Path(match) for match in sorted(glob.glob(pattern))] or [Path(pattern)]
+    student_ids: List[str] = []
+    rows: List[List[str]] = []
+    skipped = 0
+    for path in paths:
+        if not path.is_file():
+            raise SystemExit(f"Cohort file not found: {path}")
+        confine_path(path)
+        text = path.read_text(encoding="utf-8-sig")
+        if path.suffix.lower() == ".jsonl":
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            loaded = json.loads(text)
+            records = loaded.get("students", []) if isinstance(loaded, dict) else loaded
+        for record in records:
+            if not isinstance(record, dict) or record.get("ok") is False:
+                skipped += 1
+                continue
+            if exam_id and record.get("exam_id") not in (None, exam_id):
+                skipped += 1
+                continue
+            answers = record.get("detected_answers") or extract_student_responses(record)
+            if not answers or len(answers) != question_count:
+                skipped += 1
+                continue
+            student = record.get("student_id") or record.get("studentId") or record.get("file")
+            student_ids.append(str(student) if student else f"#{len(rows) + 1}")
+            rows.append(["" if answer is None else str(answer) for answer in answers])
+    return student_ids, rows, skipped
+
+
+def load_answer_key(raw: str, base_dir: Path, question_count: int) -> List[str]:
+    """`--answer-key`: comma-separated answers, or a file holding a JSON list, comma-separated answers
+    or one answer per line. An empty entry voids that question."""
+    path = resolve_path(raw, base_dir)
+    text = raw
+    if path and path.is_file():
+        text = path.read_text(encoding="utf-8-sig").strip()
+        try:
+            loaded = json.loads(text)
+        except json.JSONDecodeError:
+            loaded = None
+        if isinstance(loaded, list):
+            text = ",".join("" if item is None else str(item) for item in loaded)
+        elif "," not in text:
+            text = ",".join(text.splitlines())
+    key = [answer.strip() for answer in text.split(",")]
+    if len(key) != question_count:
+        raise SystemExit(f"--answer-key has {len(key)} answers but the exam has {question_count} questions.")
+    return key
+
+
+def encode_cohort_answers(rows: Sequence[Sequence[str]], options: Tuple[Tuple[str, ...], ...]) -> np.ndarray:
+    """Option index per (student, question) as int8; -1 for blank or unrecognised answers."""
+    import numpy as np
+
+    lookups = [{label: index for index, label in enumerate(order)} for order in options]
+    count = len(rows) * len(options)
+    if all(lookup == lookups[0] for lookup in lookups):
+        shared = lookups[0] if lookups else {}
+        codes = (shared.get(answer, -1) for row in rows for answer in row)
+    else:
+        codes = (lookups[column].get(answer, -1) for row in rows for column, answer in enumerate(row))
+    encoded = np.fromiter(codes, dtype=np.int8, count=count).reshape(len(rows), len(options))
+    # Exact labels cover detected answers; only the misses pay for case and whitespace cleanup.
+    for row, column in zip(*np.nonzero(encoded < 0)):
+        answer = rows[row][column].strip().upper()
+        if answer:
+            encoded[row, column] = next(
+                (index for label, index in lookups[column].items() if label.upper() == answer), -1
+            )
+    return encoded
+
+
+@timed("grade")
+def grade_cohort(answers: np.ndarray, key: np.ndarray, option_count: int) -> Dict[str, Any]:
+    """Grade a (students x questions) option-index matrix against `key` in whole-array operations.
+
+    Returns the per-student scores plus the score distribution and, per question, difficulty
+    (proportion correct), the upper/lower-group discrimination index, the corrected item-total
+    (point-biserial) correlation and how often each option or a blank was chosen. Voided
+    questions (key -1) score nobody and report no item statistics.
+    """
+    import numpy as np
+
+    student_count, question_count = answers.shape
+    scored = key >= 0
+    correct = (answers == key) & scored
+    scores = correct.sum(axis=1)
+    max_score = int(scored.sum())
+
+    statistics: Dict[str, Any] = {"max_score": max_score}
+    if student_count:
+        statistics.update(
+            {
+                "mean": round(float(scores.mean()), 3),
+                "std": round(float(scores.std()), 3),
+                "min": int(scores.min()),
+                "p25": float(np.percentile(scores, 25)),
+                "median": float(np.median(scores)),
+                "p75": float(np.percentile(scores, 75)),
+                "max": int(scores.max()),
+            }
+        )
+    statistics["histogram"] = np.bincount(scores, minlength=max_score + 1).tolist()
+
+    items = correct.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difficulty = items.mean(axis=0)
+        group = max(1, round(student_count * COHORT_GROUP_FRACTION))
+        order = np.argsort(scores, kind="stable")
+        discrimination = items[order[-group:]].mean(axis=0) - items[order[:group]].mean(axis=0)
+        # Correlate each item with the score on the other items so it is not correlated with itself.
+        rest = scores[:, None] - items
+        item_dev = items - difficulty
+        rest_dev = rest - rest.mean(axis=0)
+        point_biserial = (item_dev * rest_dev).sum(axis=0) / np.sqrt(
+            (item_dev**2).sum(axis=0) * (rest_dev**2).sum(axis=0)
         )
-        result["evaluation"] = {
-            "correct_count": correct_count,
-            "wrong_count": wrong_count,
-            "details": evaluation_rows,
-        }
-    elif correct_answers:
-        result["evaluation_error"] = "Answer key count does not match detected answers; skipping score."
+    # Column 0 counts blanks, column k + 1 option k.
+    cells = np.arange(question_count, dtype=np.intp)[None, :] * (option_count + 1) + answers.astype(np.intp) + 1
+    choices = np.bincount(cells.ravel(), minlength=question_count * (option_count + 1)).reshape(
+        question_count, option_count + 1
+    )
+
+    def rounded(values: np.ndarray) -> List[float | None]:
+        return [round(float(value), 4) if scored[idx] and np.isfinite(value) else None for idx, value in enumerate(values)]
+
+    return {
+        "scores": scores,
+        "statistics": statistics,
+        "difficulty": rounded(difficulty),
+        "discrimination": rounded(discrimination),
+        "point_biserial": rounded(point_biserial),
+        "choices": choices,
+    }
+
+
+def run_cohort_grade(args: argparse.Namespace, exam: Exam, base_dir: Path) -> Dict[str, Any]:
+    import numpy as np
+
+    if not args.cohort:
+        raise SystemExit("cohortGrade needs --cohort (scoreBatch JSON lines or a JSON list of students).")
+    started = time.perf_counter()
+    student_ids, rows, skipped = load_cohort(args.cohort, base_dir, exam.exam_id, len(exam.questions))
+    loaded_at = time.perf_counter()
+
+    options = exam.grid.options
+    question_numbers = exam.question_numbers
+    if args.answer_key:
+        key_answers = load_answer_key(args.answer_key, base_dir, len(exam.questions))
+    elif exam.correct_answers:
+        key_answers = ["" if answer is None else str(answer) for answer in exam.correct_answers]
     else:
-        result["evaluation_error"] = "No answer key provided; detection results only."
+        raise SystemExit("cohortGrade needs an answer key: `correct` in the payload or --answer-key.")
+    key = encode_cohort_answers([key_answers], options)[0]
+    answers = encode_cohort_answers(rows, options)
+    graded = grade_cohort(answers, key, max((len(order) for order in options), default=0))
+    graded_at = time.perf_counter()
+
+    max_score = graded["statistics"]["max_score"]
+    scores = graded["scores"].tolist()
+    choices = graded["choices"].tolist()
+    items: List[Dict[str, Any]] = []
+    for idx, order in enumerate(options):
+        items.append(
+            {
+                "question_number": question_numbers[idx],
+                "key": order[key[idx]] if key[idx] >= 0 else None,
+                "difficulty": graded["difficulty"][idx],
+                "discrimination": graded["discrimination"][idx],
+                "point_biserial": graded["point_biserial"][idx],
+                "choices": {"blank": choices[idx][0], **dict(zip(order, choices[idx][1:]))},
+            }
+        )
+    return {
+        "students": len(rows),
+        "skipped": skipped,
+        "answer_key": "override" if args.answer_key else "payload",
+        "voided_questions": [question_numbers[idx] for idx in np.flatnonzero(key < 0).tolist()],
+        "load_ms": round((loaded_at - started) * 1000, 2),
+        "grade_ms": round((graded_at - loaded_at) * 1000, 2),
+        "scores": graded["statistics"],
+        "items": items,
+        "results": [
+            {"student_id": student, "score": score, "percent": round(100 * score / max_score, 2) if max_score else None}
+            for student, score in zip(student_ids, scores)
+        ],
+    }
+
+
+def needs_payload(args: argparse.Namespace) -> bool:
+    # Routed scoreBatch runs find their exams through --exams and --exam-ref names a compiled exam,
+    # so in both cases the request payload is optional.
+    if args.json:
+        return True
+    return not ((args.mode == "scoreBatch" and args.exams) or args.exam_ref)
 
 
-def parse_args() -> argparse.Namespace:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Generate an OMR-style answer sheet from a JSON payload.")
     parser.add_argument(
         "--input",
@@ -630,21 +3499,58 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--mode",
         "-m",
-        choices=["answerSheet", "questionSheet", "scoreCheck"],
+        choices=MODES,
         default="answerSheet",
-        help="Choose: `answerSheet`, `questionSheet`, or `scoreCheck` (default).",
+        help="Choose: `answerSheet` (default), `questionSheet`, `scoreCheck`, `answerSheetBatch`, `scoreBatch`, "
+        "`cohortGrade` or `classPrint`.",
     )
     parser.add_argument(
         "--output",
         "-o",
         default="",
-        help="Optional path to save the answer sheet PNG (base64 is always returned).",
+        help="Optional path to save the answer sheet image (see --emit for what the JSON carries). "
+        "classPrint: the .pdf/.tif/.tiff that receives every student's pages.",
     )
     parser.add_argument(
         "--questions-output",
         "-q",
         default="",
-        help="Optional path to save the question sheet PNG (with text + options). Use empty string to skip.",
+        help="Optional path to save the question sheet (with text + options). A .pdf or .tif/.tiff path gets every "
+        "page in one document; other paths get one image per page. Use empty string to skip.",
+    )
+    parser.add_argument(
+        "--emit",
+        choices=EMIT_MODES,
+        default=EMIT_BASE64,
+        help="How sheet images are returned: `base64` in the JSON (default), `path` (only the saved file paths), "
+        "or `fd` (length-prefixed raw bytes written to --emit-fd).",
+    )
+    parser.add_argument(
+        "--emit-fd",
+        type=int,
+        default=-1,
+        help="File descriptor used by --emit fd (for example a pipe inherited from the caller).",
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=RENDERERS,
+        default=RENDERER_RASTER,
+        help="`raster` (default) draws 300 dpi images. `vector` writes the same layout as a PDF with an embedded "
+        "font subset and a vector QR code, without rasterizing (answerSheet, questionSheet, answerSheetBatch, classPrint).",
+    )
+    parser.add_argument(
+        "--image-encoding",
+        choices=IMAGE_ENCODINGS,
+        default=ENCODING_PNG,
+        help="`png` (8-bit grayscale, default), `png1` (1-bit PNG) or `tiff-g4` (bilevel CCITT Group 4 TIFF).",
+    )
+    parser.add_argument(
+        "--png-compress-level",
+        type=int,
+        choices=range(-1, 10),
+        default=-1,
+        metavar="{0..9}",
+        help="zlib level for PNG encodings (lower is faster, larger). Defaults to Pillow's level.",
     )
     parser.add_argument(
         "--student-id",
@@ -655,7 +3561,22 @@ def parse_args() -> argparse.Namespace:
         "--scanned-sheet",
         "-s",
         default="",
-        help="Optional path to a scanned answer sheet image (used for scoring).",
+        help="Optional path to a scanned answer sheet image (used for scoring). "
+        f"For multi-page sheets pass one path per page separated by `{os.pathsep}` or a multi-page TIFF.",
+    )
+    parser.add_argument(
+        "--scan-reduction",
+        choices=SCAN_REDUCTIONS,
+        default=SCAN_REDUCTION_AUTO,
+        help="Decode scans at 1/N size before detection. `auto` (default) keeps at least the "
+        "2480px canvas width, so only high-DPI scans are reduced.",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default="",
+        help="Answer sheet layout: `classic` (one question per row) or `dense` (multi-column). "
+        "Defaults to the payload's template.layout, then classic.",
     )
     parser.add_argument(
         "--fill-random",
@@ -667,104 +3588,302 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Run detection against the generated sheet (works best with --fill-random).",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--student-ids",
+        default="",
+        help="answerSheetBatch/classPrint: comma-separated student IDs or a file (JSON list or one ID per line). "
+        "Defaults to `studentIds` in the payload.",
+    )
+    parser.add_argument(
+        "--print-sheet",
+        choices=PRINT_SHEETS,
+        default=PRINT_SHEET_ANSWER,
+        help="classPrint: print each student's `answer` sheet (default) or `question` sheet.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default="",
+        help="answerSheetBatch: directory that receives one PNG per student.",
+    )
+    parser.add_argument(
+        "--archive",
+        default="",
+        help="answerSheetBatch: write all sheets into this .zip instead of --output-dir.",
+    )
+    parser.add_argument(
+        "--scans",
+        default="",
+        help="scoreBatch: directory, glob pattern or .zip of scanned answer sheets.",
+    )
+    parser.add_argument(
+        "--page-ring",
+        type=int,
+        default=0,
+        help="scoreBatch with --workers > 1: decode scans in threads into this many shared-memory page slots "
+        "so worker processes only run detection (0 = each worker decodes its own scans).",
+    )
+    parser.add_argument(
+        "--exams",
+        default="",
+        help="scoreBatch: directory or glob of exam payload JSON files. Each scan is routed to its exam "
+        "by the QR code, so one pile can mix several exams and --json becomes optional.",
+    )
+    parser.add_argument(
+        "--results-output",
+        default="",
+        help="scoreBatch: write the JSON lines here instead of streaming them to stdout.",
+    )
+    parser.add_argument(
+        "--cohort",
+        default="",
+        help="cohortGrade: scoreBatch results (.jsonl) or a JSON list of {studentId, answers} to grade "
+        "together. A glob pattern combines several files.",
+    )
+    parser.add_argument(
+        "--answer-key",
+        default="",
+        help="cohortGrade: corrected answer key, comma-separated or a JSON list file, replacing `correct` in "
+        "the payload. Leave an entry empty to void that question.",
+    )
+    parser.add_argument(
+        "--exam-cache",
+        default="",
+        help="Directory of compiled exam specs (.npz keyed by a hash of the exam payload and layout). Repeat "
+        "requests for the same exam skip payload normalisation and bubble layout.",
+    )
+    parser.add_argument(
+        "--exam-ref",
+        default="",
+        help="Use the compiled spec with this hash, or the newest one for this exam ID, from --exam-cache "
+        "instead of a payload.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="",
+        help="Optional directory that persists rendered sheet base layers between runs.",
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=SHEET_CACHE_MAX_MB,
+        help="Memory budget for the in-process sheet base layer cache (LRU).",
+    )
+    parser.add_argument(
+        "--font-path",
+        default="",
+        help=f"TrueType font used for all sheet text (or set {FONT_PATH_ENV}). Resolved once per process.",
+    )
+    parser.add_argument(
+        "--result-format",
+        choices=RESULT_FORMATS,
+        default=RESULT_FORMAT_JSON,
+        help="`json` (indented, default), `compact` (unindented JSON with per-question values as parallel arrays, "
+        "intensities as a question x option matrix and correctness as a bitmap) or `msgpack` (the compact result "
+        "as MessagePack; needs the msgpack package).",
+    )
+    parser.add_argument(
+        "--no-details",
+        action="store_true",
+        help="Leave per-question detection details and evaluation rows out of the result.",
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Add a `startup` block with import/ready times and the heavy modules that were loaded.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=PROFILE_MEMORY,
+        default="",
+        choices=PROFILES,
+        help="Add a `timings` block: wall/CPU time and tracemalloc peak per stage (parsing, fonts, drawing, "
+        "QR, encoding, base64, detection, JSON). Memory tracing inflates the times, imports most of all; "
+        "`--profile time` skips it.",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        default="",
+        help="Write a cProfile dump of the request to this path (view with `python -m pstats` or snakeviz).",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived worker that accepts requests over loopback HTTP instead of a single run.",
+    )
+    parser.add_argument(
+        "--host",
+        default=SERVE_HOST,
+        help="Interface to bind in --serve mode (keep this on loopback).",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=SERVE_PORT,
+        help="Port to listen on in --serve mode.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Workers used in --serve (see --pool), answerSheetBatch and scoreBatch modes (0 = one per CPU).",
+    )
+    parser.add_argument(
+        "--pool",
+        choices=SERVE_POOLS,
+        default=SERVE_POOL_PROCESS,
+        help="--serve: run requests in worker processes or in threads of the serving process.",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=0,
+        help=f"--serve: requests allowed to wait for a worker (0 = {SERVE_QUEUE_PER_WORKER} per worker).",
+    )
+    parser.add_argument(
+        "--queue-full",
+        choices=SERVE_QUEUE_POLICIES,
+        default=SERVE_QUEUE_WAIT,
+        help="--serve: hold new requests until the queue has room (wait) or answer 503 at once (reject).",
+    )
+    parser.add_argument(
+        "--deadline-ms",
+        type=float,
+        default=0,
+        help="--serve: default per-request deadline in milliseconds, queueing included (0 = none).",
+    )
+    parser.add_argument(
+        "--serve-root",
+        action="append",
+        default=[],
+        help="--serve: a directory requests may read from and write to (repeatable). Request paths outside "
+        "every root are rejected; without one, requests cannot name server files.",
+    )
+    return parser
 
 
-def main() -> None:
-    args = parse_args()
-    base_dir = Path(__file__).resolve().parent
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    return build_parser().parse_args(argv)
 
-    def resolve_path(value: str) -> Path | None:
-        if not value:
-            return None
-        resolved = Path(value)
-        return resolved if resolved.is_absolute() else base_dir / resolved
 
-    scanned_sheet_path = resolve_path(args.scanned_sheet)
-    payload_source = args.json or args.input
-    payload = load_exam_payload(payload_source, base_dir)
+def resolve_path(value: str, base_dir: Path) -> Path | None:
+    if not value:
+        return None
+    resolved = Path(value)
+    return resolved if resolved.is_absolute() else base_dir / resolved
+
 
-    if scanned_sheet_path:
+def configure_sheet_cache(args: argparse.Namespace, base_dir: Path) -> None:
+    # Once per process: worker mode shares one cache between all its requests.
+    SHEET_BASE_CACHE.configure(args.cache_size_mb * 1024 * 1024, resolve_path(args.cache_dir, base_dir))
+
+
+def run_request(
+    args: argparse.Namespace, payload: Any, base_dir: Path, stream: TextIO | None = None
+) -> Dict[str, Any]:
+    with SHEET_BASE_CACHE.counting() as cache_counts:
+        result = run_mode(args, payload, base_dir, stream)
+    if args.mode not in ("scoreCheck", "scoreBatch", "cohortGrade"):
+        result["cache"] = {**cache_counts, "entries": len(SHEET_BASE_CACHE.entries)}
+    return result
+
+
+def run_mode(
+    args: argparse.Namespace, payload: Any, base_dir: Path, stream: TextIO | None = None
+) -> Dict[str, Any]:
+    # Multi-page sheets are passed as one path per page, separated like PATH entries.
+    scanned_sheet_paths = [
+        resolve_path(value, base_dir) for value in args.scanned_sheet.split(os.pathsep) if value
+    ]
+
+    for scanned_sheet_path in scanned_sheet_paths:
         if not scanned_sheet_path.exists():
             raise SystemExit(f"Scanned sheet file not found: {scanned_sheet_path}")
-        scanned_sheet_base64 = image_to_base64(load_image_from_path(scanned_sheet_path))
-        if isinstance(payload, dict):
-            payload["scannedSheet"] = scanned_sheet_base64
+    if payload is None and not args.exam_ref:
+        return {"mode": args.mode, "batch": score_batch_to_output(args, {}, base_dir, stream)}
 
-    questions, options_order, meta, correct_answers = build_run_config(payload)
-    question_numbers = derive_question_numbers(questions)
-
-    if not questions:
-        raise SystemExit("No questions provided in the input.")
+    exam, spec_report = resolve_exam_spec(args, payload, base_dir)
 
     result: Dict[str, Any] = {
         "mode": args.mode,
         "exam": {
-            "name": meta["exam_name"],
-            "id": meta["exam_id"],
-            "template": meta["template_name"],
-            "options_per_question": len(options_order),
+            "name": exam.name,
+            "id": exam.exam_id,
+            "template": exam.template_name,
+            "options_per_question": len(exam.options_order),
         },
-        "question_count": len(questions),
+        "question_count": len(exam.questions),
         "student_id": args.student_id,
     }
+    if spec_report:
+        result["exam_spec"] = spec_report
 
-    if args.mode == "answerSheet":
-        answer_output = resolve_path(args.output)
-        student_answers, _, sheet_image = generate_sheet(
-            questions,
-            options_order,
-            meta["exam_name"],
-            meta["exam_id"],
-            meta["template_name"],
-            args.student_id,
-            image_path=answer_output,
-            fill_random=args.fill_random,
-        )
-        result["image_base64"] = image_to_base64(sheet_image)
+    if args.mode == "answerSheet" and args.renderer == RENDERER_VECTOR:
+        if args.detect:
+            raise SystemExit("--detect reads back rendered pages; use --renderer raster.")
+        student_answers, vector_pages = generate_vector_sheet(exam, args.student_id, fill_random=args.fill_random)
+        emit_vector_document(result, vector_pages, resolve_path(args.output, base_dir), args)
+        result["student_answers"] = student_answers
+        if args.fill_random:
+            result["simulated_answers"] = student_answers
+    elif args.mode == "answerSheet":
+        answer_output = resolve_path(args.output, base_dir)
+        student_answers, sheet_pages = generate_sheet(exam, args.student_id, fill_random=args.fill_random)
+        emit_sheet_pages(result, sheet_pages, answer_output, args)
         result["student_answers"] = student_answers
-        if answer_output:
-            result.setdefault("saved_paths", []).append(str(answer_output))
         if args.fill_random:
             result["simulated_answers"] = student_answers
         if args.detect:
-            detected_answers, per_question = detect_answers(
-                sheet_image, questions, options_order, question_numbers=question_numbers
-            )
-            attach_detection_evaluation(
-                result, detected_answers, per_question, correct_answers, question_numbers
-            )
+            detected_answers, per_question, alignments = detect_answers(sheet_pages, exam)
+            attach_detection_evaluation(result, detected_answers, per_question, exam)
+            result["alignment"] = alignments
+    elif args.mode == "answerSheetBatch":
+        result.pop("student_id")
+        result["batch"] = run_answer_sheet_batch(args, payload, exam, base_dir)
+    elif args.mode == "classPrint":
+        result.pop("student_id")
+        result["print"] = run_class_print(args, payload, exam, base_dir, result)
+    elif args.mode == "scoreBatch":
+        result.pop("student_id")
+        result["batch"] = score_batch_to_output(args, {str(exam.exam_id): exam}, base_dir, stream)
+    elif args.mode == "cohortGrade":
+        result.pop("student_id")
+        result["cohort"] = run_cohort_grade(args, exam, base_dir)
     elif args.mode == "questionSheet":
-        question_output = resolve_path(args.questions_output)
-        records, question_image = generate_question_sheet(
-            questions,
-            options_order,
-            meta["exam_name"],
-            meta["exam_id"],
-            meta["template_name"],
-            args.student_id,
-            image_path=question_output,
-        )
-        result["records"] = records
-        result["image_base64"] = image_to_base64(question_image)
-        if question_output:
-            result.setdefault("saved_paths", []).append(str(question_output))
+        question_output = resolve_path(args.questions_output, base_dir)
+        if args.renderer == RENDERER_VECTOR:
+            records, vector_pages = vector_question_sheet_pages(exam, args.student_id)
+            result["records"] = records
+            emit_vector_document(result, vector_pages, question_output, args)
+        else:
+            records, _, question_pages = question_sheet_pages(exam, args.student_id)
+            result["records"] = records
+            # Pages are rendered as the writer asks for them, so a long exam never holds more than one raster.
+            if question_output and question_output.suffix.lower() in DOCUMENT_FORMATS:
+                emit_sheet_document(result, question_pages, question_output, args)
+            else:
+                emit_sheet_pages(result, question_pages, question_output, args)
     elif args.mode == "scoreCheck":
-        scanned_base64 = extract_scanned_sheet(payload)
         responses = extract_student_responses(payload)
-        if scanned_base64:
-            sheet_image = load_image_from_base64(scanned_base64)
-            detected_answers, per_question = detect_answers(
-                sheet_image, questions, options_order, question_numbers=question_numbers
-            )
-            attach_detection_evaluation(
-                result, detected_answers, per_question, correct_answers, question_numbers
-            )
-        elif responses and correct_answers:
+        # Scanned files go to detection as paths and base64 pages as encoded bytes, so each page is
+        # decoded exactly once (at reduced size for high-DPI scans) without an intermediate Pillow image.
+        sheet_sources: List[Any] = list(scanned_sheet_paths)
+        if not sheet_sources:
+            sheet_sources = [decode_base64_scan(value) for value in extract_scanned_pages(payload)]
+        if sheet_sources:
+            try:
+                detected_answers, per_question, alignments = detect_answers(
+                    sheet_sources, exam, scan_reduction=args.scan_reduction
+                )
+            except ValueError as exc:
+                raise SystemExit(str(exc)) from exc
+            attach_detection_evaluation(result, detected_answers, per_question, exam)
+            result["alignment"] = alignments
+        elif responses and exam.correct_answers:
             result["responses"] = responses
-            if len(responses) == len(correct_answers):
+            if len(responses) == len(exam.correct_answers):
                 correct_count, wrong_count, evaluation_rows = evaluate(
-                    correct_answers, responses, question_numbers
+                    exam.correct_answers, responses, exam.question_numbers
                 )
                 result["evaluation"] = {
                     "correct_count": correct_count,
@@ -775,14 +3894,573 @@ def main() -> None:
                 result["evaluation_error"] = "Number of responses does not match the answer key."
         elif responses:
             result["responses"] = responses
-            if correct_answers:
+            if exam.correct_answers:
                 result["evaluation_error"] = "Cannot evaluate responses; length mismatch with answer key."
             else:
                 result["message"] = "Responses captured but no answer key provided."
         else:
             result["message"] = "Provide scanned sheet base64 (sheetBase64/answerSheetBase64) or responses for scoring."
-    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+def camel_to_snake(name: str) -> str:
+    return "".join("_" + ch.lower() if ch.isupper() else ch for ch in name).lstrip("_")
+
+
+def build_request_args(request: Dict[str, Any]) -> argparse.Namespace:
+    # Start from the CLI defaults so every flag behaves exactly like a one-shot run.
+    args = parse_args([])
+    for key, value in request.items():
+        dest = camel_to_snake(key)
+        if dest in SERVE_RESERVED_KEYS or not hasattr(args, dest):
+            continue
+        setattr(args, dest, value)
+    if args.mode not in MODES:
+        raise SystemExit(f"Unsupported mode: {args.mode}")
+    if args.emit == EMIT_FD:
+        raise SystemExit("--emit fd is not available in worker mode; use base64 or path.")
+    if args.result_format == RESULT_FORMAT_MSGPACK:
+        raise SystemExit("Worker mode answers in JSON; use resultFormat compact.")
+    return args
+
+
+# The --serve-root directories (resolved) while a worker request runs; None outside worker mode.
+_SERVE_ROOTS: contextvars.ContextVar[Tuple[Path, ...] | None] = contextvars.ContextVar("serve_roots", default=None)
+
+
+def inside_roots(path: Path | str, allowed: Sequence[Path]) -> bool:
+    real = Path(os.path.realpath(path))
+    return any(real == root or root in real.parents for root in allowed)
+
+
+def confine_path(path: Path | str) -> None:
+    """In worker mode, refuse a file outside the --serve-root directories.
+
+    `check_request_paths` vets what a request names; loaders call this on what a directory or
+    glob expands to, so a symlink inside a root cannot lead out of it.
+    """
+    allowed = _SERVE_ROOTS.get()
+    if allowed is not None and not inside_roots(path, allowed):
+        raise SystemExit(f"{path} resolves outside the --serve-root directories.")
+
+
+def check_request_paths(request: Dict[str, Any], base_dir: Path, allowed: Sequence[Path]) -> None:
+    """Refuse any file a request names outside the --serve-root directories.
+
+    Paths are compared after resolving `..` and symlinks. A string `payload`, `json`,
+    `studentIds` and `answerKey` may be inline values instead; like their loaders, they only
+    count as paths when a file by that name exists.
+    """
+    for key, value in request.items():
+        dest = "json" if key == "payload" else camel_to_snake(key)
+        if dest not in SERVE_PATH_KEYS or not isinstance(value, str):
+            continue
+        for item in value.split(os.pathsep) if dest == "scanned_sheet" else [value]:
+            if not item:
+                continue
+            candidates = [resolve_path(item, base_dir)]
+            if dest in SERVE_INLINE_KEYS:
+                # load_exam_payload also tries the name relative to the working directory.
+                candidates = [path for path in (Path(item), *candidates) if os.path.exists(path)]
+            for path in candidates:
+                if not inside_roots(path, allowed):
+                    if not allowed:
+                        raise SystemExit(f"{key} names a server path; start the worker with --serve-root to allow it.")
+                    raise SystemExit(f"{key} must be inside a --serve-root directory.")
+
+
+def handle_serve_request(request: Dict[str, Any], base_dir: Path, roots: Sequence[str] = ()) -> Dict[str, Any]:
+    allowed = tuple(Path(os.path.realpath(resolve_path(root, base_dir))) for root in roots)
+    token = _SERVE_ROOTS.set(allowed)
+    try:
+        if not isinstance(request, dict):
+            raise SystemExit("Request body must be a JSON object.")
+        check_request_paths(request, base_dir, allowed)
+        args = build_request_args(request)
+        with request_profiling(args, base_dir) as timer:
+            payload = request.get("payload")
+            if payload is None and needs_payload(args):
+                payload = load_exam_payload(args.json or args.input, base_dir)
+            elif isinstance(payload, str):
+                payload = load_exam_payload(payload, base_dir)
+            result = shape_result(run_request(args, payload, base_dir), args)
+            if timer is not None:
+                result["timings"] = profile_timings(timer, args, base_dir)
+        return {"ok": True, "result": result}
+    except SystemExit as exc:
+        return {"ok": False, "error": str(exc)}
+    except Exception as exc:  # keep the worker alive for the next request
+        return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    finally:
+        _SERVE_ROOTS.reset(token)
+
+
+def warm_worker(font_path: str, args: argparse.Namespace, base_dir: Path) -> None:
+    # Pay for imports, font resolution and cache set-up once per worker instead of on its first request.
+    configure_font_path(font_path)
+    configure_sheet_cache(args, base_dir)
+    for size in (HEADER_FONT_SIZE, BODY_FONT_SIZE, SMALL_FONT_SIZE):
+        load_font(size)
+    import numpy  # noqa: F401
+    import qrcode  # noqa: F401
+
+    load_cv2()
+
+
+def latency_percentiles(samples: Iterable[float]) -> Dict[str, float | None]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+
+    def rank(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {"p50": rank(0.5), "p90": rank(0.9), "p99": rank(0.99), "max": round(ordered[-1] * 1000, 2)}
+
+
+@dataclass
+class ServeJob:
+    job_id: str
+    request: Dict[str, Any]
+    submitted: float  # event loop clock
+    deadline: float | None
+    done: Any  # asyncio.Future resolved with (HTTP status, response body)
+    started: float | None = None
+
+
+class ScoringService:
+    """Bounded front end for the worker pool used by `--serve`.
+
+    Requests wait in a fixed-size queue and one dispatcher per worker hands them to the
+    pool, so a burst never runs more than `workers` jobs at once. A full queue either
+    holds the caller (`wait`) or answers 503 (`reject`). A job past its deadline or
+    cancelled while queued never runs; one that is already running keeps its worker until
+    it finishes, because pool work cannot be interrupted, but its caller is answered at once.
+    """
+
+    def __init__(
+        self,
+        executor: Any,
+        workers: int,
+        pool: str,
+        queue_size: int,
+        queue_full: str,
+        deadline_ms: float,
+        base_dir: Path,
+        roots: Sequence[str] = (),
+    ) -> None:
+        import asyncio
+
+        self.executor = executor
+        self.workers = workers
+        self.pool = pool
+        self.queue_full = queue_full
+        self.deadline_ms = deadline_ms
+        self.base_dir = base_dir
+        self.roots = tuple(roots)
+        self.queue: Any = asyncio.Queue(queue_size)
+        self.jobs: Dict[str, ServeJob] = {}
+        self.running = 0
+        self.counters = dict.fromkeys(("accepted", "rejected", "completed", "failed", "expired", "cancelled"), 0)
+        self.queue_waits: deque = deque(maxlen=SERVE_LATENCY_WINDOW)
+        self.service_times: deque = deque(maxlen=SERVE_LATENCY_WINDOW)
+        self.latencies: deque = deque(maxlen=SERVE_LATENCY_WINDOW)
+        self.dispatchers: List[Any] = []
+
+    def start(self) -> None:
+        import asyncio
+
+        self.dispatchers = [asyncio.ensure_future(self.dispatch()) for _ in range(self.workers)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pool": self.pool,
+            "queue": {"depth": self.queue.qsize(), "capacity": self.queue.maxsize, "policy": self.queue_full},
+            "running": self.running,
+            "jobs": dict(self.counters),
+            "latency_ms": {
+                "queue": latency_percentiles(self.queue_waits),
+                "service": latency_percentiles(self.service_times),
+                "total": latency_percentiles(self.latencies),
+            },
+            "window": len(self.latencies),
+        }
+
+    def finish(self, job: ServeJob, status: int, body: Dict[str, Any], outcome: str) -> None:
+        if job.done.done():
+            return
+        import asyncio
+
+        self.counters[outcome] += 1
+        self.latencies.append(asyncio.get_running_loop().time() - job.submitted)
+        self.jobs.pop(job.job_id, None)
+        job.done.set_result((status, body))
+
+    def cancel(self, job_id: str) -> Dict[str, Any] | None:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        state = "queued" if job.started is None else "running"
+        self.finish(job, 409, {"ok": False, "error": f"Job {job_id} was cancelled."}, "cancelled")
+        return {"ok": True, "job_id": job_id, "state": state}
+
+    async def submit(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, Any], str]:
+        import asyncio
+        import uuid
+
+        loop = asyncio.get_running_loop()
+        job_id = str(request.get("jobId") or uuid.uuid4().hex)
+        if self.pool == SERVE_POOL_THREAD and request.get("mode") in SERVE_THREAD_UNSAFE_MODES:
+            return 400, {"ok": False, "error": f"{request['mode']} needs --pool process."}, job_id
+        if self.pool == SERVE_POOL_THREAD and request.get("profile") not in (None, False, "", PROFILE_TIME):
+            # tracemalloc is process-wide: concurrent requests would reset and stop each other's tracing.
+            return 400, {"ok": False, "error": 'Memory profiling needs --pool process; use "profile": "time".'}, job_id
+        if job_id in self.jobs:
+            return 409, {"ok": False, "error": f"Job {job_id} is already queued or running."}, job_id
+        try:
+            deadline_ms = float(request.get("deadlineMs") or self.deadline_ms)
+        except (TypeError, ValueError):
+            return 400, {"ok": False, "error": "deadlineMs must be a number of milliseconds."}, job_id
+        now = loop.time()
+        job = ServeJob(job_id, request, now, now + deadline_ms / 1000 if deadline_ms > 0 else None, loop.create_future())
+
+        if self.queue.full() and self.queue_full == SERVE_QUEUE_REJECT:
+            self.counters["rejected"] += 1
+            return 503, {"ok": False, "error": "Worker queue is full; retry later."}, job_id
+        self.jobs[job_id] = job
+        try:
+            remaining = None if job.deadline is None else max(job.deadline - loop.time(), 0.0)
+            try:
+                await asyncio.wait_for(self.queue.put(job), remaining)
+            except asyncio.TimeoutError:
+                self.finish(job, 504, {"ok": False, "error": "Deadline passed while waiting for queue space."}, "expired")
+                return (*job.done.result(), job_id)
+            self.counters["accepted"] += 1
+            remaining = None if job.deadline is None else max(job.deadline - loop.time(), 0.0)
+            try:
+                # Shielded: timing out here answers the caller but must not cancel the dispatcher's future.
+                status, body = await asyncio.wait_for(asyncio.shield(job.done), remaining)
+            except asyncio.TimeoutError:
+                state = "waiting in the queue" if job.started is None else "running"
+                self.finish(job, 504, {"ok": False, "error": f"Deadline passed while {state}."}, "expired")
+                status, body = job.done.result()
+            return status, body, job_id
+        except asyncio.CancelledError:
+            # The caller went away: drop the job if it has not started, discard its result otherwise.
+            self.finish(job, 499, {"ok": False, "error": "Client disconnected."}, "cancelled")
+            raise
+
+    async def dispatch(self) -> None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.done.done():
+                continue  # cancelled or expired while queued
+            job.started = loop.time()
+            self.queue_waits.append(job.started - job.submitted)
+            self.running += 1
+            try:
+                response = await loop.run_in_executor(
+                    self.executor, handle_serve_request, job.request, self.base_dir, self.roots
+                )
+            except Exception as exc:  # a crashed worker process fails this job, not the service
+                response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            finally:
+                self.running -= 1
+            self.service_times.append(loop.time() - job.started)
+            self.finish(job, 200 if response["ok"] else 400, response, "completed" if response["ok"] else "failed")
+
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    409: "Conflict",
+    499: "Client Closed Request",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+async def serve_connection(service: ScoringService, reader: Any, writer: Any) -> None:
+    """One keep-alive HTTP/1.1 connection: `POST /`, `GET /health`, `GET /stats`, `DELETE /jobs/<id>`."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                return
+            method, target = (request_line.decode("latin-1").split() + ["", ""])[:2]
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length") or 0))
+            started = loop.time()
+            path = target.split("?", 1)[0].rstrip("/")
+            extra_headers: Dict[str, str] = {}
+            keep_alive = headers.get("connection", "").lower() != "close"
+
+            if method == "GET" and path == "/health":
+                status, response = 200, {"ok": True, "workers": service.workers}
+            elif method == "GET" and path == "/stats":
+                status, response = 200, {"ok": True, **service.stats()}
+            elif method == "DELETE" and path.startswith("/jobs/"):
+                cancelled = service.cancel(path[len("/jobs/"):])
+                status, response = (200, cancelled) if cancelled else (404, {"ok": False, "error": "No such job."})
+            elif method == "POST" and path == "":
+                try:
+                    request = json.loads(body.decode("utf-8-sig"))
+                except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+                    request, status, response = None, 400, {"ok": False, "error": f"Invalid JSON body: {exc}"}
+                if isinstance(request, dict):
+                    submitted = asyncio.ensure_future(service.submit(request))
+                    # EOF while the job runs means the caller went away. Only the reader's EOF flag is
+                    # watched: a pending read here would race the next request's readline on keep-alive.
+                    while not submitted.done():
+                        await asyncio.wait({submitted}, timeout=SERVE_DISCONNECT_POLL)
+                        if not submitted.done() and reader.at_eof():
+                            submitted.cancel()
+                            await asyncio.gather(submitted, return_exceptions=True)
+                            return
+                    status, response, job_id = submitted.result()
+                    extra_headers["X-Job-Id"] = job_id
+                    if status == 503:
+                        extra_headers["Retry-After"] = "1"
+                elif request is not None:
+                    status, response = 400, {"ok": False, "error": "Request body must be a JSON object."}
+            else:
+                status, response = 404, {"ok": False, "error": "Not found."}
+
+            data = json.dumps(response, ensure_ascii=False, default=json_bytes).encode("utf-8")
+            head = [
+                f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'Error')}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(data)}",
+                *(f"{name}: {value}" for name, value in extra_headers.items()),
+            ]
+            if not keep_alive:
+                head.append("Connection: close")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+            await writer.drain()
+            if path != "/health":
+                sys.stderr.write(
+                    f"[main.py serve] {method} {target} {status} {(loop.time() - started) * 1000:.1f}ms\n"
+                )
+            if not keep_alive:
+                return
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        return
+    finally:
+        writer.close()
+
+
+def serve(args: argparse.Namespace, base_dir: Path) -> None:
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    queue_size = args.queue_size if args.queue_size > 0 else workers * SERVE_QUEUE_PER_WORKER
+    if args.pool == SERVE_POOL_THREAD:
+        # cv2 and numpy release the GIL for the heavy work, so threads share one warm interpreter.
+        warm_worker(args.font_path, args, base_dir)
+        executor: Any = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="serve")
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker, initargs=(args.font_path, args, base_dir))
+
+    async def run() -> None:
+        service = ScoringService(
+            executor, workers, args.pool, queue_size, args.queue_full, args.deadline_ms, base_dir, args.serve_root
+        )
+        service.start()
+        server = await asyncio.start_server(
+            lambda reader, writer: serve_connection(service, reader, writer), args.host, args.port
+        )
+        port = server.sockets[0].getsockname()[1]
+        sys.stderr.write(
+            f"[main.py serve] listening on http://{args.host}:{port} with {workers} {args.pool} worker(s), "
+            f"queue {queue_size} ({args.queue_full} when full), "
+            f"file access {', '.join(args.serve_root) or 'off'}\n"
+        )
+        sys.stderr.flush()
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def correctness_bitmap(flags: Iterable[bool]) -> bytes:
+    """Pack per-question correctness into bits: question i (from 0) is bit i % 8 of byte i // 8."""
+    flags = list(flags)
+    packed = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            packed[index >> 3] |= 1 << (index & 7)
+    return bytes(packed)
+
+
+def compact_result(result: Dict[str, Any], details: bool = True, binary: bool = False) -> Dict[str, Any]:
+    """Re-shape a result for machines: per-question rows become parallel arrays.
+
+    `detection` holds one list per field, with `intensities` and `fill` as question x option
+    matrices whose columns follow `detection.options` (null where a question has fewer options).
+    `evaluation.key` lists the correct answers and `evaluation.correct` is a
+    `correctness_bitmap`. Bytes stay raw in MessagePack and become base64 in JSON; with
+    `binary`, base64 images and documents are also returned as raw bytes under
+    `image`, `pages` and `document`.
+    """
+    compact = {key: value for key, value in result.items() if key not in ("detection_details", "evaluation")}
+    if binary:
+        for key in ("image", "pages", "document"):
+            value = compact.pop(f"{key}_base64", None)
+            if isinstance(value, list):
+                compact[key] = [base64.b64decode(item) for item in value]
+            elif value is not None:
+                compact[key] = base64.b64decode(value)
+    rows = result.get("detection_details") or []
+    evaluation = result.get("evaluation")
+    numbered = rows or (evaluation or {}).get("details") or []
+    if numbered:
+        compact["question_numbers"] = [row["question_number"] for row in numbered]
+    if rows and details:
+        options = list(dict.fromkeys(option for row in rows for option in row["intensities"]))
+        compact["detection"] = {
+            "options": options,
+            "status": [row["status"] for row in rows],
+            "confidence": [row["confidence"] for row in rows],
+            "background": [row["background"] for row in rows],
+            "intensities": [[row["intensities"].get(option) for option in options] for row in rows],
+            "fill": [[row["fill"].get(option) for option in options] for row in rows],
+        }
+    if evaluation is not None:
+        compact["evaluation"] = {
+            "correct_count": evaluation["correct_count"],
+            "wrong_count": evaluation["wrong_count"],
+            "key": [row["correct"] for row in evaluation["details"]],
+            "correct": correctness_bitmap(row["is_correct"] for row in evaluation["details"]),
+        }
+    return compact
+
+
+def shape_result(result: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    if args.result_format != RESULT_FORMAT_JSON:
+        return compact_result(
+            result, details=not args.no_details, binary=args.result_format == RESULT_FORMAT_MSGPACK
+        )
+    if args.no_details:
+        result.pop("detection_details", None)
+        result.get("evaluation", {}).pop("details", None)
+    return result
+
+
+def json_bytes(value: Any) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize_result(
+    result: Dict[str, Any], result_format: str, timings: Callable[[], Dict[str, Any]] | None = None
+) -> str | bytes:
+    """Encode the final result: text for the JSON formats, bytes for MessagePack.
+
+    `timings` is called once the body is encoded and appended as the last key, so a profile
+    covers serialization while a large result (base64 pages) is still encoded only once.
+    """
+    if result_format == RESULT_FORMAT_MSGPACK:
+        try:
+            import msgpack
+        except ImportError as exc:
+            raise SystemExit("--result-format msgpack needs the msgpack package (pip install msgpack).") from exc
+
+        # Detection values carry two or three decimals, which single precision holds exactly enough.
+        packer = msgpack.Packer(use_single_float=True)
+        with stage("serialize"):
+            parts = [packer.pack_map_header(len(result) + (timings is not None))]
+            for key, value in result.items():
+                parts += [packer.pack(key), packer.pack(value)]
+        if timings is not None:
+            parts += [packer.pack("timings"), packer.pack(timings())]
+        return b"".join(parts)
+    if result_format == RESULT_FORMAT_COMPACT:
+        with stage("serialize"):
+            output = json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=json_bytes)
+        if timings is not None:
+            output = output[:-1] + ',"timings":' + json.dumps(timings(), separators=(",", ":")) + "}"
+        return output
+    with stage("serialize"):
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+    if timings is not None:
+        output = output[:-2] + ',\n  "timings": ' + json.dumps(timings()) + "\n}"
+    return output
+
+
+def startup_report(ready_at: float) -> Dict[str, Any]:
+    return {
+        "imports_ms": round((MODULE_READY_AT - IMPORT_STARTED_AT) * 1000, 2),
+        "ready_ms": round((ready_at - IMPORT_STARTED_AT) * 1000, 2),
+        "total_ms": round((time.perf_counter() - IMPORT_STARTED_AT) * 1000, 2),
+        "modules": {name: name in sys.modules for name in ("numpy", "cv2", "qrcode")},
+    }
+
+
+def profile_timings(timer: StageTimer, args: argparse.Namespace, base_dir: Path) -> Dict[str, Any]:
+    timings = timer.report()
+    if args.profile_dump:
+        timings["profile_dump"] = str(resolve_path(args.profile_dump, base_dir))
+    return timings
+
+
+def main() -> None:
+    args = parse_args()
+    base_dir = Path(__file__).resolve().parent
+    configure_font_path(args.font_path)
+
+    if args.serve:
+        serve(args, base_dir)
+        return
+
+    with request_profiling(args, base_dir) as timer:
+        payload_source = args.json or args.input
+        payload = load_exam_payload(payload_source, base_dir) if needs_payload(args) else None
+        configure_sheet_cache(args, base_dir)
+        ready_at = time.perf_counter()
+        if args.mode == "scoreBatch" and not args.results_output:
+            # stdout carries one JSON line per sheet; the run summary goes to stderr.
+            result = run_request(args, payload, base_dir, stream=sys.stdout)
+            if timer is not None:
+                result["batch"]["timings"] = profile_timings(timer, args, base_dir)
+            sys.stderr.write(json.dumps(result["batch"]) + "\n")
+            return
+        result = shape_result(run_request(args, payload, base_dir), args)
+        if args.startup_report:
+            result["startup"] = startup_report(ready_at)
+        output = serialize_result(
+            result,
+            args.result_format,
+            None if timer is None else lambda: profile_timings(timer, args, base_dir),
+        )
+    if isinstance(output, bytes):
+        sys.stdout.buffer.write(output)
+        sys.stdout.flush()
+    else:
+        print(output)
+
 
+MODULE_READY_AT = time.perf_counter()
 
 if __name__ == "__main__":
     main()
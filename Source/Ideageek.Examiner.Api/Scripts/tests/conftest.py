@@ -0,0 +1,63 @@
+"""Shared fixtures. The tests drive main.py through its command line, the way the API calls it."""
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SCRIPTS_DIR))  # unit tests import main directly
+
+
+def exam_payload(question_count: int = 12, exam_id: str = "T1") -> Dict[str, Any]:
+    options = {"A": "one", "B": "two", "C": "three", "D": "four"}
+    return {
+        "examId": exam_id,
+        "examName": "Test exam",
+        "questionCount": question_count,
+        "template": {"name": "T"},
+        "questions": [
+            {
+                "id": number,
+                "questionNumber": number,
+                "text": f"What is {number} + {number}?",
+                "options": options,
+                "correct": "ABCD"[number % 4],
+            }
+            for number in range(1, question_count + 1)
+        ],
+    }
+
+
+@pytest.fixture
+def run_main() -> Callable[..., Dict[str, Any]]:
+    def run(*args: Any) -> Dict[str, Any]:
+        completed = subprocess.run(
+            [sys.executable, str(SCRIPTS_DIR / "main.py"), *map(str, args)],
+            capture_output=True,
+            text=True,
+            cwd=SCRIPTS_DIR,
+        )
+        assert completed.returncode == 0, completed.stderr
+        return json.loads(completed.stdout)
+
+    return run
+
+
+@pytest.fixture
+def write_exam(tmp_path: Path) -> Callable[..., Path]:
+    def write(question_count: int = 12, exam_id: str = "T1") -> Path:
+        path = tmp_path / f"{exam_id}-{question_count}.json"
+        path.write_text(json.dumps(exam_payload(question_count, exam_id)))
+        return path
+
+    return write
+
+
+@pytest.fixture
+def exam_json(write_exam: Callable[..., Path]) -> Path:
+    return write_exam()
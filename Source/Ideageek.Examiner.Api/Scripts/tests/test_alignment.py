@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from PIL import Image
+
+
+def test_canvas_sized_scan_is_registered(run_main, exam_json, tmp_path):
+    scan = tmp_path / "scan.png"
+    sheet = run_main("--mode", "answerSheet", "--json", exam_json, "--fill-random", "--output", scan)
+
+    result = run_main("--mode", "scoreCheck", "--json", exam_json, "--scanned-sheet", scan)
+
+    assert [page["registered"] for page in result["alignment"]] == [True]
+    assert result["detected_answers"] == sheet["simulated_answers"]
+
+
+def test_cropped_scan_without_fiducials_is_not_registered(run_main, exam_json, tmp_path):
+    rendered = tmp_path / "rendered.png"
+    run_main("--mode", "answerSheet", "--json", exam_json, "--fill-random", "--output", rendered)
+    # Rotated and shifted, with every corner square cropped away: plain scaling cannot line it up.
+    with Image.open(rendered) as image:
+        moved = image.convert("L").rotate(1.5, fillcolor=255, translate=(40, 25))
+        scan = tmp_path / "scan.png"
+        moved.crop((150, 150, moved.width - 120, moved.height - 130)).save(scan)
+
+    result = run_main("--mode", "scoreCheck", "--json", exam_json, "--scanned-sheet", scan)
+
+    assert [page["fiducials"] for page in result["alignment"]] == [0]
+    assert [page["registered"] for page in result["alignment"]] == [False]
+    # Sampled at guessed positions, so nothing on the page may pass as a confident answer or blank.
+    assert {row["status"] for row in result["detection_details"]} == {"uncertain"}
+    assert result["review"]["questions"] == list(range(1, 13))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+import main
+
+OPTIONS = (("A", "B", "C", "D"),)
+VALID = np.ones((1, 4), dtype=bool)
+PAPER = 235.0
+
+FILLED, BLANK, MULTI, UNCERTAIN = (
+    main.MARK_STATUSES.index(status) for status in (main.MARK_FILLED, main.MARK_BLANK, main.MARK_MULTI, main.MARK_UNCERTAIN)
+)
+
+
+def classify(*fills):
+    best, status, confidence = main.classify_marks(np.array([fills], dtype=np.float64), VALID)
+    return int(best[0]), int(status[0]), float(confidence[0])
+
+
+def sampled(fills, options=OPTIONS[0], paper=PAPER):
+    # The bubble means a scan with these fill ratios would give, letters included.
+    printed = np.array([main.printed_bubble_fill(option) for option in options])
+    return paper * (1 - (printed + np.array(fills) * (1 - printed)))
+
+
+@pytest.mark.parametrize(
+    "fills, expected",
+    [
+        ((0.9, 0.05, 0.0, 0.02), (0, FILLED)),
+        ((0.0, 0.0, 0.7, 0.0), (2, FILLED)),
+        ((0.0, 0.0, 0.0, 0.0), (0, BLANK)),
+        ((0.05, 0.11, 0.0, 0.02), (1, BLANK)),
+        ((0.85, 0.8, 0.0, 0.0), (0, MULTI)),
+        ((0.3, 0.02, 0.0, 0.0), (0, UNCERTAIN)),  # faint mark
+        ((0.55, 0.0, 0.35, 0.0), (0, UNCERTAIN)),  # leftover erasure: too close to the runner-up
+    ],
+)
+def test_statuses(fills, expected):
+    best, status, _ = classify(*fills)
+    assert (best, status) == expected
+
+
+def test_thresholds_are_inclusive():
+    # 0.625 - 0.375 is exact in binary, so that pair sits right on the 0.25 margin.
+    fill, blank = main.MARK_FILLED_FILL, main.MARK_BLANK_FILL
+    assert classify(fill, 0.0, 0.0, 0.0)[1] == FILLED
+    assert classify(fill - 0.001, 0.0, 0.0, 0.0)[1] == UNCERTAIN
+    assert classify(0.625, 0.375, 0.0, 0.0)[1] == FILLED  # margin exactly MARK_MIN_MARGIN
+    assert classify(0.625, 0.38, 0.0, 0.0)[1] == UNCERTAIN
+    assert classify(0.9, fill, 0.0, 0.0)[1] == MULTI
+    assert classify(blank, 0.0, 0.0, 0.0)[1] == UNCERTAIN
+    assert classify(blank - 0.001, 0.0, 0.0, 0.0)[1] == BLANK
+
+
+def test_confidence():
+    span = main.MARK_CONFIDENCE_SPAN
+    assert classify(0.0, 0.0, 0.0, 0.0)[2] == 1.0
+    assert classify(main.MARK_FILLED_FILL + span / 2, 0.0, 0.0, 0.0)[2] == pytest.approx(0.5)
+    assert classify(1.0, 0.0, 0.0, 0.0)[2] == 1.0
+    assert classify(0.3, 0.0, 0.0, 0.0)[2] == 0.0  # uncertain is never confident
+    assert classify(0.9, main.MARK_FILLED_FILL + span / 4, 0.0, 0.0)[2] == pytest.approx(0.25)
+
+
+def test_padding_options_are_ignored():
+    # A two-option question in a four-wide grid: whatever the padding reads must not count.
+    valid = np.array([[True, True, False, False]])
+    best, status, _ = main.classify_marks(np.array([[0.0, 0.8, 1.0, 1.0]]), valid)
+    assert (int(best[0]), int(status[0])) == (1, FILLED)
+
+
+def test_bubble_fill_from_sampled_means():
+    fills = [0.0, 0.8, 0.1, 0.0]
+    background = np.full((1, 4), PAPER)
+    fill, paper = main.bubble_fill(sampled(fills)[None, :], background, VALID, OPTIONS)
+
+    assert paper.tolist() == [PAPER]
+    assert fill[0] == pytest.approx(fills, abs=1e-9)
+    assert main.classify_marks(fill, VALID)[1].tolist() == [FILLED]
+
+
+def test_untouched_letters_read_blank():
+    fill, _ = main.bubble_fill(sampled([0.0] * 4)[None, :], np.full((1, 4), PAPER), VALID, OPTIONS)
+    assert fill[0] == pytest.approx([0.0] * 4, abs=1e-9)
+    assert main.classify_marks(fill, VALID)[1].tolist() == [BLANK]
+
+
+def test_stray_mark_beside_a_bubble_keeps_the_paper_level():
+    # A pencil smudge darkens the ring around C; the brightest ring still sets the paper level.
+    background = np.array([[PAPER, PAPER, 150.0, PAPER]])
+    fill, paper = main.bubble_fill(sampled([0.0] * 4)[None, :], background, VALID, OPTIONS)
+    assert paper.tolist() == [PAPER]
+    assert main.classify_marks(fill, VALID)[1].tolist() == [BLANK]
+
+
+def test_darker_paper_scales_the_fill():
+    # Grey recycled paper: the same marks read the same fill against its own paper level.
+    fills = [0.0, 0.0, 0.9, 0.0]
+    fill, _ = main.bubble_fill(sampled(fills, paper=180.0)[None, :], np.full((1, 4), 180.0), VALID, OPTIONS)
+    assert fill[0] == pytest.approx(fills, abs=1e-9)
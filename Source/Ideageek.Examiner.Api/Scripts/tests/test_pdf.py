@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import io
+import re
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytest
+from PIL import ImageFilter
+
+import main
+from conftest import exam_payload
+
+pytestmark = pytest.mark.skipif(not main.resolve_font_path(), reason="vector output needs a TrueType font")
+
+PdfObjects = Dict[int, Tuple[bytes, bytes | None]]
+
+
+def read_pdf(data: bytes) -> PdfObjects:
+    """Every object by id, found only through the xref table, so a wrong offset fails the lookup."""
+    assert data.startswith(b"%PDF-1.4\n")
+    trailer = re.search(rb"trailer\n<< /Size (\d+) /Root 1 0 R >>\nstartxref\n(\d+)\n%%EOF\n$", data)
+    assert trailer, "no trailer"
+    size, xref_at = int(trailer.group(1)), int(trailer.group(2))
+    header = re.compile(rb"xref\n0 (\d+)\n0000000000 65535 f \n").match(data, xref_at)
+    assert header and int(header.group(1)) == size
+    objects: PdfObjects = {}
+    for object_id in range(1, size):
+        entry = data[header.end() + 20 * (object_id - 1) : header.end() + 20 * object_id]
+        assert entry[10:] == b" 00000 n \n"
+        offset = int(entry[:10])
+        start = re.compile(rb"(\d+) 0 obj\n").match(data, offset)
+        assert start and int(start.group(1)) == object_id, f"xref entry {object_id} points at {data[offset:offset + 20]!r}"
+        stream = re.compile(rb"<<([^\n]*)/Length (\d+) >>\nstream\n").match(data, start.end())
+        if stream:
+            end = stream.end() + int(stream.group(2))
+            assert data[end : end + 18] == b"\nendstream\nendobj\n"
+            raw = data[stream.end() : end]
+            objects[object_id] = (stream.group(1), zlib.decompress(raw) if b"/FlateDecode" in stream.group(1) else raw)
+        else:
+            end = data.index(b"\nendobj\n", start.end())
+            objects[object_id] = (data[start.end() : end], None)
+    return objects
+
+
+def reference(body: bytes, key: bytes) -> int:
+    return int(re.search(rb"/%s (\d+) 0 R" % key, body).group(1))
+
+
+def find(objects: PdfObjects, marker: bytes) -> Tuple[bytes, bytes | None]:
+    return next(value for value in objects.values() if marker in value[0])
+
+
+def font_tables(font_file: bytes) -> Dict[bytes, bytes]:
+    tables = {}
+    for index in range(struct.unpack_from(">H", font_file, 4)[0]):
+        tag, checksum, offset, length = struct.unpack_from(">4sIII", font_file, 12 + 16 * index)
+        padded = font_file[offset : offset + length + (-length % 4)]
+        assert sum(struct.unpack(f">{len(padded) // 4}I", padded)) & 0xFFFFFFFF == checksum, tag
+        tables[tag] = font_file[offset : offset + length]
+    return tables
+
+
+def to_unicode(cmap: bytes) -> Dict[int, str]:
+    return {
+        int(glyph, 16): bytes.fromhex(text.decode("ascii")).decode("utf-16-be")
+        for glyph, text in re.findall(rb"<([0-9A-F]{4})> <([0-9A-F]+)>", cmap.split(b"endcodespacerange")[1])
+    }
+
+
+def page_text(objects: PdfObjects, glyph_text: Dict[int, str]) -> List[str]:
+    pages = re.findall(rb"(\d+) 0 R", objects[2][0])
+    lines = []
+    for page_id in pages:
+        content = objects[reference(objects[int(page_id)][0], b"Contents")][1]
+        for shown in re.findall(rb"\[(.*?)\] TJ", content):
+            glyphs = "".join(re.findall(r"<([0-9A-F]+)>", shown.decode("ascii")))
+            lines.append("".join(glyph_text.get(int(glyphs[at : at + 4], 16), "") for at in range(0, len(glyphs), 4)))
+    return lines
+
+
+def vector_pdf(pages) -> bytes:
+    handle = io.BytesIO()
+    main.write_vector_document(handle, pages)
+    return handle.getvalue()
+
+
+@pytest.fixture(scope="module")
+def exam():
+    return main.build_run_config(exam_payload(30))
+
+
+@pytest.fixture(scope="module")
+def answer_pdf(exam):
+    answers, pages = main.generate_vector_sheet(exam, "S-0042", fill_random=True)
+    return answers, vector_pdf(pages)
+
+
+@pytest.fixture(scope="module")
+def question_pdf(exam):
+    _, pages = main.vector_question_sheet_pages(exam, "S-0042")
+    return vector_pdf(pages)
+
+
+def test_xref_offsets_point_at_objects(answer_pdf, question_pdf, exam):
+    _, raster_pages = main.generate_sheet(exam, "S-0042")
+    handle = io.BytesIO()
+    writer = main.RasterPdfWriter(handle)
+    for page in raster_pages:
+        writer.add_page(page)
+    writer.close()
+
+    for data, page_count in ((answer_pdf[1], exam.grid.page_count), (question_pdf, None), (handle.getvalue(), len(raster_pages))):
+        objects = read_pdf(data)
+        assert objects[1][0] == b"<< /Type /Catalog /Pages 2 0 R >>"
+        kids = re.findall(rb"(\d+) 0 R", objects[2][0])
+        assert int(re.search(rb"/Count (\d+)", objects[2][0]).group(1)) == len(kids) >= 1
+        assert page_count is None or len(kids) == page_count
+        for kid in kids:
+            assert objects[int(kid)][0].startswith(b"<< /Type /Page /Parent 2 0 R ")
+
+
+def test_font_subset_tables(question_pdf):
+    objects = read_pdf(question_pdf)
+    font = main.load_truetype(main.vector_font_path())
+    cid_font = find(objects, b"/Subtype /CIDFontType2")[0]
+    descriptor = objects[reference(cid_font, b"FontDescriptor")][0]
+    font_file = objects[reference(descriptor, b"FontFile2")][1]
+    tables = font_tables(font_file)
+    assert {b"head", b"hhea", b"maxp", b"hmtx", b"loca", b"glyf"} <= set(tables)
+
+    glyph_count = struct.unpack_from(">H", tables[b"maxp"], 4)[0]
+    assert struct.unpack_from(">H", tables[b"hhea"], 34)[0] == glyph_count
+    assert struct.unpack_from(">h", tables[b"head"], 50)[0] == 1  # long loca
+    loca = struct.unpack(f">{glyph_count + 1}I", tables[b"loca"])
+    advances = struct.unpack(f">{2 * glyph_count}H", tables[b"hmtx"])[::2]
+
+    widths = re.search(rb"/W \[(.*?)\] /CIDToGIDMap", cid_font).group(1)
+    used = {int(glyph): int(width) for glyph, width in re.findall(rb"(\d+) \[(\d+)\]", widths)}
+    assert len(used) > 20
+    for glyph_id, width in used.items():
+        # Kept glyphs are byte-identical to the source font, with the same advance and /W width.
+        assert tables[b"glyf"][loca[glyph_id] : loca[glyph_id + 1]].rstrip(b"\0") == font.glyph(glyph_id).rstrip(b"\0")
+        assert advances[glyph_id] == font.advances[glyph_id]
+        assert width == round(font.advances[glyph_id] * 1000 / font.units_per_em)
+
+    glyph_text = to_unicode(objects[reference(find(objects, b"/Subtype /Type0")[0], b"ToUnicode")][1])
+    unused = [font.cmap[ord(char)] for char in "QXZqxz@#%&" if char not in glyph_text.values() and ord(char) in font.cmap]
+    assert unused
+    for glyph_id in unused:
+        assert glyph_id >= glyph_count or loca[glyph_id] == loca[glyph_id + 1], "unused glyph was embedded"
+
+
+def test_cmap_round_trip(question_pdf, exam):
+    objects = read_pdf(question_pdf)
+    font = main.load_truetype(main.vector_font_path())
+    glyph_text = to_unicode(objects[reference(find(objects, b"/Subtype /Type0")[0], b"ToUnicode")][1])
+    for glyph_id, text in glyph_text.items():
+        assert font.cmap[ord(text)] == glyph_id
+
+    lines = page_text(objects, glyph_text)
+    assert "S-0042" in " ".join(lines)
+    for question in exam.questions:
+        assert any(question.text in line for line in lines), question.text
+
+
+def render(data: bytes, page: int = 0) -> np.ndarray:
+    pdfium = pytest.importorskip("pypdfium2")
+    document = pdfium.PdfDocument(data)
+    bitmap = document[page].render(scale=main.PRINT_DPI / 72, grayscale=True).to_pil().convert("L")
+    return np.asarray(bitmap.crop((0, 0, *main.IMAGE_SIZE)))
+
+
+def test_rendered_answer_sheet_scores_and_reads_its_qr(answer_pdf, exam):
+    answers, data = answer_pdf
+    pages = [render(data, page) for page in range(exam.grid.page_count)]
+
+    detected, _, alignments = main.detect_answers(pages, exam)
+
+    assert detected == answers
+    assert all(page["registered"] for page in alignments)
+    assert main.read_sheet_qr(pages[0], alignments[0]) == {"student": "S-0042", "exam": exam.exam_id}
+
+
+def test_rendered_question_sheet_matches_the_raster_one(question_pdf, exam):
+    _, raster_pages = main.generate_question_sheet(exam, "S-0042")
+
+    for page, raster in enumerate(raster_pages):
+        # Font rasterisers differ in antialiasing; after a small blur the two must agree everywhere.
+        vector = np.asarray(main.Image.fromarray(render(question_pdf, page)).filter(ImageFilter.BoxBlur(4)), dtype=float)
+        expected = np.asarray(raster.convert("L").filter(ImageFilter.BoxBlur(4)), dtype=float)
+        assert np.percentile(np.abs(vector - expected), 99.9) < 64, f"page {page + 1}"
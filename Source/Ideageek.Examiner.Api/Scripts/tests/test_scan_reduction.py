@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pytest
+from PIL import Image
+
+import main
+
+REDUCTIONS = ["auto", "1", "2"]
+DECODED_WIDTH = {"auto": main.IMAGE_SIZE[0], "1": 2 * main.IMAGE_SIZE[0], "2": main.IMAGE_SIZE[0]}
+
+
+def scan_at_600_dpi(rendered, output, **save_options):
+    with Image.open(rendered) as image:
+        image.convert("L").resize((image.width * 2, image.height * 2), Image.BILINEAR).save(output, **save_options)
+
+
+def score(run_main, exam_json, scan, reduction):
+    result = run_main("--mode", "scoreCheck", "--json", exam_json, "--scanned-sheet", scan, "--scan-reduction", reduction)
+    # Detection worked on the decoded size: the fitted canvas-to-scan scale gives it away.
+    for page in result["alignment"]:
+        (a, b, _), (d, e, _) = page["matrix"]
+        assert round(abs(a * e - b * d) ** 0.5 * main.IMAGE_SIZE[0]) == DECODED_WIDTH[reduction], reduction
+    return result
+
+
+@pytest.mark.parametrize("suffix", [".png", ".jpg"])
+def test_reductions_agree_on_a_600_dpi_scan(run_main, exam_json, tmp_path, suffix):
+    rendered = tmp_path / "rendered.png"
+    sheet = run_main("--mode", "answerSheet", "--json", exam_json, "--fill-random", "--output", rendered)
+    scan = tmp_path / f"scan{suffix}"
+    scan_at_600_dpi(rendered, scan)
+
+    for reduction in REDUCTIONS:
+        assert main.load_grayscale(scan, reduction).shape[1] == DECODED_WIDTH[reduction]
+        assert score(run_main, exam_json, scan, reduction)["detected_answers"] == sheet["simulated_answers"], reduction
+
+
+def test_reductions_agree_on_a_multi_page_tiff(run_main, write_exam, tmp_path):
+    exam_json = write_exam(40)
+    rendered = tmp_path / "rendered.png"
+    sheet = run_main("--mode", "answerSheet", "--json", exam_json, "--fill-random", "--output", rendered)
+    assert len(sheet["saved_paths"]) > 1
+    pages = []
+    for index, path in enumerate(sheet["saved_paths"]):
+        scan_at_600_dpi(path, tmp_path / f"page{index}.png")
+        pages.append(Image.open(tmp_path / f"page{index}.png"))
+    scan = tmp_path / "scan.tiff"
+    pages[0].save(scan, save_all=True, append_images=pages[1:], compression="tiff_deflate")
+
+    for reduction in REDUCTIONS:
+        frames = main.load_page_frames(scan, reduction)
+        assert [frame.shape[1] for frame in frames] == [DECODED_WIDTH[reduction]] * len(pages)
+        assert score(run_main, exam_json, scan, reduction)["detected_answers"] == sheet["simulated_answers"], reduction
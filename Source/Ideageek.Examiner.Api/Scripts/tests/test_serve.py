@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import SCRIPTS_DIR, exam_payload
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture(params=["thread", "process"])
+def worker(request, tmp_path):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(SCRIPTS_DIR / "main.py"), "--serve", "--port", str(port), "--workers", "1", "--pool", request.param],
+        cwd=SCRIPTS_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            assert process.poll() is None and time.monotonic() < deadline, "worker did not start"
+            time.sleep(0.05)
+    yield port
+    process.terminate()
+    process.wait(timeout=10)
+
+
+def post(connection: http.client.HTTPConnection, body: dict) -> dict:
+    connection.request("POST", "/", json.dumps(body), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    assert response.status == 200
+    return json.loads(response.read())
+
+
+def test_keep_alive_connection_serves_consecutive_requests(worker):
+    # The API's pooled HttpClient reuses one connection; the worker must not drop it after a request.
+    connection = http.client.HTTPConnection("127.0.0.1", worker, timeout=30)
+    try:
+        for student_id in ("S-1", "S-2"):
+            result = post(connection, {"mode": "answerSheet", "payload": exam_payload(), "studentId": student_id})
+            assert result["ok"] and result["result"]["student_id"] == student_id
+        connection.request("GET", "/stats")
+        stats = json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+    assert stats["jobs"]["completed"] == 2
+    assert stats["jobs"]["cancelled"] == 0
@@ -4,6 +4,7 @@ public class QuestionSheetGenerationOptions
 {
     public string PythonPath { get; set; } = "python";
     public string ScriptPath { get; set; } = string.Empty;
+    public string WorkerUrl { get; set; } = string.Empty;
     public string DocumentsFolder { get; set; } = string.Empty;
     public string DocumentsUrlPrefix { get; set; } = "/Documents/Exam";
 }
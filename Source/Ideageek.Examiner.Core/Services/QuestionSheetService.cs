@@ -7,8 +7,10 @@ using System.Drawing;
 using System.Drawing.Imaging;
 using System.IO;
 using System.Linq;
+using System.Net.Http;
 using System.Text;
 using System.Text.Json;
+using System.Text.Json.Nodes;
 using System.Threading.Tasks;
 using Ideageek.Examiner.Core.Dtos;
 using Ideageek.Examiner.Core.Entities;
@@ -23,6 +25,8 @@ namespace Ideageek.Examiner.Core.Services;
 
 public class QuestionSheetService : IQuestionSheetService
 {
+    private static readonly HttpClient WorkerClient = new();
+
     private readonly IStudentRepository _studentRepository;
     private readonly IExamRepository _examRepository;
     private readonly IQuestionRepository _questionRepository;
@@ -348,6 +352,11 @@ public class QuestionSheetService : IQuestionSheetService
         string? studentId = null,
         string? scannedSheetPath = null)
     {
+        if (!string.IsNullOrWhiteSpace(_generationOptions.WorkerUrl))
+        {
+            return await RunQuestionSheetWorkerAsync(payloadJson, mode, studentId, scannedSheetPath);
+        }
+
         var scriptPath = _generationOptions.ScriptPath;
         if (string.IsNullOrWhiteSpace(scriptPath))
         {
@@ -441,6 +450,43 @@ public class QuestionSheetService : IQuestionSheetService
         }
     }
 
+    private async Task<string> RunQuestionSheetWorkerAsync(
+        string payloadJson,
+        string mode,
+        string? studentId,
+        string? scannedSheetPath)
+    {
+        var request = new JsonObject
+        {
+            ["mode"] = mode,
+            ["payload"] = JsonNode.Parse(payloadJson)
+        };
+        if (!string.IsNullOrWhiteSpace(studentId))
+        {
+            request["studentId"] = studentId;
+        }
+        if (!string.IsNullOrWhiteSpace(scannedSheetPath))
+        {
+            request["scannedSheet"] = scannedSheetPath;
+        }
+
+        using var content = new StringContent(request.ToJsonString(), Encoding.UTF8, "application/json");
+        using var response = await WorkerClient.PostAsync(_generationOptions.WorkerUrl, content);
+        var body = await response.Content.ReadAsStringAsync();
+
+        using var document = JsonDocument.Parse(body);
+        var root = document.RootElement;
+        if (root.TryGetProperty("ok", out var okElement) && okElement.ValueKind == JsonValueKind.True &&
+            root.TryGetProperty("result", out var resultElement))
+        {
+            return resultElement.GetRawText();
+        }
+
+        var error = root.TryGetProperty("error", out var errorElement) ? errorElement.GetString() : null;
+        throw new InvalidOperationException(
+            $"Question sheet worker failed (status code: {(int)response.StatusCode}).\n{error ?? body}");
+    }
+
     private static string ExtractImageBase64(string scriptOutput)
     {
         if (string.IsNullOrWhiteSpace(scriptOutput))